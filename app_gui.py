@@ -7,14 +7,24 @@ import os
 import pickle
 import threading
 import time
-from src.signal_utils import read_wav, pre_emphasis, frame_signal, apply_window
+from src.signal_utils import pre_emphasis, frame_signal, apply_window
 from src.feature_extraction import compute_mfcc
+from src.model_bank import ModelBank
+from src.model_io import load_bundle
+from src.vad import trim_silence, EndpointDetector
+from src.live import ContinuousRecognizer
+from src import instrument
 
 # Constants
 MODEL_DIR = "models"
+BUNDLE_PATH = os.path.join(MODEL_DIR, "hmm_digits.bin")
 TEMP_FILE = "temp_recording.wav"
+DUMP_WAV = False # Also write each recording to TEMP_FILE for debugging
 SAMPLE_RATE = 22050 # Standard for the project files
-DURATION = 1.0 # 1 second recording is usually enough for digits
+MAX_DURATION = 3.0 # Recording stops on trailing silence (VAD), or after this many seconds
+BLOCK_SIZE = 441 # Samples per capture block (20 ms at 22050 Hz)
+DECODER = "forward" # "forward" (full likelihood) or "viterbi" (best path, faster with BEAM)
+BEAM = None # Viterbi beam in log-likelihood units, e.g. 300; None = no pruning
 
 class App:
     def __init__(self, root):
@@ -23,19 +33,30 @@ class App:
         self.root.geometry("600x400")
         
         self.models = {}
+        self.bank = None
         self.load_models()
         
         self.is_recording = False
+        self.record_thread = None
+        self.release_time = None
+        self.listener = None # ContinuousRecognizer while continuous mode is on
+        self.stream = None
         
         self.create_widgets()
         
     def load_models(self):
         print("Loading models...")
-        for i in range(10):
-            model_path = os.path.join(MODEL_DIR, f"hmm_{i}.pkl")
-            if os.path.exists(model_path):
-                with open(model_path, "rb") as f:
-                    self.models[i] = pickle.load(f)
+        if os.path.exists(BUNDLE_PATH):
+            self.models = load_bundle(BUNDLE_PATH)
+        else:
+            # Legacy per-digit pickles (see convert_models.py)
+            for i in range(10):
+                model_path = os.path.join(MODEL_DIR, f"hmm_{i}.pkl")
+                if os.path.exists(model_path):
+                    with open(model_path, "rb") as f:
+                        self.models[i] = pickle.load(f)
+        if self.models:
+            self.bank = ModelBank(self.models)
         print(f"Loaded {len(self.models)} models.")
 
     def create_widgets(self):
@@ -75,11 +96,17 @@ class App:
         self.btn_record.bind('<ButtonPress-1>', self.start_record)
         self.btn_record.bind('<ButtonRelease-1>', self.stop_record)
 
+        self.btn_listen = tk.Button(self.btn_shutdown, text="NGHE LIÊN TỤC", bg="#ccccff", font=("Arial", 14), command=self.toggle_listen)
+        self.btn_listen.pack(side=tk.LEFT, padx=10)
+
         self.btn_reset = tk.Button(self.btn_shutdown, text="RESET", bg="#ccffcc", font=("Arial", 14), command=self.reset_app)
         self.btn_reset.pack(side=tk.LEFT, padx=10)
 
         self.lbl_status = tk.Label(self.root, text="Ready", fg="blue")
         self.lbl_status.pack()
+        # Stage breakdown of the last request (HMM_INSTRUMENT=1)
+        self.lbl_profile = tk.Label(self.root, text="", fg="gray", font=("Arial", 9))
+        self.lbl_profile.pack()
 
     def reset_app(self):
         """Reset all bulbs to gray and status to Ready"""
@@ -88,78 +115,160 @@ class App:
         self.lbl_status.config(text="Ready", fg="blue")
 
 
+    def toggle_listen(self):
+        """
+        Continuous mode: the InputStream callback only fills the recognizer's
+        ring buffer; its consumer thread segments and scores each digit and
+        posts the result back with root.after.
+        """
+        if self.listener is None:
+            if self.bank is None:
+                messagebox.showerror("Error", "No models loaded")
+                return
+            self.listener = ContinuousRecognizer(self.bank, SAMPLE_RATE, self.on_live_result,
+                                                 decoder=DECODER, beam=BEAM)
+            self.stream = sd.InputStream(samplerate=SAMPLE_RATE, channels=1, blocksize=BLOCK_SIZE,
+                                         callback=self.listener.audio_callback)
+            self.listener.start()
+            self.stream.start()
+            self.release_time = None # No button release in continuous mode
+            self.btn_record.config(state=tk.DISABLED)
+            self.btn_listen.config(text="DỪNG NGHE")
+            self.lbl_status.config(text="Listening...", fg="red")
+        else:
+            self.stream.stop()
+            self.stream.close()
+            self.listener.stop()
+            if self.listener.ring.dropped or self.listener.input_overflows:
+                print(f"Continuous mode: {self.listener.ring.dropped} samples dropped, "
+                      f"{self.listener.input_overflows} input overflows")
+            self.stream = None
+            self.listener = None
+            self.btn_record.config(state=tk.NORMAL)
+            self.btn_listen.config(text="NGHE LIÊN TỤC")
+            self.lbl_status.config(text="Ready", fg="blue")
+
+    def on_live_result(self, label, ranked, start_s, end_s):
+        # Consumer thread: hand over to the Tk main loop
+        breakdown = instrument.format_breakdown(instrument.last_request()) if instrument.enabled else ""
+        self.root.after(0, self.show_result, label, dict(ranked), time.perf_counter(), breakdown)
+
     def start_record(self, event):
+        if self.listener is not None:
+            return
         self.is_recording = True
+        self.release_time = None
         self.lbl_status.config(text="Recording...", fg="red")
         self.record_thread = threading.Thread(target=self.record_audio)
         self.record_thread.start()
 
     def stop_record(self, event):
+        if self.listener is not None:
+            return
         self.is_recording = False
-        self.lbl_status.config(text="Processing...", fg="orange")
-        # Thread will finish naturally when is_recording flag check loop breaks or duration ends?
-        # Using sounddevice.rec is non-blocking, but we need to stop it.
-        # Actually simplest approach for "Hold" is fixed block, but let's do: 
-        # Since sounddevice rec is fixed duration usually, let's just record fixed 1.5s for simplicity
-        # User holds -> We trigger a 1.5s record. If they release early, proper hold logic is complex.
-        pass
+        self.release_time = time.perf_counter()
+        if self.record_thread is not None and self.record_thread.is_alive():
+            self.lbl_status.config(text="Processing...", fg="orange")
+        # The record thread stops by itself once the VAD sees the end of the
+        # word (or after MAX_DURATION), so releasing does not cut the audio.
 
     def record_audio(self):
-        # Record fixed 1.5 seconds
+        # Runs on the record thread: capture, features and scoring all happen
+        # here so the Tk main loop never blocks; the result is posted back
+        # with root.after.
         try:
-            duration = 1.5
-            recording = sd.rec(int(duration * SAMPLE_RATE), samplerate=SAMPLE_RATE, channels=1)
-            sd.wait()
-            
-            # Save
-            # Scale to int16
-            recording_int16 = (recording * 32767).astype(np.int16)
-            wavfile.write(TEMP_FILE, SAMPLE_RATE, recording_int16)
-            
-            # Predict
-            self.root.after(100, self.predict)
+            with instrument.request("record") as req:
+                with instrument.stage("capture"):
+                    recording, end_time = self.capture()
+                if end_time is None:
+                    self.root.after(0, lambda: self.lbl_status.config(text="No speech detected", fg="red"))
+                    return
+                
+                if DUMP_WAV:
+                    # Debug copy on disk (int16, as before)
+                    with instrument.stage("wav_dump"):
+                        recording_int16 = (recording * 32767).astype(np.int16)
+                        wavfile.write(TEMP_FILE, SAMPLE_RATE, recording_int16)
+                
+                # Same amplitude scale as int16 WAVs read by read_wav, no quantization
+                signal = recording[:, 0].astype(float) * 32767
+                
+                # Predict
+                best_digit, scores = self.predict(signal, SAMPLE_RATE)
+            self.root.after(0, self.show_result, best_digit, scores, end_time, instrument.format_breakdown(req))
         except Exception as e:
-            print(f"Error recording: {e}")
-            self.root.after(0, lambda: self.lbl_status.config(text="Record Error", fg="red"))
+            print(f"Error recording/processing: {e}")
+            self.root.after(0, lambda: self.lbl_status.config(text="Error processing audio", fg="red"))
 
-    def predict(self):
+    def capture(self):
+        """
+        Record blocks until the endpoint detector sees trailing silence after
+        speech, or MAX_DURATION. Returns (recording (n, 1) float32, time the
+        end of speech was detected or None if no speech was heard).
+        """
+        detector = EndpointDetector(SAMPLE_RATE)
+        blocks = []
+        max_blocks = int(MAX_DURATION * SAMPLE_RATE / BLOCK_SIZE)
+        with sd.InputStream(samplerate=SAMPLE_RATE, channels=1, blocksize=BLOCK_SIZE) as stream:
+            for _ in range(max_blocks):
+                block, _ = stream.read(BLOCK_SIZE)
+                blocks.append(block.copy())
+                if detector.push(block[:, 0] * 32767):
+                    break
+        recording = np.concatenate(blocks)
+        if detector.ended:
+            return recording, time.perf_counter()
+        # Still talking at MAX_DURATION: use what we have
+        return recording, (time.perf_counter() if detector.in_speech else None)
+
+    def predict(self, signal, sr):
+        """
+        Audio buffer -> (best_digit, {digit: score}). Thread-safe, no UI access.
+        """
         # 1. Pipeline
-        try:
-            sr, signal = read_wav(TEMP_FILE)
-            if len(signal) == 0: 
-                raise ValueError("Empty audio")
-            
-            # Normalize?
-            
-            signal = pre_emphasis(signal)
-            frames = frame_signal(signal, sr)
-            frames = apply_window(frames)
-            mfcc = compute_mfcc(frames, sr)
-            
-            # 2. Score with HMMs
-            best_score = -float('inf')
-            best_digit = -1
-            
-            scores = {}
-            for digit, model in self.models.items():
-                try:
-                    score = model.score(mfcc)
-                    scores[digit] = score
-                    if score > best_score:
-                        best_score = score
-                        best_digit = digit
-                except:
-                    scores[digit] = -float('inf')
-            
-            print("Scores:", scores)
-            
-            # 3. Update UI
-            self.update_bulbs(best_digit)
-            self.lbl_status.config(text=f"Detected: {best_digit}", fg="green")
-            
-        except Exception as e:
-            print(f"Prediction Error: {e}")
-            self.lbl_status.config(text="Error processing audio", fg="red")
+        if len(signal) == 0: 
+            raise ValueError("Empty audio")
+        
+        signal = pre_emphasis(signal)
+        frames = frame_signal(signal, sr)
+        frames = trim_silence(frames) # Models are trained on trimmed audio
+        frames = apply_window(frames)
+        mfcc = compute_mfcc(frames, sr)
+        
+        # 2. Score with HMMs (all models in one batched pass, best first)
+        if self.bank is None:
+            raise ValueError("No models loaded")
+        if DECODER == "viterbi":
+            ranked = self.bank.rank_viterbi(mfcc, BEAM)
+        else:
+            ranked = self.bank.rank(mfcc)
+        scores = dict(ranked)
+        best_digit, best_score = ranked[0]
+        return best_digit, scores
+
+    def show_result(self, best_digit, scores, end_time=None, breakdown=""):
+        """
+        Main thread: update the UI with a prediction.
+        end_time: when the end of speech was detected.
+        breakdown: stage timings of the request (instrument.format_breakdown).
+        """
+        print("Scores:", scores)
+        
+        # 3. Update UI
+        self.update_bulbs(best_digit)
+        text = f"Detected: {best_digit}"
+        now = time.perf_counter()
+        latencies = []
+        if end_time is not None:
+            latencies.append(f"{(now - end_time) * 1e3:.0f} ms after end of speech")
+        if self.release_time is not None:
+            # Push-to-talk: the button was released before the result arrived
+            latencies.append(f"{max(0.0, now - self.release_time) * 1e3:.0f} ms after release")
+        if latencies:
+            text += "  (" + ", ".join(latencies) + ")"
+        self.lbl_status.config(text=text, fg="green")
+        if breakdown:
+            self.lbl_profile.config(text=breakdown)
 
     def update_bulbs(self, active_digit):
         for i, canvas in enumerate(self.bulb_canvases):
@@ -0,0 +1,301 @@
+import time
+import tracemalloc
+import numpy as np
+from scipy.fftpack import dct
+from src import hmm_kernels, precision
+from src.hmm_core import HMMManual
+from src.model_bank import ModelBank
+from src.signal_utils import pre_emphasis, frame_signal, apply_window
+from src.feature_extraction import compute_fft_power, compute_mfcc, compute_mfcc_batch
+
+# Typical utterance: 1.5 s at 10 ms stride, 12 MFCCs, 5 states (as in train_scratch.py)
+N_FRAMES = 150
+N_FEATURES = 12
+N_STATES = 5
+REPEATS = 20
+
+def make_model(n_states=N_STATES, n_features=N_FEATURES, seed=0, topology="ergodic"):
+    rng = np.random.RandomState(seed)
+    X = rng.randn(N_FRAMES * 4, n_features) * 10
+    hmm = HMMManual(n_states=n_states, topology=topology)
+    hmm._init_params(X)
+    return hmm, X[:N_FRAMES]
+
+def calc_log_B_loop(hmm, X):
+    """Reference: the original per-frame, per-state loop."""
+    T = X.shape[0]
+    log_B = np.zeros((T, hmm.n_states))
+    for t in range(T):
+        for s in range(hmm.n_states):
+            log_B[t, s] = hmm._gaussian_pdf(X[t], hmm.means[s], hmm.covs[s])
+    return log_B
+
+def forward_loop(hmm, log_B):
+    """Reference: the original per-state Forward recursion."""
+    T = log_B.shape[0]
+    log_alpha = np.zeros((T, hmm.n_states))
+    with np.errstate(divide='ignore'):
+        log_pi = np.log(hmm.pi)
+        log_A = np.log(hmm.A)
+    log_alpha[0] = log_pi + log_B[0]
+    for t in range(1, T):
+        for j in range(hmm.n_states):
+            temp = log_alpha[t-1] + log_A[:, j]
+            max_val = np.max(temp)
+            log_alpha[t, j] = max_val + np.log(np.sum(np.exp(temp - max_val))) + log_B[t, j]
+    return log_alpha
+
+def backward_loop(hmm, log_B):
+    """Reference: the original per-state Backward recursion."""
+    T = log_B.shape[0]
+    log_beta = np.zeros((T, hmm.n_states))
+    with np.errstate(divide='ignore'):
+        log_A = np.log(hmm.A)
+    for t in range(T-2, -1, -1):
+        for i in range(hmm.n_states):
+            temp = log_A[i, :] + log_B[t+1, :] + log_beta[t+1, :]
+            max_val = np.max(temp)
+            log_beta[t, i] = max_val + np.log(np.sum(np.exp(temp - max_val)))
+    return log_beta
+
+def timeit(fn, repeats=REPEATS):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+def bench_emissions():
+    hmm, X = make_model()
+    ref = calc_log_B_loop(hmm, X)
+    out = hmm._calc_log_B(X)
+    max_err = np.max(np.abs(out - ref))
+    assert np.allclose(out, ref, rtol=1e-9, atol=1e-8), f"log_B mismatch: {max_err}"
+    
+    t_loop = timeit(lambda: calc_log_B_loop(hmm, X))
+    t_vec = timeit(lambda: hmm._calc_log_B(X))
+    print(f"_calc_log_B  T={N_FRAMES} N={N_STATES} D={N_FEATURES}")
+    print(f"  loop:       {t_loop * 1e3:8.3f} ms")
+    print(f"  vectorized: {t_vec * 1e3:8.3f} ms  (x{t_loop / t_vec:.0f}, max abs err {max_err:.2e})")
+
+def bench_recursions():
+    hmm, X = make_model()
+    # Non-uniform transitions so the parity check is meaningful
+    rng = np.random.RandomState(1)
+    hmm.A = rng.rand(N_STATES, N_STATES)
+    hmm.A /= hmm.A.sum(axis=1, keepdims=True)
+    log_B = hmm._calc_log_B(X)
+    ref_alpha = forward_loop(hmm, log_B)
+    ref_beta = backward_loop(hmm, log_B)
+    
+    # 10 digit models, one 1.5 s utterance
+    models = [make_model(seed=d)[0] for d in range(10)]
+    
+    t_loop = timeit(lambda: forward_loop(hmm, log_B), repeats=5)
+    print(f"_forward/_backward  T={N_FRAMES} N={N_STATES}")
+    print(f"  loop forward:      {t_loop * 1e3:8.3f} ms")
+    
+    previous = hmm_kernels.backend
+    for name in hmm_kernels.available_backends():
+        hmm_kernels.set_backend(name)
+        assert np.allclose(hmm._forward(log_B), ref_alpha), f"{name} forward mismatch"
+        assert np.allclose(hmm._backward(log_B), ref_beta), f"{name} backward mismatch"
+        t_fwd = timeit(lambda: hmm._forward(log_B))
+        t_bwd = timeit(lambda: hmm._backward(log_B))
+        t_score = timeit(lambda: [m.score(X) for m in models])
+        print(f"  {name:6s} forward:    {t_fwd * 1e3:8.3f} ms  backward: {t_bwd * 1e3:8.3f} ms")
+        print(f"  {name:6s} score x10:  {t_score * 1e3:8.3f} ms")
+    hmm_kernels.set_backend(previous)
+
+def bench_model_bank():
+    models = {d: make_model(seed=d)[0] for d in range(10)}
+    bank = ModelBank(models)
+    _, X = make_model()
+    
+    previous = hmm_kernels.backend
+    print(f"ModelBank vs per-model loop  10 models, T={N_FRAMES} N={N_STATES}")
+    for name in hmm_kernels.available_backends():
+        hmm_kernels.set_backend(name)
+        ref = np.array([m.score(X) for m in models.values()])
+        assert np.allclose(bank.score_all(X), ref), f"{name} ModelBank mismatch"
+        t_loop = timeit(lambda: [m.score(X) for m in models.values()])
+        t_bank = timeit(lambda: bank.score_all(X))
+        print(f"  {name:6s} loop: {t_loop * 1e3:8.3f} ms  bank: {t_bank * 1e3:8.3f} ms")
+    hmm_kernels.set_backend(previous)
+
+def bench_topology():
+    """
+    Banded (left-to-right) vs dense (ergodic) recursions as n_states grows.
+    The banded model is checked against a dense model with the same arcs.
+    """
+    print(f"Topology  T={N_FRAMES}, 10-model ModelBank score_all")
+    previous = hmm_kernels.backend
+    for name in hmm_kernels.available_backends():
+        hmm_kernels.set_backend(name)
+        for n_states in (5, 16, 32):
+            row = []
+            for topology in ("ergodic", "left-to-right", "left-to-right-skip"):
+                models = {d: make_model(n_states, seed=d, topology=topology)[0] for d in range(10)}
+                _, X = make_model(n_states)
+                if topology != "ergodic":
+                    banded = models[0]
+                    dense = HMMManual(n_states=n_states)
+                    dense.pi, dense.A, dense.means, dense.covs = banded.pi, banded.A, banded.means, banded.covs
+                    dense._update_emission_cache()
+                    assert np.isclose(banded.score(X), dense.score(X)), f"{name} {topology} mismatch"
+                bank = ModelBank(models)
+                bank.score_all(X)
+                row.append(timeit(lambda: bank.score_all(X)))
+            print(f"  {name:6s} N={n_states:2d}  ergodic {row[0] * 1e3:7.3f} ms  "
+                  f"left-to-right {row[1] * 1e3:7.3f} ms  +skip {row[2] * 1e3:7.3f} ms")
+    hmm_kernels.set_backend(previous)
+
+def calc_log_B_mixture_loop(hmm, X):
+    """Reference: per-state, per-component Gaussians, log-sum-exp per state."""
+    log_B = np.zeros((X.shape[0], hmm.n_states))
+    for s in range(hmm.n_states):
+        log_C = np.array([[np.log(hmm.weights[s, m]) + hmm._gaussian_pdf(x, hmm.means[s, m], hmm.covs[s, m])
+                           for m in range(hmm.weights.shape[1])] for x in X])
+        log_B[:, s] = hmm_kernels.logsumexp(log_C, axis=1)
+    return log_B
+
+def bench_mixtures():
+    """
+    GMM emissions: every (state, component) Gaussian in one matmul pass plus
+    one log-sum-exp over components, as the number of mixtures grows.
+    """
+    n_states = 8
+    print(f"GMM emissions  T={N_FRAMES} N={n_states} D={N_FEATURES}")
+    previous = hmm_kernels.backend
+    for n_mix in (1, 2, 4, 8, 16):
+        hmm = HMMManual(n_states=n_states, n_mix=n_mix, topology="left-to-right")
+        X = np.random.RandomState(0).randn(N_FRAMES * 4, N_FEATURES) * 10
+        hmm._init_params(X, [N_FRAMES] * 4)
+        if n_mix > 1:
+            hmm._split_mixtures(n_mix)
+        X = X[:N_FRAMES]
+        if n_mix == 4:
+            ref = calc_log_B_mixture_loop(hmm, X)
+            t_loop = timeit(lambda: calc_log_B_mixture_loop(hmm, X), repeats=3)
+        row = []
+        for name in hmm_kernels.available_backends():
+            hmm_kernels.set_backend(name)
+            if n_mix == 4:
+                assert np.allclose(hmm._calc_log_B(X), ref), f"{name} GMM log_B mismatch"
+            row.append(f"{name} {timeit(lambda: hmm._calc_log_B(X)) * 1e3:7.3f} ms")
+        print(f"  M={n_mix:2d}  _calc_log_B  " + "  ".join(row))
+    print(f"  M= 4  per-component loop {t_loop * 1e3:7.3f} ms")
+    hmm_kernels.set_backend(previous)
+
+def frame_signal_tile(signal, sample_rate, frame_size=0.025, frame_stride=0.010):
+    """Reference: the original np.tile index-matrix framing (gathers a copy)."""
+    signal_length = len(signal)
+    frame_length = int(round(frame_size * sample_rate))
+    frame_step = int(round(frame_stride * sample_rate))
+    num_frames = int(np.ceil(float(np.abs(signal_length - frame_length)) / frame_step))
+    pad_signal_length = num_frames * frame_step + frame_length
+    pad_signal = np.append(signal, np.zeros((pad_signal_length - signal_length)))
+    indices = np.tile(np.arange(0, frame_length), (num_frames, 1)) + \
+              np.tile(np.arange(0, num_frames * frame_step, frame_step), (frame_length, 1)).T
+    return pad_signal[indices.astype(np.int32, copy=False)]
+
+def mel_filterbank_loop(sample_rate, NFFT=512, nfilt=40):
+    """Reference: the original nested-loop filterbank, rebuilt on every call."""
+    high_freq_mel = (2595 * np.log10(1 + (sample_rate / 2) / 700))
+    mel_points = np.linspace(0, high_freq_mel, nfilt + 2)
+    hz_points = (700 * (10**(mel_points / 2595) - 1))
+    bin = np.floor((NFFT + 1) * hz_points / sample_rate)
+    fbank = np.zeros((nfilt, int(np.floor(NFFT / 2 + 1))))
+    for m in range(1, nfilt + 1):
+        for k in range(int(bin[m - 1]), int(bin[m])):
+            fbank[m - 1, k] = (k - bin[m - 1]) / (bin[m] - bin[m - 1])
+        for k in range(int(bin[m]), int(bin[m + 1])):
+            fbank[m - 1, k] = (bin[m + 1] - k) / (bin[m + 1] - bin[m])
+    return fbank
+
+def mfcc_reference(signal, sr, num_ceps=12, nfilt=26, NFFT=512):
+    """Reference: the original front-end end to end."""
+    frames = frame_signal_tile(pre_emphasis(signal), sr)
+    frames = frames * np.hamming(frames.shape[1])
+    pow_frames = compute_fft_power(frames, NFFT)
+    pow_frames[pow_frames == 0] = np.finfo(float).eps
+    filter_banks = np.dot(pow_frames, mel_filterbank_loop(sr, NFFT, nfilt).T)
+    filter_banks = np.log(np.where(filter_banks == 0, np.finfo(float).eps, filter_banks))
+    return dct(filter_banks, type=2, axis=1, norm='ortho')[:, :num_ceps]
+
+def mfcc_current(signal, sr):
+    frames = apply_window(frame_signal(pre_emphasis(signal), sr))
+    return compute_mfcc(frames, sr)
+
+def peak_memory(fn):
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+def bench_frontend():
+    sr = 44100
+    signal = np.random.RandomState(0).randn(int(1.5 * sr)) * 3000  # 1.5 s utterance
+    ref = mfcc_reference(signal, sr)
+    out = mfcc_current(signal, sr)
+    max_err = np.max(np.abs(out - ref))
+    assert out.shape == ref.shape and np.allclose(out, ref, rtol=1e-10, atol=1e-10), f"MFCC mismatch: {max_err}"
+    
+    print(f"Front-end  1.5 s @ {sr} Hz -> {out.shape[0]} frames")
+    t_ref = timeit(lambda: frame_signal_tile(signal, sr))
+    t_new = timeit(lambda: frame_signal(signal, sr))
+    m_ref = peak_memory(lambda: frame_signal_tile(signal, sr))
+    m_new = peak_memory(lambda: frame_signal(signal, sr))
+    print(f"  frame_signal  tile:    {t_ref * 1e3:8.3f} ms  peak {m_ref / 1e6:6.2f} MB")
+    print(f"  frame_signal  strided: {t_new * 1e3:8.3f} ms  peak {m_new / 1e6:6.2f} MB")
+    t_ref = timeit(lambda: mfcc_reference(signal, sr))
+    t_new = timeit(lambda: mfcc_current(signal, sr))
+    m_ref = peak_memory(lambda: mfcc_reference(signal, sr))
+    m_new = peak_memory(lambda: mfcc_current(signal, sr))
+    print(f"  full MFCC     original:{t_ref * 1e3:8.3f} ms  peak {m_ref / 1e6:6.2f} MB")
+    print(f"  full MFCC     current: {t_new * 1e3:8.3f} ms  peak {m_new / 1e6:6.2f} MB  (max abs err {max_err:.1e})")
+
+def bench_precision():
+    """
+    float64 vs float32 compute precision: batched front-end for 20 utterances
+    and ModelBank scoring (8-state, 4-mixture left-to-right models).
+    """
+    sr = 44100
+    rng = np.random.RandomState(0)
+    signals = [rng.randn(int(1.5 * sr)) * 3000 for _ in range(20)]
+    models = {}
+    for d in range(10):
+        hmm = HMMManual(n_states=8, n_mix=4, topology="left-to-right")
+        X = np.random.RandomState(d).randn(N_FRAMES * 4, N_FEATURES) * 10
+        hmm._init_params(X, [N_FRAMES] * 4)
+        hmm._split_mixtures(4)
+        models[d] = hmm
+    bank = ModelBank(models)
+
+    print(f"Precision  front-end 20 x 1.5 s @ {sr} Hz, 10-model bank (8 states x 4 mixtures), kernel {hmm_kernels.backend}")
+    previous = precision.name
+    ref = None
+    for name in ("float64", "float32"):
+        precision.set_precision(name)
+        sigs = [s.astype(precision.dtype) for s in signals]
+        mfcc, offsets = compute_mfcc_batch(sigs, sr)
+        X = mfcc[:offsets[1]]
+        scores = bank.score_all(X)
+        if ref is None:
+            ref = scores
+        t_fe = timeit(lambda: compute_mfcc_batch(sigs, sr), repeats=5)
+        m_fe = peak_memory(lambda: compute_mfcc_batch(sigs, sr))
+        t_score = timeit(lambda: bank.score_all(X))
+        print(f"  {name}  front-end {t_fe * 1e3:7.2f} ms  peak {m_fe / 1e6:5.2f} MB  "
+              f"score_all {t_score * 1e3:6.3f} ms  max score diff {np.max(np.abs(scores - ref)):.1e}")
+    precision.set_precision(previous)
+
+if __name__ == "__main__":
+    bench_emissions()
+    bench_recursions()
+    bench_model_bank()
+    bench_topology()
+    bench_mixtures()
+    bench_frontend()
+    bench_precision()
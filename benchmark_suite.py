@@ -0,0 +1,323 @@
+"""
+Reproducible benchmark suite: front-end, emissions, recursions, training and
+scoring over a grid of utterance lengths, state counts, mixtures and corpus
+sizes, for every available kernel back-end. Inputs are seeded synthetic
+signals/features plus a fixed sample of dataset files (sorted, first
+SAMPLE_PER_DIGIT per digit), so two runs measure exactly the same work.
+
+    python benchmark_suite.py -o base.json                 # run, save
+    python benchmark_suite.py -o new.json --compare base.json
+    python benchmark_suite.py --diff base.json new.json    # compare saved runs
+    python benchmark_suite.py --only "score|forward" --repeats 50
+
+The grid is timed in ROUNDS passes of REPEATS calls per case (after a
+warm-up call, GC off); a case's median is its lowest per-round median, so
+a burst of load on the machine does not turn into a false regression.
+Results keep median / min / mean / std in ms. --compare and --diff flag cases
+whose median got slower than the baseline by more than --threshold
+(relative) and exit with status 1 if any did.
+"""
+import os
+import re
+import gc
+import sys
+import copy
+import glob
+import json
+import time
+import socket
+import platform
+import argparse
+import subprocess
+import numpy as np
+from src import hmm_kernels, precision
+from src.hmm_core import HMMManual
+from src.model_bank import ModelBank
+from src.signal_utils import pre_emphasis, frame_signal, apply_window
+from src.feature_extraction import compute_mfcc, compute_mfcc_batch
+from src.feature_cache import compute_files_features
+
+DATA_DIR = "zero_to_nine_voice"
+DIGITS = list(range(10))
+SAMPLE_PER_DIGIT = 5
+SAMPLE_RATE = 44100
+N_FEATURES = 12
+REPEATS = 10
+ROUNDS = 5 # Passes over the whole grid (see run_suite)
+THRESHOLD = 0.15    # Relative slowdown of the median that counts as a regression (run-to-run noise is ~10%)
+MIN_DELTA_MS = 0.01 # ...and it must be at least this much in absolute terms (timer noise)
+
+# Grid
+DURATIONS = (0.5, 1.5, 4.0) # Seconds of audio
+FRAMES = (50, 150, 400)     # Utterance lengths in frames
+STATES = (5, 8, 16)
+MIXTURES = (1, 4)
+CORPUS_SIZES = (10, 30, 50) # Utterances per EM iteration
+
+# ----------------------------------------------------------------------------
+# Timing and inputs
+# ----------------------------------------------------------------------------
+
+def measure(fn, repeats=REPEATS, setup=None):
+    """
+    Times fn() (or fn(setup()) with the setup outside the timed region).
+    Returns per-call times in seconds.
+    """
+    fn(setup()) if setup else fn() # Warm-up (JIT, caches)
+    times = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            if setup:
+                arg = setup()
+                t0 = time.perf_counter()
+                fn(arg)
+            else:
+                t0 = time.perf_counter()
+                fn()
+            times.append(time.perf_counter() - t0)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return np.array(times)
+
+def synthetic_signal(seconds, seed=0):
+    """140 Hz tone plus noise, on the int16 scale like read_wav."""
+    rng = np.random.RandomState(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    signal = 3000 * np.sin(2 * np.pi * 140 * t) + rng.randn(len(t)) * 1000
+    return signal.astype(precision.dtype)
+
+def synthetic_features(n_frames, seed=0):
+    return (np.random.RandomState(seed).randn(n_frames, N_FEATURES) * 10).astype(precision.dtype)
+
+def make_model(n_states, n_mix=1, seed=0, topology="left-to-right"):
+    """Model initialised (and split to n_mix) on synthetic data, not trained."""
+    X = synthetic_features(600, seed).astype(float)
+    hmm = HMMManual(n_states=n_states, n_mix=n_mix, topology=topology)
+    np.random.seed(seed)
+    hmm._init_params(X, [150] * 4)
+    if n_mix > 1:
+        hmm._split_mixtures(n_mix)
+    return hmm
+
+def dataset_sample():
+    """Fixed dataset sample: {digit: [paths]} with the first SAMPLE_PER_DIGIT sorted files."""
+    return {d: sorted(glob.glob(os.path.join(DATA_DIR, str(d), "*.wav")))[:SAMPLE_PER_DIGIT]
+            for d in DIGITS}
+
+def dataset_corpus(size):
+    """First `size` sorted files of digit 0 (for training-iteration cases)."""
+    return sorted(glob.glob(os.path.join(DATA_DIR, "0", "*.wav")))[:size]
+
+# ----------------------------------------------------------------------------
+# Cases: each generator yields (group, params, fn[, setup])
+# ----------------------------------------------------------------------------
+
+def cases_frontend():
+    for seconds in DURATIONS:
+        signal = synthetic_signal(seconds)
+        frames = apply_window(frame_signal(pre_emphasis(signal), SAMPLE_RATE))
+        yield "frame_signal", {"seconds": seconds}, lambda s=signal: frame_signal(s, SAMPLE_RATE)
+        yield "compute_mfcc", {"seconds": seconds}, lambda f=frames: compute_mfcc(f, SAMPLE_RATE)
+        yield "mfcc_pipeline", {"seconds": seconds}, \
+            lambda s=signal: compute_mfcc(apply_window(frame_signal(pre_emphasis(s), SAMPLE_RATE)), SAMPLE_RATE)
+    signals = [synthetic_signal(1.5, seed) for seed in range(20)]
+    yield "compute_mfcc_batch", {"utterances": 20, "seconds": 1.5}, \
+        lambda: compute_mfcc_batch(signals, SAMPLE_RATE)
+
+    sample = [f for files in dataset_sample().values() for f in files]
+    if sample:
+        yield "dataset_features", {"files": len(sample)}, lambda: compute_files_features(sample)
+
+def cases_emissions():
+    for backend in hmm_kernels.available_backends():
+        for n_states in STATES:
+            for n_mix in MIXTURES:
+                hmm = make_model(n_states, n_mix)
+                for T in FRAMES:
+                    X = synthetic_features(T, seed=1)
+                    yield "calc_log_B", {"T": T, "N": n_states, "M": n_mix, "backend": backend}, \
+                        lambda h=hmm, x=X: h._calc_log_B(x)
+
+def cases_recursions():
+    for backend in hmm_kernels.available_backends():
+        for n_states in STATES:
+            for topology in ("ergodic", "left-to-right"):
+                hmm = make_model(n_states, topology=topology)
+                for T in FRAMES:
+                    log_B = hmm._calc_log_B(synthetic_features(T, seed=1))
+                    params = {"T": T, "N": n_states, "topology": topology, "backend": backend}
+                    yield "forward", params, lambda h=hmm, b=log_B: h._forward(b)
+                    yield "backward", params, lambda h=hmm, b=log_B: h._backward(b)
+
+def cases_scoring():
+    for backend in hmm_kernels.available_backends():
+        for n_states in STATES:
+            for n_mix in MIXTURES:
+                models = {d: make_model(n_states, n_mix, seed=d) for d in DIGITS}
+                bank = ModelBank(models)
+                for T in FRAMES:
+                    X = synthetic_features(T, seed=1)
+                    params = {"T": T, "N": n_states, "M": n_mix, "backend": backend}
+                    yield "score", params, lambda h=models[0], x=X: h.score(x)
+                    yield "bank_score_all", params, lambda b=bank, x=X: b.score_all(x)
+
+    # Real utterances through the 10-model bank, all at once
+    sample = [f for files in dataset_sample().values() for f in files]
+    if sample:
+        feats = [m for m in compute_files_features(sample) if m is not None and len(m) > 0]
+        for backend in hmm_kernels.available_backends():
+            bank = ModelBank({d: make_model(8, 4, seed=d) for d in DIGITS})
+            yield "bank_score_batch", {"utterances": len(feats), "N": 8, "M": 4, "backend": backend}, \
+                lambda b=bank: b.score_batch(feats)
+
+def cases_training():
+    """One Baum-Welch iteration (E-step + M-step) on a fresh copy of the model."""
+    for backend in hmm_kernels.available_backends():
+        for size in CORPUS_SIZES:
+            files = dataset_corpus(size)
+            if len(files) < size:
+                continue
+            X = [m.astype(float) for m in compute_files_features(files) if m is not None and len(m) > 0]
+            for n_states in (5, 8):
+                for n_mix in MIXTURES:
+                    np.random.seed(0)
+                    hmm = HMMManual(n_states=n_states, n_mix=n_mix, topology="left-to-right")
+                    hmm._init_params(np.vstack(X), [len(x) for x in X])
+                    if n_mix > 1:
+                        hmm._split_mixtures(n_mix)
+                    yield "train_iteration", {"utterances": size, "N": n_states, "M": n_mix, "backend": backend}, \
+                        lambda h, x=X: h._em_iteration(x), lambda h=hmm: copy.deepcopy(h)
+
+SUITES = (cases_frontend, cases_emissions, cases_recursions, cases_scoring, cases_training)
+
+def case_name(group, params):
+    return group + "[" + ",".join(f"{k}={v}" for k, v in params.items()) + "]"
+
+# ----------------------------------------------------------------------------
+# Run / compare
+# ----------------------------------------------------------------------------
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "host": socket.gethostname(), "machine": platform.machine(),
+            "processor": platform.processor(), "cpus": os.cpu_count(),
+            "python": platform.python_version(), "numpy": np.__version__,
+            "backends": hmm_kernels.available_backends(), "precision": precision.name}
+
+def run_suite(only=None, repeats=REPEATS, rounds=ROUNDS):
+    """
+    Runs every case (matching the `only` regex). The whole grid is timed
+    `rounds` times, repeats per case per round, so a burst of load on the
+    machine hits one round of a case rather than all its samples; the
+    reported median is the lowest per-round median. Returns the results
+    dict that is saved as JSON: {"environment": {...}, "cases": {name: {...}}}.
+    """
+    pattern = re.compile(only) if only else None
+    previous = hmm_kernels.backend
+    cases = []
+    for suite in SUITES:
+        for group, params, fn, *setup in suite():
+            name = case_name(group, params)
+            if pattern is None or pattern.search(name):
+                cases.append((name, group, params, fn, setup[0] if setup else None))
+
+    samples = {name: [] for name, *_ in cases}
+    try:
+        for r in range(rounds):
+            print(f"Round {r + 1}/{rounds}: {len(cases)} cases")
+            for name, group, params, fn, setup in cases:
+                if "backend" in params:
+                    hmm_kernels.set_backend(params["backend"])
+                samples[name].append(measure(fn, repeats, setup) * 1e3)
+                hmm_kernels.set_backend(previous)
+    finally:
+        hmm_kernels.set_backend(previous)
+
+    results = {}
+    for name, group, params, _, _ in cases:
+        times = np.concatenate(samples[name])
+        round_medians = [float(np.median(t)) for t in samples[name]]
+        results[name] = {"group": group, "params": params, "repeats": repeats, "rounds": rounds,
+                         "median_ms": min(round_medians), "round_medians_ms": round_medians,
+                         "min_ms": float(times.min()), "mean_ms": float(times.mean()),
+                         "std_ms": float(times.std())}
+        print(f"{name:60s} {results[name]['median_ms']:10.3f} ms  (min {results[name]['min_ms']:.3f})")
+    return {"environment": environment(), "cases": results}
+
+def compare(base, new, threshold=THRESHOLD, min_delta_ms=MIN_DELTA_MS):
+    """
+    Compares two result dicts by median. Prints a table and returns the
+    names of the regressed cases.
+    """
+    keys = ("machine", "processor", "cpus", "precision", "numpy")
+    for k in keys:
+        if base["environment"].get(k) != new["environment"].get(k):
+            print(f"Warning: {k} differs ({base['environment'].get(k)} -> {new['environment'].get(k)}), "
+                  f"timings may not be comparable")
+    print(f"Baseline {base['environment'].get('commit')} ({base['environment'].get('date')})  ->  "
+          f"{new['environment'].get('commit')} ({new['environment'].get('date')})  "
+          f"threshold {threshold * 100:.0f}%")
+
+    regressions, improvements = [], []
+    for name, case in new["cases"].items():
+        if name not in base["cases"]:
+            continue
+        old_ms, new_ms = base["cases"][name]["median_ms"], case["median_ms"]
+        ratio = new_ms / old_ms if old_ms > 0 else float("inf")
+        flag = ""
+        if ratio > 1 + threshold and new_ms - old_ms > min_delta_ms:
+            flag = "REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 / (1 + threshold) and old_ms - new_ms > min_delta_ms:
+            flag = "faster"
+            improvements.append(name)
+        print(f"{name:60s} {old_ms:10.3f} -> {new_ms:10.3f} ms  x{ratio:5.2f}  {flag}")
+
+    missing = sorted(set(base["cases"]) - set(new["cases"]))
+    added = sorted(set(new["cases"]) - set(base["cases"]))
+    print("-" * 30)
+    print(f"Compared {len(set(base['cases']) & set(new['cases']))} cases: "
+          f"{len(regressions)} regressions, {len(improvements)} faster"
+          + (f", {len(missing)} only in baseline" if missing else "")
+          + (f", {len(added)} new" if added else ""))
+    for name in regressions:
+        print(f"  REGRESSION {name}")
+    return regressions
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+def save_results(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=1)
+    print(f"Results written to {path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark suite with JSON results and regression checks")
+    parser.add_argument("-o", "--out", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--compare", default=None, metavar="BASE", help="Compare this run against a saved baseline")
+    parser.add_argument("--diff", nargs=2, default=None, metavar=("BASE", "NEW"),
+                        help="Only compare two saved results, no run")
+    parser.add_argument("--only", default=None, help="Regex on case names, e.g. 'calc_log_B|score'")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="Timed calls per case per round")
+    parser.add_argument("--rounds", type=int, default=ROUNDS, help="Passes over the whole grid")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="Relative slowdown flagged as regression")
+    args = parser.parse_args()
+
+    if args.diff:
+        regressions = compare(load_results(args.diff[0]), load_results(args.diff[1]), args.threshold)
+    else:
+        results = run_suite(args.only, args.repeats, args.rounds)
+        if args.out:
+            save_results(results, args.out)
+        regressions = compare(load_results(args.compare), results, args.threshold) if args.compare else []
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,37 @@
+import os
+import pickle
+import argparse
+from src.model_io import save_bundle, load_bundle
+from src.feature_cache import DEFAULT_PARAMS
+
+MODEL_DIR = "models"
+BUNDLE_PATH = os.path.join(MODEL_DIR, "hmm_digits.bin")
+DIGITS = list(range(10))
+
+def convert(model_dir=MODEL_DIR, out_path=BUNDLE_PATH):
+    """
+    Pack the legacy models/hmm_{digit}.pkl pickles into one bundle file.
+    """
+    models = {}
+    for i in DIGITS:
+        path = os.path.join(model_dir, f"hmm_{i}.pkl")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                models[i] = pickle.load(f)
+    if not models:
+        print(f"No pickled models found in {model_dir}")
+        return
+
+    # The pickles predate endpoint trimming
+    save_bundle(models, out_path, frontend=dict(DEFAULT_PARAMS, vad=None))
+    # Round-trip check
+    loaded = load_bundle(out_path)
+    assert list(loaded) == list(models)
+    print(f"Wrote {len(models)} models to {out_path} ({os.path.getsize(out_path)} bytes)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert pickled HMMs to a single model bundle")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--out", default=BUNDLE_PATH)
+    args = parser.parse_args()
+    convert(args.model_dir, args.out)
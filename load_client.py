@@ -0,0 +1,145 @@
+"""
+Load generator for recognition_server.py: replays the held-out
+zero_to_nine_voice files (per digit [30:50], as test_accuracy.py) and
+measures throughput, latency percentiles and accuracy.
+
+Closed loop (default): --connections clients, each sends its next request
+as soon as the previous answer arrives. Open loop (--rate R): requests are
+fired at R per second (Poisson arrivals) over the connections whatever the
+server's pace, which shows queueing and tail latency under sustained load.
+"""
+import time
+import asyncio
+import argparse
+import itertools
+import numpy as np
+from src.server import encode_request, read_response
+from test_accuracy import iter_test_files
+
+def load_payloads(fmt="wav"):
+    """
+    [(digit, payload bytes, sample_rate or None), ...] of the held-out files.
+    """
+    from scipy.io import wavfile
+    payloads = []
+    for digit, path in iter_test_files():
+        if fmt == "wav":
+            with open(path, "rb") as f:
+                payloads.append((digit, f.read(), None))
+        else:
+            sr, signal = wavfile.read(path)
+            if signal.ndim > 1:
+                signal = signal[:, 0]
+            payloads.append((digit, signal.astype("<i2").tobytes(), sr))
+    return payloads
+
+class Connection:
+    """
+    One client connection; requests may be pipelined, answers are matched
+    to their request by id.
+    """
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.waiting = {}
+        self._reader_task = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self):
+        while True:
+            body = await read_response(self.reader)
+            if body is None:
+                break
+            future = self.waiting.pop(body.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(body)
+        for future in self.waiting.values():
+            future.set_exception(ConnectionError("Server closed the connection"))
+
+    async def request(self, request_id, payload, fmt, sample_rate):
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[request_id] = future
+        self.writer.write(encode_request(payload, fmt, sample_rate, request_id))
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        await self._reader_task
+
+async def connect(host, port, unix_path):
+    if unix_path is not None:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    return Connection(reader, writer)
+
+async def run(host="127.0.0.1", port=8765, unix_path=None, connections=8, n_requests=1000,
+              rate=None, fmt="wav", seed=0):
+    payloads = load_payloads(fmt)
+    order = np.random.RandomState(seed).permutation(n_requests) % len(payloads)
+    conns = [await connect(host, port, unix_path) for _ in range(connections)]
+    results = []
+    counter = itertools.count()
+
+    async def one(conn, i):
+        digit, payload, sr = payloads[order[i]]
+        t0 = time.perf_counter()
+        body = await conn.request(i, payload, fmt, sr)
+        results.append((time.perf_counter() - t0, digit, body))
+
+    start = time.perf_counter()
+    if rate is None:
+        async def worker(conn):
+            for i in iter(lambda: next(counter), None):
+                if i >= n_requests:
+                    return
+                await one(conn, i)
+        await asyncio.gather(*(worker(c) for c in conns))
+    else:
+        rng = np.random.RandomState(seed + 1)
+        tasks = []
+        t_next = start
+        for i in range(n_requests):
+            t_next += rng.exponential(1.0 / rate)
+            delay = t_next - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(conns[i % len(conns)], i)))
+        await asyncio.gather(*tasks)
+    wall = time.perf_counter() - start
+    for conn in conns:
+        await conn.close()
+
+    ok = [(lat, digit, body) for lat, digit, body in results if "error" not in body]
+    errors = len(results) - len(ok)
+    latency = np.array([lat for lat, _, _ in ok]) * 1e3
+    correct = sum(body["label"] == digit for _, digit, body in ok)
+    batch = np.array([body["batch_size"] for _, _, body in ok])
+    queue = np.array([body["queue_ms"] for _, _, body in ok])
+    compute = np.array([body["compute_ms"] for _, _, body in ok])
+
+    mode = f"open loop {rate:.0f} req/s" if rate is not None else "closed loop"
+    print("-" * 30)
+    print(f"{len(results)} requests ({fmt}), {connections} connections, {mode}")
+    print(f"Throughput: {len(results) / wall:.1f} req/s  ({wall:.2f} s)  Errors: {errors}")
+    if len(ok):
+        p50, p95, p99 = np.percentile(latency, [50, 95, 99])
+        print(f"Latency: p50 {p50:.2f} ms  p95 {p95:.2f} ms  p99 {p99:.2f} ms  max {latency.max():.2f} ms")
+        print(f"Server: batch size mean {batch.mean():.1f} (max {batch.max()})  "
+              f"queue mean {queue.mean():.2f} ms  batch compute mean {compute.mean():.2f} ms")
+        print(f"Accuracy: {100.0 * correct / len(ok):.2f}% ({correct}/{len(ok)})")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay dataset files against recognition_server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="Connect to this Unix socket instead of TCP")
+    parser.add_argument("-c", "--connections", type=int, default=8)
+    parser.add_argument("-n", "--requests", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=None, help="Open loop: requests per second")
+    parser.add_argument("--format", choices=["wav", "pcm16"], default="wav")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(run(args.host, args.port, args.unix, args.connections, args.requests,
+                    args.rate, args.format, args.seed))
@@ -0,0 +1,54 @@
+"""
+Headless recognition daemon (see src/server.py for the wire format).
+
+    python recognition_server.py --port 8765
+    python recognition_server.py --unix /tmp/digits.sock
+
+Load it with load_client.py.
+"""
+import os
+import signal
+import asyncio
+import argparse
+import numpy as np
+from src.model_bank import ModelBank
+from src.model_io import read_header
+from src.server import RecognitionServer
+from src.feature_cache import DEFAULT_PARAMS
+from src import hmm_kernels, precision, instrument
+from test_accuracy import load_models, BUNDLE_PATH
+
+async def serve(host, port, unix_path, batch_window, max_batch):
+    bank = ModelBank(load_models())
+    # Same front-end as the models were trained with
+    params = read_header(BUNDLE_PATH)[0]["frontend"] if os.path.exists(BUNDLE_PATH) else DEFAULT_PARAMS
+    bank.score_batch([np.zeros((2, bank.n_features))]) # Compile/warm up
+
+    server = RecognitionServer(bank, params, batch_window, max_batch)
+    await server.start(host, port, unix_path)
+    where = unix_path if unix_path is not None else f"{host}:{port}"
+    print(f"Serving {len(bank.labels)} models on {where}  (window {batch_window * 1e3:.1f} ms, "
+          f"max batch {max_batch}, kernel {hmm_kernels.backend}, {precision.name})")
+    # Ctrl-C or SIGTERM: stop accepting, print the counters
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await server.close()
+        print(f"Requests: {server.requests}  Batches: {server.batches}  Errors: {server.errors}")
+        if instrument.enabled:
+            print(instrument.summary())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve digit recognition over a socket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument("--window-ms", type=float, default=0.0,
+                        help="Extra wait for more requests before a batch (ms)")
+    parser.add_argument("--max-batch", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.unix, args.window_ms / 1e3, args.max_batch))
@@ -0,0 +1,122 @@
+"""
+Continuous mode without a microphone: held-out dataset WAVs are joined with
+pauses and replayed through SimulatedInputStream into ContinuousRecognizer,
+exactly as the GUI's InputStream would feed it.
+"""
+import os
+import glob
+import time
+import argparse
+import numpy as np
+from src.signal_utils import read_wav
+from src.model_bank import ModelBank
+from src.live import ContinuousRecognizer, SimulatedInputStream
+from test_accuracy import load_models, DATA_DIR, DIGITS
+
+def room_tone(signal, n, sr, rng):
+    """
+    n samples of the recording's own background: its first 50 ms (before
+    the speaker starts), tiled with random sign flips.
+    """
+    tone = signal[:int(0.05 * sr)].astype(float)
+    tone = tone - tone.mean()
+    reps = -(-n // len(tone))
+    return np.concatenate([tone * rng.choice([-1, 1]) for _ in range(reps)])[:n]
+
+def build_stream(n_utterances, gap=0.6, seed=0):
+    """
+    Random held-out files (per digit [30:50], as test_accuracy.py) separated
+    by `gap` seconds of each recording's own background.
+    Returns (signal, sample_rate, [(digit, start_s, end_s), ...]).
+    """
+    rng = np.random.RandomState(seed)
+    pool = []
+    for digit in DIGITS:
+        files = glob.glob(os.path.join(DATA_DIR, str(digit), "*.wav"))
+        pool += [(digit, f) for f in files[30:50]]
+    picks = [pool[i] for i in rng.choice(len(pool), n_utterances, replace=False)]
+
+    sr = None
+    parts = []
+    truth = []
+    pos = 0
+    for digit, path in picks:
+        file_sr, signal = read_wav(path)
+        if sr is None:
+            sr = file_sr
+        if file_sr != sr or len(signal) == 0:
+            continue
+        pause = room_tone(signal, int(gap * sr), sr, rng)
+        parts += [pause, signal.astype(float)]
+        pos += len(pause)
+        truth.append((digit, pos / sr, (pos + len(signal)) / sr))
+        pos += len(signal)
+    parts.append(room_tone(signal, int(gap * sr), sr, rng))
+    return np.concatenate(parts), sr, truth
+
+def match(truth, results):
+    """
+    Pair each spoken digit with the detection overlapping it the most.
+    """
+    correct = 0
+    used = set()
+    for digit, t0, t1 in truth:
+        best, best_overlap = None, 0.0
+        for i, (label, s0, s1, _) in enumerate(results):
+            overlap = min(t1, s1) - max(t0, s0)
+            if overlap > best_overlap and i not in used:
+                best, best_overlap = i, overlap
+        if best is not None:
+            used.add(best)
+            correct += results[best][0] == digit
+    return correct, len(used), len(results) - len(used)
+
+def simulate(n_utterances=50, realtime=False, block_size=1024, seed=0):
+    signal, sr, truth = build_stream(n_utterances, seed=seed)
+    bank = ModelBank(load_models())
+
+    results = []
+    wall_start = None
+    def on_result(label, ranked, start_s, end_s):
+        # Decision delay: wall time since the utterance's audio ended
+        delay = time.perf_counter() - wall_start - end_s if realtime else 0.0
+        results.append((label, start_s, end_s, delay))
+        print(f"[{start_s:6.2f}-{end_s:6.2f} s] digit {label}")
+
+    recognizer = ContinuousRecognizer(bank, sr, on_result)
+    if realtime:
+        # Same threading as the GUI: audio thread -> ring buffer -> consumer thread
+        callback = recognizer.audio_callback
+        recognizer.start()
+    else:
+        # As fast as possible: consume each block right after it is queued
+        # (a free-running producer would just overrun the ring buffer)
+        def callback(*args):
+            recognizer.audio_callback(*args)
+            recognizer.process_available()
+    wall_start = time.perf_counter()
+    with SimulatedInputStream(signal, sr, block_size, callback, realtime) as stream:
+        stream.wait()
+    recognizer.stop()
+    wall = time.perf_counter() - wall_start
+
+    audio_s = len(signal) / sr
+    correct, detected, extra = match(truth, results)
+    print("-" * 30)
+    print(f"Spoken: {len(truth)}  Detected: {detected}  Correct: {correct} "
+          f"({100.0 * correct / len(truth):.1f}%)  False alarms: {extra}")
+    print(f"Audio {audio_s:.1f} s, consumer busy {recognizer.busy_time:.2f} s "
+          f"(RTF {recognizer.busy_time / audio_s:.4f}), wall {wall:.2f} s")
+    print(f"Dropped samples: {recognizer.ring.dropped}  Input overflows: {recognizer.input_overflows}")
+    if realtime and results:
+        delays = np.array([r[3] for r in results]) * 1e3
+        print(f"Decision delay after end of speech: mean {delays.mean():.0f} ms  max {delays.max():.0f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay dataset WAVs through the continuous recognizer")
+    parser.add_argument("-n", type=int, default=50, help="Utterances in the simulated stream")
+    parser.add_argument("--realtime", action="store_true", help="Pace the stream like a sound card")
+    parser.add_argument("--block-size", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    simulate(args.n, args.realtime, args.block_size, args.seed)
@@ -0,0 +1,78 @@
+"""
+Connected-digit recognition: the digit HMMs (plus an optional silence HMM)
+joined into one looped network and decoded with token-passing Viterbi.
+
+    start --> [0] [1] ... [9] [sil] --> word end --+
+                ^                                  |
+                +----------------------------------+
+
+Each frame, the best word end can start any model again, so one pass over
+the utterance gives the best digit string and where each digit lies.
+"""
+import numpy as np
+from src import hmm_kernels
+from src.model_bank import ModelBank
+
+SILENCE = "sil"
+
+
+class ConnectedDigitDecoder:
+    """
+    models: {label: HMMManual} digit models (as loaded for isolated scoring).
+    silence: optional HMMManual for pauses between digits (not reported).
+    word_penalty: log-prob added each time a digit starts; more negative
+        means fewer, longer digits (insertion penalty).
+    silence_penalty: same for entering the silence model.
+    min_digit / max_digit: duration limits of one digit, in seconds. The
+        digit HMMs have no exit state (a left-to-right model, the default,
+        may end a word in any of its states), so without them a model
+        happily splits one digit or runs across several.
+    min_silence: shortest pause, in seconds (pauses have no upper limit).
+    frame_stride: seconds per feature frame, for durations and timings.
+    """
+    def __init__(self, models, silence=None, word_penalty=-100.0, silence_penalty=0.0,
+                 min_digit=0.2, max_digit=0.85, min_silence=0.03, frame_stride=0.010):
+        models = dict(models)
+        if silence is not None:
+            models[SILENCE] = silence
+        self.bank = ModelBank(models)
+        self.frame_stride = frame_stride
+        self.log_enter = np.array([silence_penalty if label == SILENCE else word_penalty
+                                   for label in self.bank.labels], dtype=float)
+        to_frames = lambda seconds: max(1, int(round(seconds / frame_stride)))
+        no_limit = np.iinfo(np.int64).max
+        self.min_frames = np.array([to_frames(min_silence) if label == SILENCE else to_frames(min_digit)
+                                    for label in self.bank.labels], dtype=np.int64)
+        self.max_frames = np.array([no_limit if label == SILENCE else to_frames(max_digit)
+                                    for label in self.bank.labels], dtype=np.int64)
+
+    def decode_frames(self, observation):
+        """
+        Returns (score, [(label, start_frame, end_frame), ...]) including
+        silence segments; end_frame is exclusive. An utterance too short for
+        any word gives (-inf, []).
+        """
+        log_B = self.bank.emissions(observation)
+        score, end_model, end_start = hmm_kernels.connected_viterbi(
+            self.bank.log_pi, self.bank.log_A, log_B, self.log_enter, self.min_frames, self.max_frames)
+
+        # Follow the word-end records back from the last frame
+        segments = []
+        t = len(observation) - 1
+        if t < 0 or end_model[t] < 0:
+            return -np.inf, segments
+        while t >= 0:
+            start = int(end_start[t])
+            segments.append((self.bank.labels[end_model[t]], start, t + 1))
+            t = start - 1
+        segments.reverse()
+        return float(score), segments
+
+    def decode(self, observation):
+        """
+        Digit string of an utterance with timings.
+        Returns [(label, start_s, end_s), ...] without silence segments.
+        """
+        _, segments = self.decode_frames(observation)
+        return [(label, start * self.frame_stride, end * self.frame_stride)
+                for label, start, end in segments if label != SILENCE]
@@ -0,0 +1,80 @@
+"""
+Deterministic corpus listing and k-fold splits for cross-validation.
+
+Files are sorted before anything else, so the folds do not depend on the
+order the filesystem lists them in (unlike glob slices). Two ways to split:
+- 'file': per digit, the files are shuffled with the seed and dealt round
+  robin into k folds (every fold gets ~1/k of each digit)
+- 'speaker': whole speakers go to one fold, so the test speaker is never
+  seen in training; k is capped at the number of speakers
+"""
+import os
+import glob
+import numpy as np
+
+SPLITS = ("file", "speaker")
+
+
+def speaker_of(path):
+    """
+    Speaker name from the dataset file name: <speaker>_<digit>_<n>.wav
+    """
+    return os.path.basename(path).split("_")[0]
+
+
+def list_corpus(data_dir, digits=range(10)):
+    """
+    Every WAV of the dataset, sorted. Returns (paths, labels, speakers) lists.
+    """
+    paths, labels, speakers = [], [], []
+    for digit in digits:
+        for path in sorted(glob.glob(os.path.join(data_dir, str(digit), "*.wav"))):
+            paths.append(path)
+            labels.append(digit)
+            speakers.append(speaker_of(path))
+    return paths, labels, speakers
+
+
+def kfold_by_file(labels, k, seed=0):
+    """
+    Fold id per file, stratified by label. Returns an int array.
+    """
+    labels = np.asarray(labels)
+    folds = np.empty(len(labels), dtype=np.int64)
+    rng = np.random.RandomState(seed)
+    for label in sorted(set(labels.tolist())):
+        idx = np.flatnonzero(labels == label)
+        folds[idx[rng.permutation(len(idx))]] = np.arange(len(idx)) % k
+    return folds
+
+
+def kfold_by_speaker(speakers, k, seed=0):
+    """
+    Fold id per file with all files of a speaker in the same fold. Speakers
+    (in a seeded order) go largest first to the fold with the fewest files.
+    Returns (folds int array, k actually used).
+    """
+    names = sorted(set(speakers))
+    k = min(k, len(names))
+    sizes = {name: 0 for name in names}
+    for s in speakers:
+        sizes[s] += 1
+    order = [names[i] for i in np.random.RandomState(seed).permutation(len(names))]
+    order.sort(key=lambda name: -sizes[name]) # Stable: ties keep the seeded order
+    fold_of, fill = {}, np.zeros(k, dtype=np.int64)
+    for name in order:
+        f = int(np.argmin(fill))
+        fold_of[name] = f
+        fill[f] += sizes[name]
+    return np.array([fold_of[s] for s in speakers], dtype=np.int64), k
+
+
+def make_folds(labels, speakers, k, split="file", seed=0):
+    """
+    Fold id per file for split 'file' or 'speaker'. Returns (folds, k).
+    """
+    if split == "file":
+        return kfold_by_file(labels, k, seed), k
+    if split == "speaker":
+        return kfold_by_speaker(speakers, k, seed)
+    raise ValueError(f"Unknown split '{split}' (expected one of {SPLITS})")
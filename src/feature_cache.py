@@ -0,0 +1,274 @@
+"""
+Persistent MFCC feature store.
+
+Layout of one store (one directory per front-end configuration):
+    <cache_dir>/<params_hash>/features.bin   all MFCC frames, row-major (rows, n_features), in the
+                                             compute precision (float64 or float32, see src.precision)
+    <cache_dir>/<params_hash>/index.json     {path: [mtime_ns, size, row_offset, n_frames]}
+
+An entry is valid only while the WAV file keeps the same mtime and size;
+changing any front-end parameter (or the precision) changes params_hash
+and so selects a fresh store. Hits are returned as read-only np.memmap views (no copy, no decode).
+
+A re-computed entry is appended and its old rows become dead; once they
+are more than COMPACT_RATIO of the file, flush() rewrites features.bin
+with the live rows only (views handed out before keep the old file).
+"""
+import os
+import json
+import hashlib
+import numpy as np
+from src import precision
+from src.signal_utils import read_wav
+from src.feature_extraction import compute_mfcc_batch, split_batch
+
+
+CACHE_DIR = ".feature_cache"
+COMPACT_RATIO = 0.25 # Rewrite features.bin once this fraction of its rows is dead
+
+# Bump when the feature code changes in a way the parameters do not capture
+FEATURE_VERSION = 2
+
+# Arguments of each front-end stage, as used by train_scratch.py / test_accuracy.py
+DEFAULT_PARAMS = {
+    "pre_emphasis": {"alpha": 0.97},
+    "frame_signal": {"frame_size": 0.025, "frame_stride": 0.010},
+    "apply_window": {"window": "hamming"},
+    "compute_mfcc": {"num_ceps": 12, "nfilt": 26, "NFFT": 512},
+    # Endpoint trimming between framing and windowing (None = keep every frame)
+    "vad": {"margin_frames": 5, "energy_ratio": 0.25, "zcr_threshold": 0.25, "zcr_energy_ratio": 0.1},
+}
+
+WINDOWS = {"hamming": np.hamming, "hanning": np.hanning}
+
+
+def params_hash(params, dtype="float64"):
+    """
+    Stable short hash of the front-end parameters (plus FEATURE_VERSION and
+    the feature dtype name).
+    """
+    blob = json.dumps({"version": FEATURE_VERSION, "params": params, "dtype": dtype}, sort_keys=True)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def compute_signals_features(signals, sample_rate, params=DEFAULT_PARAMS):
+    """
+    Batched front-end (compute_mfcc_batch) for signals at one sample rate.
+    Returns a list of per-utterance MFCC views, None for empty signals.
+    """
+    mfcc, offsets = compute_mfcc_batch(signals, sample_rate,
+                                       alpha=params["pre_emphasis"]["alpha"],
+                                       window_func=WINDOWS[params["apply_window"]["window"]],
+                                       vad=params.get("vad"),
+                                       **params["frame_signal"], **params["compute_mfcc"])
+    return [m if len(s) > 0 else None for s, m in zip(signals, split_batch(mfcc, offsets))]
+
+
+def compute_files_features(file_paths, params=DEFAULT_PARAMS):
+    """
+    read -> pre-emphasis -> framing -> VAD trim -> window -> MFCC for a list
+    of WAV files: reads every file, then runs the batched front-end once per
+    sample rate. Returns a list aligned with file_paths, None for empty files.
+    """
+    by_rate = {}
+    for i, path in enumerate(file_paths):
+        sr, signal = read_wav(path)
+        by_rate.setdefault(sr, []).append((i, signal))
+
+    out = [None] * len(file_paths)
+    for sr, items in by_rate.items():
+        feats = compute_signals_features([signal for _, signal in items], sr, params)
+        for (i, _), mfcc in zip(items, feats):
+            out[i] = mfcc
+    return out
+
+
+class FeatureStore:
+    """
+    Consolidated on-disk MFCC cache for one front-end configuration.
+
+    Usage:
+        with FeatureStore() as store:
+            mfcc = store.get("zero_to_nine_voice/3/toan_3_1.wav")
+
+    Not safe for concurrent writers; readers may share a flushed store.
+    """
+    def __init__(self, cache_dir=CACHE_DIR, params=DEFAULT_PARAMS):
+        self.params = params
+        self.n_features = params["compute_mfcc"]["num_ceps"]
+        self.dtype = np.dtype(precision.dtype)
+        self.store_dir = os.path.join(cache_dir, params_hash(params, self.dtype.name))
+        self.data_path = os.path.join(self.store_dir, "features.bin")
+        self.index_path = os.path.join(self.store_dir, "index.json")
+        os.makedirs(self.store_dir, exist_ok=True)
+
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as f:
+                self.index = json.load(f)["entries"]
+
+        # Rows actually present in features.bin; drop a torn tail after a crash
+        row_bytes = self.dtype.itemsize * self.n_features
+        n_bytes = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        self.n_rows = n_bytes // row_bytes
+        if n_bytes != self.n_rows * row_bytes:
+            os.truncate(self.data_path, self.n_rows * row_bytes)
+
+        self._writer = None
+        self._mm = None
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _memmap(self, end_row):
+        # (Re)open the data file once it grows past the current mapping
+        if self._mm is None or self._mm.shape[0] < end_row:
+            if self._writer is not None:
+                self._writer.flush()
+            self._mm = np.memmap(self.data_path, dtype=self.dtype, mode="r",
+                                 shape=(self.n_rows, self.n_features))
+        return self._mm
+
+    def _lookup(self, key, stat):
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        mtime_ns, size, offset, n_frames = entry
+        if mtime_ns != stat.st_mtime_ns or size != stat.st_size:
+            return None  # Audio changed since it was cached
+        if offset + max(n_frames, 0) > self.n_rows:
+            return None  # Data lost (torn write)
+        return entry
+
+    def _read(self, offset, n_frames):
+        if n_frames < 0:
+            return None
+        if n_frames == 0:
+            return np.empty((0, self.n_features), dtype=self.dtype)
+        return self._memmap(offset + n_frames)[offset:offset + n_frames]
+
+    def _append(self, key, stat, mfcc):
+        offset = self.n_rows
+        if mfcc is None:
+            n_frames = -1  # Remember "no audio" too
+        else:
+            n_frames = mfcc.shape[0]
+            if self._writer is None:
+                self._writer = open(self.data_path, "ab")
+            self._writer.write(np.ascontiguousarray(mfcc, dtype=self.dtype).tobytes())
+            self.n_rows += n_frames
+        self.index[key] = [stat.st_mtime_ns, stat.st_size, offset, n_frames]
+        self._dirty = True
+
+    def get(self, file_path):
+        """
+        MFCC of a WAV file, from the cache when valid, otherwise computed and
+        appended. Returns a (n_frames, n_features) array or None for empty audio.
+        """
+        return self.get_many([file_path])[0]
+
+    def get_many(self, file_paths):
+        """
+        get() for a list of files. All misses go through the batched
+        front-end together. Returns a list aligned with file_paths.
+        """
+        out = [None] * len(file_paths)
+        missing = []
+        for i, path in enumerate(file_paths):
+            key = os.path.abspath(path)
+            stat = os.stat(key)
+            entry = self._lookup(key, stat)
+            if entry is not None:
+                self.hits += 1
+                out[i] = self._read(entry[2], entry[3])
+            else:
+                self.misses += 1
+                missing.append((i, key, stat))
+
+        if missing:
+            feats = compute_files_features([key for _, key, _ in missing], self.params)
+            for (i, key, stat), mfcc in zip(missing, feats):
+                self._append(key, stat, mfcc)
+                out[i] = mfcc
+        return out
+
+    def lookup(self, file_path):
+        """
+        Cached MFCC of a WAV file, without computing anything on a miss.
+        Returns (hit, mfcc); mfcc is None on a miss or for empty audio.
+        """
+        key = os.path.abspath(file_path)
+        entry = self._lookup(key, os.stat(key))
+        if entry is None:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, self._read(entry[2], entry[3])
+
+    def put(self, file_path, mfcc):
+        """
+        Add features computed elsewhere (e.g. in a worker process, the store
+        itself has a single writer). mfcc None records empty audio.
+        """
+        key = os.path.abspath(file_path)
+        self._append(key, os.stat(key), mfcc)
+
+    def dead_rows(self):
+        """
+        Rows of features.bin no index entry points to (replaced entries).
+        """
+        return self.n_rows - sum(max(entry[3], 0) for entry in self.index.values())
+
+    def _compact(self):
+        # Copy the live rows to a new file in offset order. The old index is
+        # removed before the data file is swapped, so a crash in between
+        # leaves an empty (rebuilt) cache rather than wrong offsets.
+        self._writer.close()
+        self._writer = None
+        old = self._memmap(self.n_rows)
+        tmp_path = self.data_path + ".tmp"
+        offset = 0
+        with open(tmp_path, "wb") as f:
+            for entry in sorted(self.index.values(), key=lambda e: e[2]):
+                n_frames = max(entry[3], 0)
+                f.write(old[entry[2]:entry[2] + n_frames].tobytes())
+                entry[2] = offset
+                offset += n_frames
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+        os.replace(tmp_path, self.data_path)
+        self.n_rows = offset
+        self._mm = None
+
+    def flush(self):
+        """
+        Persist appended frames, then the index (so the index never points
+        past the data). Compacts the data file first when enough of it is dead.
+        """
+        if self._writer is not None:
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+        if self._dirty:
+            if self._writer is not None and self.dead_rows() > COMPACT_RATIO * self.n_rows:
+                self._compact()
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"version": FEATURE_VERSION, "params": self.params, "dtype": self.dtype.name,
+                           "n_features": self.n_features, "entries": self.index}, f)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+
+    def close(self):
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._mm = None
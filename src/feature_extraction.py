@@ -1,20 +1,28 @@
 import numpy as np
-from scipy.fftpack import dct
+from functools import lru_cache
+from src import precision, instrument
+from src.signal_utils import pre_emphasis, frame_signal, get_window
+from src.vad import trim_silence
 
+@instrument.timed("compute_fft_power")
 def compute_fft_power(frames, NFFT=512):
     """
     Compute Power Spectrum of each frame.
     1. Apply FFT (np.fft.rfft for real input)
     2. Compute Power: |FFT|^2 / N
+    Returned in the dtype of the frames. The FFT itself always runs in
+    float64: NumPy's float32 rfft is ~3x slower than the float64 one.
     """
     # rfft returns NFFT/2 + 1 bins
-    mag_frames = np.absolute(np.fft.rfft(frames, NFFT))
-    pow_frames = ((1.0 / NFFT) * ((mag_frames) ** 2))
-    return pow_frames
+    spectrum = np.fft.rfft(frames.astype(np.float64, copy=False), NFFT)
+    pow_frames = (spectrum.real ** 2 + spectrum.imag ** 2) * (1.0 / NFFT)
+    return pow_frames.astype(frames.dtype, copy=False)
 
-def create_mel_filterbank(sample_rate, NFFT=512, nfilt=40):
+@lru_cache(maxsize=32)
+def create_mel_filterbank(sample_rate, NFFT=512, nfilt=40, dtype=np.float64):
     """
     Create Mel Filterbank Matrix manually.
+    Memoized per (sample_rate, NFFT, nfilt, dtype); the returned matrix is read-only.
     """
     low_freq_mel = 0
     high_freq_mel = (2595 * np.log10(1 + (sample_rate / 2) / 700))  # Convert Hz to Mel
@@ -25,44 +33,65 @@ def create_mel_filterbank(sample_rate, NFFT=512, nfilt=40):
     
     bin = np.floor((NFFT + 1) * hz_points / sample_rate)
 
-    fbank = np.zeros((nfilt, int(np.floor(NFFT / 2 + 1))))
+    # Triangles for all filters at once: rising edge on [left, center),
+    # falling edge on [center, right)
+    k = np.arange(int(np.floor(NFFT / 2 + 1)))[None, :]
+    left = bin[:-2, None]
+    center = bin[1:-1, None]
+    right = bin[2:, None]
     
-    for m in range(1, nfilt + 1):
-        f_m_minus = int(bin[m - 1])   # left
-        f_m = int(bin[m])             # center
-        f_m_plus = int(bin[m + 1])    # right
-
-        for k in range(f_m_minus, f_m):
-            fbank[m - 1, k] = (k - bin[m - 1]) / (bin[m] - bin[m - 1])
-            
-        for k in range(f_m, f_m_plus):
-            fbank[m - 1, k] = (bin[m + 1] - k) / (bin[m + 1] - bin[m])
-            
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rising = (k - left) / (center - left)
+        falling = (right - k) / (right - center)
+    fbank = np.where((k >= left) & (k < center), rising,
+                     np.where((k >= center) & (k < right), falling, 0.0)).astype(dtype)
+    
+    fbank.flags.writeable = False
     return fbank
 
+@lru_cache(maxsize=32)
+def create_dct_matrix(nfilt, num_ceps, dtype=np.float64):
+    """
+    First num_ceps rows of the orthonormal DCT-II of length nfilt, transposed
+    to (nfilt, num_ceps) so that mfcc = log_fbank @ dct_matrix.
+    Same as scipy dct(type=2, norm='ortho')[:, :num_ceps]. Read-only.
+    """
+    n = np.arange(nfilt)[:, None]
+    k = np.arange(num_ceps)[None, :]
+    basis = np.cos(np.pi * k * (2 * n + 1) / (2 * nfilt)) * np.sqrt(2.0 / nfilt)
+    basis[:, 0] = np.sqrt(1.0 / nfilt)
+    basis = basis.astype(dtype)
+    basis.flags.writeable = False
+    return basis
+
+@instrument.timed("compute_mfcc")
 def compute_mfcc(frames, sample_rate, num_ceps=12, nfilt=26, NFFT=512):
     """
     Full pipeline: Frames -> Power Spec -> Mel Filterbank -> Log -> DCT -> MFCC
+    Computed in the dtype of the frames (float32 or float64).
     """
+    if instrument.enabled:
+        instrument.count("frames", len(frames))
     pow_frames = compute_fft_power(frames, NFFT)
+    dtype = pow_frames.dtype
+    eps = np.finfo(dtype).eps
     
     # Check energy to prevent log(0)
-    pow_frames[pow_frames == 0] = np.finfo(float).eps
+    pow_frames[pow_frames == 0] = eps
     
-    fbank = create_mel_filterbank(sample_rate, NFFT, nfilt)
+    fbank = create_mel_filterbank(sample_rate, NFFT, nfilt, dtype)
     filter_banks = np.dot(pow_frames, fbank.T)
-    filter_banks = np.where(filter_banks == 0, np.finfo(float).eps, filter_banks)  # Numerical Stability
+    filter_banks = np.where(filter_banks == 0, eps, filter_banks)  # Numerical Stability
     filter_banks = np.log(filter_banks)
     
     # DCT to get MFCC
     # type=2 is the standard, norm='ortho' is common
-    mfcc = dct(filter_banks, type=2, axis=1, norm='ortho')
-    
     # Keep only 2 to num_ceps+1 (discard 0th usually, but some keep it)
     # Let's keep 1-13 (indices 1 to 13) or 0-12 depending on preference.
     # Usually coefficient 0 is energy, we handle it separately or keep it.
     # User plan: 13 coeffs.
-    mfcc = mfcc[:, :num_ceps] 
+    # Only the kept coefficients are computed: (T, nfilt) @ (nfilt, num_ceps)
+    mfcc = np.dot(filter_banks, create_dct_matrix(nfilt, num_ceps, dtype))
     
     # Sinusoidal liftering (optional but good for speech)
     # cep_lifter = 22
@@ -72,3 +101,77 @@ def compute_mfcc(frames, sample_rate, num_ceps=12, nfilt=26, NFFT=512):
     # mfcc *= lift
     
     return mfcc
+
+@instrument.timed("compute_mfcc_batch")
+def compute_mfcc_batch(signals, sample_rate, num_ceps=12, nfilt=26, NFFT=512,
+                       frame_size=0.025, frame_stride=0.010, alpha=0.97, window_func=np.hamming,
+                       block_frames=256, vad=None):
+    """
+    Front-end for many utterances at once (all at the same sample_rate).
+    Frames of all signals are packed back to back into fixed-size blocks that
+    span utterance boundaries; each block gets one rFFT, one filterbank matmul
+    and one DCT. Blocks of a few hundred frames stay in cache, which is faster
+    than one huge buffer; block_frames=None packs everything into one block.
+    
+    Returns (mfcc, offsets): mfcc is (total_frames, num_ceps) and utterance i
+    is mfcc[offsets[i]:offsets[i+1]] (empty signals get 0 frames).
+    Use split_batch() for the list of per-utterance views.
+    vad: None, or keyword arguments for trim_silence (leading/trailing
+    non-speech frames are dropped before windowing).
+    Everything after pre-emphasis runs in the compute precision (src.precision).
+    """
+    dtype = precision.dtype
+    frame_length = int(round(frame_size * sample_rate))
+    window = get_window(window_func, frame_length, dtype)
+    # rfft(frames, NFFT) only reads the first NFFT samples of each frame,
+    # so only those are windowed and buffered
+    n_keep = min(frame_length, NFFT)
+    window = window[:n_keep]
+    
+    framed = []
+    for signal in signals:
+        if len(signal) == 0:
+            framed.append(None)
+            continue
+        signal = np.asarray(signal, dtype=dtype)
+        frames = frame_signal(pre_emphasis(signal, alpha), sample_rate, frame_size, frame_stride)
+        if vad is not None:
+            frames = trim_silence(frames, **vad)
+        framed.append(frames)
+    
+    offsets = np.zeros(len(signals) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([0 if f is None else len(f) for f in framed])
+    total = int(offsets[-1])
+    
+    mfcc = np.empty((total, num_ceps), dtype=dtype)
+    if total == 0:
+        return mfcc, offsets
+    
+    block_frames = total if block_frames is None else min(block_frames, total)
+    block = np.empty((block_frames, n_keep), dtype=dtype)
+    fill = 0
+    done = 0
+    for f in framed:
+        if f is None:
+            continue
+        pos = 0
+        while pos < len(f):
+            n = min(block_frames - fill, len(f) - pos)
+            # Windowing writes straight into the block
+            np.multiply(f[pos:pos + n, :n_keep], window, out=block[fill:fill + n])
+            fill += n
+            pos += n
+            if fill == block_frames:
+                mfcc[done:done + fill] = compute_mfcc(block, sample_rate, num_ceps, nfilt, NFFT)
+                done += fill
+                fill = 0
+    if fill > 0:
+        mfcc[done:done + fill] = compute_mfcc(block[:fill], sample_rate, num_ceps, nfilt, NFFT)
+    
+    return mfcc, offsets
+
+def split_batch(mfcc, offsets):
+    """
+    Per-utterance views into a compute_mfcc_batch result (no copies).
+    """
+    return [mfcc[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
@@ -1,34 +1,155 @@
+import os
+import time
+import pickle
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from src import hmm_kernels, precision, instrument
+
+# Transition structure -> band width K (arcs i -> i..i+K-1), None = dense
+TOPOLOGIES = {
+    "ergodic": None,            # Any state to any state
+    "left-to-right": 2,         # Stay or move to the next state
+    "left-to-right-skip": 3,    # ... or skip one state
+}
+
+def band_to_dense(A_band):
+    """
+    (N, K) band (column k = arc i -> i+k) -> dense (N, N) matrix.
+    """
+    n_states, width = A_band.shape
+    A = np.zeros((n_states, n_states), dtype=A_band.dtype)
+    for k in range(width):
+        idx = np.arange(n_states - k)
+        A[idx, idx + k] = A_band[:n_states - k, k]
+    return A
+
+def dense_to_band(A, width):
+    """
+    Dense (N, N) -> (N, K) band; arcs outside the band are dropped.
+    """
+    n_states = A.shape[0]
+    A_band = np.zeros((n_states, width), dtype=A.dtype)
+    for k in range(min(width, n_states)):
+        idx = np.arange(n_states - k)
+        A_band[idx, k] = A[idx, idx + k]
+    return A_band
+
+class TrainingHistory:
+    """
+    What HMMManual.train did, one record per EM iteration:
+    n_mix (components per state at that stage), iteration (within the stage),
+    log_likelihood (total over the training data, under the parameters going
+    into the iteration), frames, time (s) and phases {name: seconds}.
+    """
+    def __init__(self):
+        self.records = []
+        self.stopped_early = 0  # Stages ended by the tolerance rather than n_iter
+
+    def add(self, n_mix, iteration, log_likelihood, frames, phases):
+        self.records.append({"n_mix": n_mix, "iteration": iteration,
+                             "log_likelihood": float(log_likelihood), "frames": int(frames),
+                             "time": sum(phases.values()), "phases": dict(phases)})
+
+    @property
+    def log_likelihood(self):
+        return [r["log_likelihood"] for r in self.records]
+
+    @property
+    def total_time(self):
+        return sum(r["time"] for r in self.records)
+
+    def phase_totals(self):
+        totals = {}
+        for r in self.records:
+            for name, seconds in r["phases"].items():
+                totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def summary(self):
+        if not self.records:
+            return "No iterations"
+        last = self.records[-1]
+        phases = "  ".join(f"{name} {seconds:.2f} s" for name, seconds in self.phase_totals().items())
+        return (f"{len(self.records)} iterations in {self.total_time:.2f} s ({phases}), "
+                f"log-likelihood/frame {last['log_likelihood'] / last['frames']:.3f}, "
+                f"{self.stopped_early} stage(s) converged early")
+
 
 class HMMManual:
-    def __init__(self, n_states=5, n_mix=1, n_iter=10):
+    def __init__(self, n_states=5, n_mix=1, n_iter=10, topology="ergodic", tol=None):
+        if topology not in TOPOLOGIES:
+            raise ValueError(f"Unknown topology '{topology}' (choose from {list(TOPOLOGIES)})")
         self.n_states = n_states
-        self.n_mix = n_mix # Single Gaussian for now typically, or GMM
-        self.n_iter = n_iter
+        self.n_mix = n_mix # Gaussians per state (> 1: GMM, grown by splitting during train)
+        self.n_iter = n_iter # Max EM iterations (per mixture stage)
+        self.tol = tol # Stop a stage once the relative log-likelihood gain is below this (None: always n_iter)
+        self.topology = topology
+        self.history = None # TrainingHistory of the last train()
+        self.stats = None # Sufficient statistics of the last EM iteration (see partial_fit)
         
         # Parameters
         self.pi = None # Initial state distribution
-        self.A = None  # Transition matrix
-        self.means = None # Means for each state (if Single Gaussian)
-        self.covs = None  # Covariances for each state
+        self.A = None  # Transition matrix (dense, also kept for banded topologies)
+        self.A_band = None # Banded transitions (N, K) used by the recursions, non-ergodic only
+        self.means = None # Means: (N, D) single Gaussian, (N, M, D) for GMM states
+        self.covs = None  # Diagonal covariances, same shape as means
+        self.weights = None # Mixture weights (N, M), GMM only
         
-        # If GMM, we would need weights, multiple means/covs per state
-        # For simplicity in this "Manual" version, let's start with Single Gaussian per State (GMM with M=1)
-        # It's easier to verify code correctness first.
+        # Cached emission constants, derived from means/covs (see _update_emission_cache)
+        self._neg_half_inv_cov = None
+        self._mean_inv_cov = None
+        self._log_const = None
+
+    @property
+    def band_width(self):
+        """
+        K for banded topologies, None for ergodic (and pickles that predate topologies).
+        """
+        return TOPOLOGIES[getattr(self, 'topology', 'ergodic')]
+
+    @property
+    def is_mixture(self):
+        return self.means is not None and self.means.ndim == 3
 
-    def _init_params(self, X):
+    def mixture_params(self):
+        """
+        (weights (N, M), means (N, M, D), covs (N, M, D)) for single Gaussian
+        and GMM states alike (M = 1 for the former).
+        """
+        if self.is_mixture:
+            return self.weights, self.means, self.covs
+        return np.ones((self.n_states, 1)), self.means[:, None], self.covs[:, None]
+
+    def _init_params(self, X, lengths=None):
         """
         Initialize parameters based on data X (N_samples, n_features)
+        lengths: frames per sequence in X; left-to-right models then start
+        from a uniform segmentation of every sequence instead of the whole data.
         """
         n_samples, n_features = X.shape
+        width = self.band_width
         
-        # Uniform initialization for A and Pi
-        self.pi = np.ones(self.n_states) / self.n_states
-        self.A = np.ones((self.n_states, self.n_states)) / self.n_states
+        if width is None:
+            # Uniform initialization for A and Pi
+            self.pi = np.ones(self.n_states) / self.n_states
+            self.A = np.ones((self.n_states, self.n_states)) / self.n_states
+        else:
+            # Start in the first state, uniform over the allowed arcs
+            self.pi = np.zeros(self.n_states)
+            self.pi[0] = 1.0
+            allowed = band_to_dense(np.ones((self.n_states, width))) > 0
+            self.A_band = dense_to_band(allowed / allowed.sum(axis=1, keepdims=True), width)
+            self.A = band_to_dense(self.A_band)
         
         # K-Means like initialization for Means (split data into chunks)
         # Or just random selection
-        indices = np.array_split(np.arange(n_samples), self.n_states)
+        if width is not None and lengths is not None:
+            # State s gets the s-th slice of every sequence
+            bounds = np.cumsum(np.r_[0, lengths])
+            parts = [np.array_split(np.arange(a, b), self.n_states) for a, b in zip(bounds[:-1], bounds[1:])]
+            indices = [np.concatenate([p[s] for p in parts]) for s in range(self.n_states)]
+        else:
+            indices = np.array_split(np.arange(n_samples), self.n_states)
         self.means = np.zeros((self.n_states, n_features))
         self.covs = np.zeros((self.n_states, n_features))
         
@@ -41,6 +162,37 @@ class HMMManual:
             else:
                 self.means[s] = np.random.rand(n_features)
                 self.covs[s] = np.ones(n_features)
+        
+        if self.n_mix > 1:
+            # GMM states start with one component, see _split_mixtures
+            self.means = self.means[:, None]
+            self.covs = self.covs[:, None]
+            self.weights = np.ones((self.n_states, 1))
+        
+        self._update_emission_cache()
+
+    def _split_mixtures(self, n_mix, perturb=0.2):
+        """
+        Grow every state to n_mix Gaussians. The heaviest component of each
+        state is split into two copies moved -/+ perturb standard deviations
+        apart along every dimension, each with half the weight; repeated until
+        the state has n_mix components (from balanced weights this doubles).
+        """
+        rows = np.arange(self.n_states)
+        means, covs, weights = self.means, self.covs, self.weights
+        while means.shape[1] < n_mix:
+            heaviest = np.argmax(weights, axis=1)
+            shift = perturb * np.sqrt(covs[rows, heaviest])
+            new_mean = means[rows, heaviest] + shift
+            means = means.copy()
+            means[rows, heaviest] -= shift
+            weights = weights.copy()
+            weights[rows, heaviest] *= 0.5
+            means = np.concatenate([means, new_mean[:, None]], axis=1)
+            covs = np.concatenate([covs, covs[rows, heaviest][:, None]], axis=1)
+            weights = np.concatenate([weights, weights[rows, heaviest][:, None]], axis=1)
+        self.means, self.covs, self.weights = means, covs, weights
+        self._update_emission_cache()
 
     def _gaussian_pdf(self, x, mean, cov):
         """
@@ -66,76 +218,164 @@ class HMMManual:
         log_prob = -0.5 * (n_features * log_2pi + log_det + exponent)
         return log_prob
 
-    def _calc_log_B(self, X):
+    def _update_emission_cache(self):
+        """
+        Precompute per-state constants of the diagonal Gaussians.
+        Must be refreshed whenever means/covs change (done after every M-step).
+        
+        Expanding the exponent (x - mu)^2 / cov = x^2/cov - 2*x*mu/cov + mu^2/cov
+        turns log B into two matrix products plus a per-state constant.
+        GMM states get one row per (state, component), with the log mixture
+        weight folded into the constant.
+        Computed in float64, stored in the compute precision (src.precision).
+        """
+        n_features = self.means.shape[-1]
+        log_2pi = np.log(2 * np.pi)
+        # Parameters loaded from a bundle are float32
+        means = np.asarray(self.means, dtype=np.float64)
+        
+        # Same floor as _gaussian_pdf
+        cov = np.maximum(np.asarray(self.covs, dtype=np.float64), 1e-5)
+        inv_cov = 1.0 / cov
+        log_det = np.sum(np.log(cov), axis=-1)
+        
+        log_const = -0.5 * (n_features * log_2pi + log_det +
+                            np.sum(means ** 2 * inv_cov, axis=-1))
+        if self.is_mixture:
+            with np.errstate(divide='ignore'):
+                log_const = log_const + np.log(np.asarray(self.weights, dtype=np.float64))
+        
+        dtype = precision.dtype
+        self._neg_half_inv_cov = (-0.5 * inv_cov).reshape(-1, n_features).astype(dtype)    # (N*M, D), multiplies x^2
+        self._mean_inv_cov = (means * inv_cov).reshape(-1, n_features).astype(dtype)       # (N*M, D), multiplies x
+        self._log_const = log_const.reshape(-1).astype(dtype)                              # (N*M,)
+
+    @instrument.timed("hmm.calc_log_B")
+    def _calc_log_B(self, X, components=False):
         """
         Calculate Log Emission Probabilities: log B[t, j] = log P(O_t | State_j)
+        Vectorized over all frames and states, returns (T, n_states).
+        GMM states: all (state, component) Gaussians are evaluated by the same
+        two matrix products, then reduced with one log-sum-exp over components.
+        components=True also returns those log(w * N(x)) values, (T, N, M).
         """
-        T = X.shape[0]
-        log_B = np.zeros((T, self.n_states))
+        # Models pickled before the cache existed do not carry it; the
+        # precision may also have changed since it was built
+        if getattr(self, '_log_const', None) is None or self._log_const.dtype != precision.dtype:
+            self._update_emission_cache()
+        X = np.asarray(X, dtype=precision.dtype)
+        if instrument.enabled:
+            instrument.count("emissions", len(X) * len(self._log_const)) # Gaussians evaluated
         
-        for t in range(T):
-            for s in range(self.n_states):
-                log_B[t, s] = self._gaussian_pdf(X[t], self.means[s], self.covs[s])
+        log_C = np.dot(X ** 2, self._neg_half_inv_cov.T)
+        log_C += np.dot(X, self._mean_inv_cov.T)
+        log_C += self._log_const
         
-        return log_B
+        if not self.is_mixture:
+            return (log_C, log_C[:, :, None]) if components else log_C
+        log_C = log_C.reshape(len(X), self.n_states, -1)
+        log_B = hmm_kernels.mixture_logsumexp(log_C)
+        return (log_B, log_C) if components else log_B
+
+    def _log_transitions(self, dtype):
+        """
+        (log pi, log A_band or log A) in the dtype of the emissions.
+        """
+        with np.errstate(divide='ignore'):
+            log_pi = np.log(self.pi).astype(dtype)
+            if self.band_width is not None:
+                return log_pi, np.log(self.A_band).astype(dtype)
+            return log_pi, np.log(self.A).astype(dtype)
 
+    @instrument.timed("hmm.forward")
     def _forward(self, log_B):
         """
         Forward Algorithm in Log Domain.
         alpha[t, j] = P(O_1...O_t, q_t=j | model)
+        Each step is one (n_states x n_states) log-sum-exp, see hmm_kernels.
         """
-        T = log_B.shape[0]
-        log_alpha = np.zeros((T, self.n_states))
-        
-        # Init t=0
-        # alpha[0, i] = pi[i] * b_i(O_0)
-        # log_alpha[0, i] = log(pi[i]) + log_b_i(O_0)
-        with np.errstate(divide='ignore'):
-            log_pi = np.log(self.pi)
-            log_A = np.log(self.A)
-            
-        log_alpha[0] = log_pi + log_B[0]
-        
-        # Induction
-        for t in range(1, T):
-            for j in range(self.n_states):
-                # Sum over i: alpha[t-1, i] * A[i, j]
-                # LogSumExp trick: log(sum(exp(x)))
-                # temp = log_alpha[t-1] + log_A[:, j]
-                temp = log_alpha[t-1] + log_A[:, j]
-                max_val = np.max(temp)
-                log_sum = max_val + np.log(np.sum(np.exp(temp - max_val)))
-                
-                log_alpha[t, j] = log_sum + log_B[t, j]
-                
-        return log_alpha
+        if instrument.enabled:
+            instrument.count("forward_steps", len(log_B))
+        log_pi, log_A = self._log_transitions(log_B.dtype)
+        if self.band_width is not None:
+            return hmm_kernels.forward_band(log_pi, log_A, log_B)
+        return hmm_kernels.forward(log_pi, log_A, log_B)
 
+    @instrument.timed("hmm.backward")
     def _backward(self, log_B):
         """
         Backward Algorithm in Log Domain.
         beta[t, i] = P(O_t+1...O_T | q_t=i, model)
         """
-        T = log_B.shape[0]
-        log_beta = np.zeros((T, self.n_states))
+        if instrument.enabled:
+            instrument.count("backward_steps", len(log_B))
+        _, log_A = self._log_transitions(log_B.dtype)
+        if self.band_width is not None:
+            return hmm_kernels.backward_band(log_A, log_B)
+        return hmm_kernels.backward(log_A, log_B)
+
+    def _accumulate(self, obs):
+        """
+        E-Step for ONE observation sequence.
+        Returns its expected sufficient statistics:
+        (numer_A, denom_A, numer_means, numer_covs, denom_gamma, log_P_O)
+        The recursions run in the compute precision, the statistics are
+        always float64 (variances come from E[x^2] - E[x]^2).
+        """
+        log_B, log_C = self._calc_log_B(obs, components=True)
+        log_alpha = self._forward(log_B)
+        log_beta = self._backward(log_B)
         
-        # Init t=T-1 (Last state) -> beta = 1 -> log_beta = 0
-        log_beta[T-1] = 0.0
+        # Compute Gamma (State Probability)
+        # gamma[t, i] = P(q_t = i | O, model) = alpha * beta / P(O)
+        log_P_O = hmm_kernels.logsumexp(log_alpha[-1])
         
-        with np.errstate(divide='ignore'):
-            log_A = np.log(self.A)
-            
-        # Induction
-        for t in range(T-2, -1, -1):
-            for i in range(self.n_states):
-                # Sum over j: A[i, j] * b_j(O_t+1) * beta[t+1, j]
-                temp = log_A[i, :] + log_B[t+1, :] + log_beta[t+1, :]
-                max_val = np.max(temp)
-                log_sum = max_val + np.log(np.sum(np.exp(temp - max_val)))
-                log_beta[t, i] = log_sum
-                
-        return log_beta
-
-    def train(self, X):
+        log_gamma = log_alpha + log_beta - log_P_O
+        gamma = np.exp(log_gamma, dtype=np.float64)
+        
+        # Compute Xi (Transition Probability) for all t at once
+        # log_xi[t, i, j] = alpha[t,i] + A[i,j] + B[t+1,j] + beta[t+1,j] - log_P_O
+        # Shape (T-1, N, N)
+        width = self.band_width
+        if width is None:
+            log_A = np.log(self.A + 1e-10)
+            log_xi = (log_alpha[:-1, :, None] + log_A[None, :, :] +
+                      (log_B[1:] + log_beta[1:])[:, None, :] - log_P_O)
+        else:
+            # Banded: only the K allowed arcs per state, shape (T-1, N, K)
+            with np.errstate(divide='ignore'):
+                log_A_band = np.log(self.A_band)
+            nxt = np.full((len(obs) - 1, self.n_states + width), -np.inf)
+            nxt[:, :self.n_states] = log_B[1:] + log_beta[1:]
+            dst = np.arange(self.n_states)[:, None] + np.arange(width)[None, :]
+            log_xi = log_alpha[:-1, :, None] + log_A_band[None] + nxt[:, dst] - log_P_O
+        
+        # Statistics for A (banded models: (N, K) like A_band)
+        numer_A = np.exp(log_xi, dtype=np.float64).sum(axis=0)
+        denom_A = gamma[:-1].sum(axis=0).reshape(-1, 1)
+        
+        # Statistics for Means/Covs, per Gaussian
+        # GMM: gamma[t, j, m] = gamma[t, j] * w_jm N_jm(o_t) / b_j(o_t)
+        if self.is_mixture:
+            occupancy = (gamma[:, :, None] * np.exp(log_C - log_B[:, :, None], dtype=np.float64)).reshape(len(obs), -1)
+        else:
+            occupancy = gamma
+        
+        # Sum gamma over time, shape (n_states,) or (n_states, n_mix)
+        denom_gamma = occupancy.sum(axis=0).reshape(self.means.shape[:-1])
+        
+        # Weighted sums of observations: (N*M, T) @ (T, D) -> (N*M, D)
+        obs = np.asarray(obs, dtype=np.float64)
+        numer_means = (occupancy.T @ obs).reshape(self.means.shape)
+        numer_covs = (occupancy.T @ (obs ** 2)).reshape(self.means.shape)
+        
+        return numer_A, denom_A, numer_means, numer_covs, denom_gamma, log_P_O
+
+    def _get_params(self):
+        return self.pi, self.A, self.A_band, self.weights, self.means, self.covs
+
+    @instrument.timed("hmm.train")
+    def train(self, X, n_jobs=1, checkpoint=None):
         """
         Baum-Welch Training (EM Algorithm)
         X: List of observations or Single observation sequence?
@@ -143,96 +383,268 @@ class HMMManual:
         Usually we average over multiple files.
         Here: X is a SINGLE sequence (n_samples, n_features) for simplicity, or we adapt to list.
         Adaptation: X is a LIST of arrays.
+        n_jobs: > 1 maps the per-utterance E-Step over a process pool. Statistics
+        are still summed in utterance order, so results are bit-identical to n_jobs=1.
+        GMM states (n_mix > 1) start from one Gaussian and are split 1 -> 2 -> 4 ...
+        up to n_mix, with up to n_iter iterations after each split.
+        checkpoint: optional file path; the model (with its history) is written
+        there after every iteration, and an existing file is resumed from.
+        Returns self.history (see TrainingHistory).
         """
         # If X is array, make it a list
         if isinstance(X, np.ndarray):
             X = [X]
             
+        if checkpoint is not None and os.path.exists(checkpoint):
+            self._resume(checkpoint)
+        if self.history is None:
+            self.history = TrainingHistory()
+        
         # Initialize if not already
         if self.means is None:
             # Concat all to init
             all_data = np.vstack(X)
-            self._init_params(all_data)
-            
-        for it in range(self.n_iter):
-            # Accumulators for A, means, covs
-            # Expectation Step (E-Step)
-            
-            # Since we need to sum over multiple observations, we need careful accumulators
-            # This is complex in "scratch" code.
-            # Simplified approach: Train on 1 concatenated sequence? No, transitions are wrong.
-            # Correct approach: Accumulate expectations.
-            
-            numer_A = np.zeros((self.n_states, self.n_states))
-            denom_A = np.zeros((self.n_states, 1))
-            
-            numer_means = np.zeros((self.n_states, X[0].shape[1]))
-            numer_covs = np.zeros((self.n_states, X[0].shape[1]))
-            denom_gamma = np.zeros((self.n_states))
-            
-            for obs in X:
-                log_B = self._calc_log_B(obs)
-                log_alpha = self._forward(log_B)
-                log_beta = self._backward(log_B)
-                
-                # Compute Gamma (State Probability)
-                # gamma[t, i] = P(q_t = i | O, model) = alpha * beta / P(O)
-                log_prob_O = np.max(log_alpha[-1]) # Or logsumexp of alpha[-1]
-                # Better log_P_O:
-                temp = log_alpha[-1]
-                max_val = np.max(temp)
-                log_P_O = max_val + np.log(np.sum(np.exp(temp - max_val)))
-                
-                log_gamma = log_alpha + log_beta - log_P_O
-                gamma = np.exp(log_gamma)
-                
-                # Compute Xi (Transition Probability)
-                # xi[t, i, j] = P(q_t=i, q_t+1=j | O, model)
-                T = len(obs)
-                log_A = np.log(self.A + 1e-10)
-                
-                # Accumulate for A
-                for t in range(T-1):
-                    # log_xi[t, i, j] = alpha[t,i] + A[i,j] + B[t+1,j] + beta[t+1,j] - log_P_O
-                    for i in range(self.n_states):
-                        for j in range(self.n_states):
-                            log_xi_t_ij = log_alpha[t, i] + log_A[i, j] + log_B[t+1, j] + log_beta[t+1, j] - log_P_O
-                            xi_t_ij = np.exp(log_xi_t_ij)
-                            numer_A[i, j] += xi_t_ij
-                    
-                    denom_A += gamma[t].reshape(-1, 1)
-
-                # Accumulate for Means/Covs
-                # Sum gamma over time
-                gamma_sum = np.sum(gamma, axis=0) # shape (n_states,)
-                denom_gamma += gamma_sum
-                
-                for s in range(self.n_states):
-                    # Weighted sum of observations
-                    # obs: (T, D), gamma[:, s]: (T,)
-                    w = gamma[:, s].reshape(-1, 1)
-                    numer_means[s] += np.sum(obs * w, axis=0)
-                    numer_covs[s] += np.sum((obs ** 2) * w, axis=0)
-            
-            # Maximization Step (M-Step)
-            # Update A
-            self.A = numer_A / (denom_A + 1e-10)
-            # Normalize A
-            self.A = self.A / np.sum(self.A, axis=1, keepdims=True)
-            
-            # Update Means
-            self.means = numer_means / (denom_gamma[:, None] + 1e-10)
+            self._init_params(all_data, [len(x) for x in X])
+        
+        executor = None
+        chunks = None
+        if n_jobs > 1 and len(X) > 1:
+            n_jobs = min(n_jobs, len(X))
+            # Sequences are shipped once per worker, not once per iteration
+            executor = ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_estep_worker,
+                                           initargs=(X, hmm_kernels.backend, precision.name))
+            # A few chunks per worker for load balancing
+            chunks = np.array_split(np.arange(len(X)), min(len(X), 4 * n_jobs))
             
-            # Update Covs (Diagonal)
-            # var = E[x^2] - (E[x])^2
-            # We calculated sum(w * x^2), so divide by sum(w) then subtract mean^2
-            mean_sq = self.means ** 2
-            avg_sq = numer_covs / (denom_gamma[:, None] + 1e-10)
-            self.covs = avg_sq - mean_sq
-            self.covs = np.maximum(self.covs, 1e-4) # Floor cov
+        try:
+            while True:
+                self._run_stage(X, executor, chunks, checkpoint)
+                if not self.is_mixture or self.means.shape[1] >= self.n_mix:
+                    break
+                self._split_mixtures(min(2 * self.means.shape[1], self.n_mix))
+                print(f"Split to {self.means.shape[1]} mixtures")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return self.history
+
+    def _run_stage(self, X, executor, chunks, checkpoint):
+        """
+        EM iterations at the current mixture size, until n_iter or the
+        tolerance. Picks up where a resumed history left off.
+        """
+        n_mix = self.means.shape[1] if self.is_mixture else 1
+        done = [r for r in self.history.records if r["n_mix"] == n_mix]
+        if done and done[-1].get("converged"):
+            return
+        prev = done[-1]["log_likelihood"] if done else None
+        for it in range(len(done), self.n_iter):
+            log_likelihood, frames, phases = self._em_iteration(X, executor, chunks)
+            self.history.add(n_mix, it, log_likelihood, frames, phases)
             
-            print(f"Iteration {it}: Params Updated")
+            gain = None if prev is None else (log_likelihood - prev) / abs(prev)
+            print(f"Iteration {it}: log-likelihood {log_likelihood:.2f}" +
+                  ("" if gain is None else f" (relative gain {gain:.2e})"))
+            converged = gain is not None and self.tol is not None and gain < self.tol
+            if converged:
+                self.history.records[-1]["converged"] = True
+                self.history.stopped_early += 1
+            if checkpoint is not None:
+                t0 = time.perf_counter()
+                self.save_checkpoint(checkpoint)
+                self.history.records[-1]["phases"]["checkpoint"] = time.perf_counter() - t0
+            if converged:
+                break
+            prev = log_likelihood
+
+    def save_checkpoint(self, path):
+        """
+        Pickle the model (parameters and history) atomically.
+        """
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self, f)
+        os.replace(tmp_path, path)
+
+    def _resume(self, path):
+        with open(path, "rb") as f:
+            saved = pickle.load(f)
+        if (saved.n_states, saved.n_mix, saved.topology) != (self.n_states, self.n_mix, getattr(self, 'topology', 'ergodic')):
+            raise ValueError(f"Checkpoint {path} is for a different model "
+                             f"({saved.n_states} states, {saved.n_mix} mixtures, {saved.topology})")
+        n_iter, tol = self.n_iter, self.tol
+        self.__dict__.update(saved.__dict__)
+        self.n_iter, self.tol = n_iter, tol # The caller's stopping rule wins
+        print(f"Resumed from {path} after {len(self.history.records)} iterations")
+
+    STATS = ("numer_A", "denom_A", "numer_means", "numer_covs", "denom_gamma")
+
+    def _e_step(self, X, executor=None, chunks=None):
+        """
+        E-Step over all sequences: their expected sufficient statistics under
+        the current parameters, summed in utterance order.
+        Returns (stats dict, total log-likelihood). stats holds numer_A /
+        denom_A (transition counts), numer_means / numer_covs (occupancy
+        weighted first and second moments), denom_gamma (occupancies), plus
+        the frames and utterances they cover.
+        """
+        # Accumulators for A, means, covs
+        # Since we need to sum over multiple observations, we need careful accumulators
+        # Correct approach: Accumulate expectations per sequence, then sum.
+        width = self.band_width
+        numer_A = np.zeros((self.n_states, self.n_states if width is None else width))
+        denom_A = np.zeros((self.n_states, 1))
+        
+        numer_means = np.zeros(self.means.shape)
+        numer_covs = np.zeros(self.means.shape)
+        denom_gamma = np.zeros(self.means.shape[:-1])
+        
+        if executor is None:
+            per_seq = (self._accumulate(obs) for obs in X)
+        else:
+            params = self._get_params()
+            futures = [executor.submit(_estep_worker, self.n_states, self.n_mix,
+                                       getattr(self, 'topology', 'ergodic'), params, idx)
+                       for idx in chunks]
+            # Chunks come back in submission order -> same summation order as serial
+            per_seq = (stats for fut in futures for stats in fut.result())
+        
+        log_likelihood = 0.0
+        for stats in per_seq:
+            numer_A += stats[0]
+            denom_A += stats[1]
+            numer_means += stats[2]
+            numer_covs += stats[3]
+            denom_gamma += stats[4]
+            log_likelihood += float(stats[5])
+        
+        stats = {"numer_A": numer_A, "denom_A": denom_A, "numer_means": numer_means,
+                 "numer_covs": numer_covs, "denom_gamma": denom_gamma,
+                 "frames": sum(len(obs) for obs in X), "utterances": len(X)}
+        return stats, log_likelihood
+
+    def _m_step(self, stats):
+        """
+        M-Step: A, mixture weights, means and covs from sufficient statistics.
+        """
+        numer_A, denom_A = stats["numer_A"], stats["denom_A"]
+        numer_covs, denom_gamma = stats["numer_covs"], stats["denom_gamma"]
+        # Update A
+        A = numer_A / (denom_A + 1e-10)
+        # Normalize A
+        A = A / np.sum(A, axis=1, keepdims=True)
+        if self.band_width is None:
+            self.A = A
+        else:
+            self.A_band = A
+            self.A = band_to_dense(A)
+        
+        # Update mixture weights: each component's share of its state's occupancy
+        if self.is_mixture:
+            self.weights = denom_gamma / (denom_gamma.sum(axis=1, keepdims=True) + 1e-10)
+        
+        # Update Means (all states and components at once)
+        self.means = stats["numer_means"] / (denom_gamma[..., None] + 1e-10)
+        
+        # Update Covs (Diagonal)
+        # var = E[x^2] - (E[x])^2
+        # We calculated sum(w * x^2), so divide by sum(w) then subtract mean^2
+        mean_sq = self.means ** 2
+        avg_sq = numer_covs / (denom_gamma[..., None] + 1e-10)
+        self.covs = avg_sq - mean_sq
+        self.covs = np.maximum(self.covs, 1e-4) # Floor cov
+        self._update_emission_cache()
 
+    @instrument.timed("hmm.em_iteration")
+    def _em_iteration(self, X, executor=None, chunks=None):
+        """
+        One E-Step over all sequences followed by the M-Step.
+        Returns (total log-likelihood, frames, {phase: seconds}).
+        """
+        t0 = time.perf_counter()
+        stats, log_likelihood = self._e_step(X, executor, chunks)
+        t1 = time.perf_counter()
+        self._m_step(stats)
+        # Kept with the model: the statistics its parameters were estimated
+        # from, for partial_fit()
+        self.stats = stats
+        
+        if instrument.enabled:
+            instrument.count("em_iterations")
+        return log_likelihood, stats["frames"], {"estep": t1 - t0, "mstep": time.perf_counter() - t1}
+
+    def _prior_stats(self, tau):
+        """
+        Pseudo-statistics equivalent to the current parameters seen on `tau`
+        frames per state (spread over the components by their weights, and
+        over the transitions by A): the conjugate prior of MAP adaptation.
+        """
+        weights, means, covs = self.mixture_params()
+        count = tau * np.asarray(weights, dtype=np.float64)             # (N, M)
+        means = np.asarray(means, dtype=np.float64)
+        covs = np.asarray(covs, dtype=np.float64)
+        A = self.A_band if self.band_width is not None else self.A
+        shape = self.means.shape
+        return {"numer_A": tau * np.asarray(A, dtype=np.float64),
+                "denom_A": np.full((self.n_states, 1), float(tau)),
+                "numer_means": (count[..., None] * means).reshape(shape),
+                "numer_covs": (count[..., None] * (covs + means ** 2)).reshape(shape),
+                "denom_gamma": count.reshape(shape[:-1]),
+                "frames": 0, "utterances": 0}
+
+    @staticmethod
+    def _add_stats(base, new, weight=1.0):
+        out = {name: base[name] + weight * new[name] for name in HMMManual.STATS}
+        out["frames"] = base["frames"] + new["frames"]
+        out["utterances"] = base["utterances"] + new["utterances"]
+        return out
+
+    def _update(self, X, base, weight, n_iter):
+        # E-Step on the new sequences only, the base statistics stay fixed
+        if n_iter < 1:
+            raise ValueError(f"n_iter must be at least 1, got {n_iter}")
+        if isinstance(X, np.ndarray):
+            X = [X]
+        t0 = time.perf_counter()
+        for _ in range(n_iter):
+            new, log_likelihood = self._e_step(X)
+            self.stats = self._add_stats(base, new, weight)
+            self._m_step(self.stats)
+        if instrument.enabled:
+            instrument.count("adapt_iterations", n_iter)
+        return {"log_likelihood": log_likelihood, "frames": new["frames"],
+                "utterances": len(X), "seconds": time.perf_counter() - t0}
+
+    @instrument.timed("hmm.partial_fit")
+    def partial_fit(self, X, n_iter=1, weight=1.0):
+        """
+        Fold new sequences into a trained model without revisiting the old
+        ones (weighted-count update): their sufficient statistics, times
+        `weight`, are added to the stored ones (self.stats) and the M-Step
+        runs on the sum. n_iter > 1 repeats the E-Step on X with the updated
+        model (n_iter < 1 raises ValueError). self.stats then covers old + new
+        data, so calls can be chained.
+        Returns {"log_likelihood" (of X, before the last M-Step), "frames",
+        "utterances", "seconds"}.
+        """
+        if getattr(self, 'stats', None) is None:
+            raise ValueError("partial_fit needs the statistics of a train() run "
+                             "(models saved before they were kept have none; use adapt())")
+        return self._update(X, self.stats, weight, n_iter)
+
+    @instrument.timed("hmm.adapt")
+    def adapt(self, X, tau=10.0, n_iter=1):
+        """
+        MAP adaptation to new sequences, e.g. a new speaker: the current
+        parameters are a prior worth `tau` frames per state, so states the
+        new data visits a lot move towards it and the others barely change.
+        Works without stored statistics; afterwards self.stats are the
+        prior's pseudo-counts plus the new data.
+        Returns the same dict as partial_fit().
+        """
+        return self._update(X, self._prior_stats(tau), 1.0, n_iter)
+
+    @instrument.timed("hmm.score")
     def score(self, observation):
         """
         Calculate Log-Likelihood of an observation sequence
@@ -241,7 +653,39 @@ class HMMManual:
         log_alpha = self._forward(log_B)
         
         # log P(O) = log sum(alpha[T-1])
-        temp = log_alpha[-1]
-        max_val = np.max(temp)
-        log_prob = max_val + np.log(np.sum(np.exp(temp - max_val)))
-        return log_prob
+        return hmm_kernels.logsumexp(log_alpha[-1])
+
+    @instrument.timed("hmm.viterbi")
+    def viterbi(self, observation):
+        """
+        Viterbi decoding: most likely state sequence and its log-probability.
+        Returns (path (T,), log_prob)
+        """
+        log_B = self._calc_log_B(observation)
+        if instrument.enabled:
+            instrument.count("viterbi_steps", len(log_B))
+        log_pi, log_A = self._log_transitions(log_B.dtype)
+        if self.band_width is not None:
+            path, log_prob = hmm_kernels.viterbi_band(log_pi, log_A, log_B)
+        else:
+            path, log_prob = hmm_kernels.viterbi(log_pi, log_A, log_B)
+        return path, float(log_prob)
+
+
+# Process-pool E-Step (HMMManual.train with n_jobs > 1)
+_worker_X = None
+
+def _init_estep_worker(X, backend, precision_name):
+    global _worker_X
+    _worker_X = X
+    hmm_kernels.set_backend(backend)
+    precision.set_precision(precision_name)
+
+def _estep_worker(n_states, n_mix, topology, params, indices):
+    """
+    Sufficient statistics of the sequences _worker_X[indices], in order.
+    """
+    hmm = HMMManual(n_states=n_states, n_mix=n_mix, topology=topology)
+    hmm.pi, hmm.A, hmm.A_band, hmm.weights, hmm.means, hmm.covs = params
+    hmm._update_emission_cache()
+    return [hmm._accumulate(_worker_X[i]) for i in indices]
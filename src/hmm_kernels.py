@@ -0,0 +1,827 @@
+"""
+Log-domain Forward/Backward recursions used by HMMManual.
+
+Emissions of GMM states (mixture_logsumexp) reduce per-component
+log-likelihoods (..., M) to per-state ones with a single log-sum-exp.
+
+Transitions come in two layouts:
+- dense log_A (N, N), for ergodic models
+- banded log_A_band (N, K), column k holding the arc i -> i+k (left-to-right
+  models); the *_band kernels only visit these N*K arcs
+
+Two interchangeable back-ends:
+- 'numpy': each time step is a single (n_states x n_states) log-sum-exp
+- 'numba': compiled scalar loops, only available when numba is installed
+
+The back-end is picked at runtime: HMM_KERNEL=numpy|numba|auto (default auto,
+which prefers numba when it can be imported), or set_backend() from code.
+"""
+import os
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # Optional dependency
+    numba = None
+
+
+def logsumexp(a, axis=None):
+    """
+    Stable log(sum(exp(a))) along an axis. All -inf slices give -inf (not NaN).
+    """
+    max_val = np.max(a, axis=axis, keepdims=True)
+    max_val = np.where(np.isfinite(max_val), max_val, 0.0)
+    with np.errstate(divide='ignore'):
+        out = np.log(np.sum(np.exp(a - max_val), axis=axis, keepdims=True)) + max_val
+    if axis is None:
+        return out.item()
+    return np.squeeze(out, axis=axis)
+
+
+# ----------------------------------------------------------------------------
+# NumPy back-end
+# ----------------------------------------------------------------------------
+
+def mixture_logsumexp_numpy(log_C):
+    """
+    log_B[..., j] = logsumexp_m(log_C[..., j, m]): component log-likelihoods
+    (weights included) -> state log-likelihoods. States whose components are
+    all -inf (padding) give -inf.
+    """
+    max_val = log_C.max(axis=-1)
+    max_val[~np.isfinite(max_val)] = 0.0
+    with np.errstate(divide='ignore'):
+        return np.log(np.exp(log_C - max_val[..., None]).sum(axis=-1)) + max_val
+
+def forward_numpy(log_pi, log_A, log_B):
+    """
+    log_alpha[t, j] = logsumexp_i(log_alpha[t-1, i] + log_A[i, j]) + log_B[t, j]
+    """
+    T, n_states = log_B.shape
+    log_alpha = np.empty((T, n_states), dtype=log_B.dtype)
+    log_alpha[0] = log_pi + log_B[0]
+    # Keeps all -inf columns (forbidden transitions) from turning into NaN
+    floor = -np.finfo(log_B.dtype).max
+
+    with np.errstate(divide='ignore'):
+        for t in range(1, T):
+            # (N, 1) + (N, N) -> reduce over the source state i (axis 0)
+            temp = log_alpha[t-1][:, None] + log_A
+            max_val = np.maximum(temp.max(axis=0), floor)
+            log_alpha[t] = max_val + np.log(np.exp(temp - max_val).sum(axis=0)) + log_B[t]
+
+    return log_alpha
+
+
+def backward_numpy(log_A, log_B):
+    """
+    log_beta[t, i] = logsumexp_j(log_A[i, j] + log_B[t+1, j] + log_beta[t+1, j])
+    """
+    T, n_states = log_B.shape
+    log_beta = np.empty((T, n_states), dtype=log_B.dtype)
+    log_beta[T-1] = 0.0
+    floor = -np.finfo(log_B.dtype).max
+
+    with np.errstate(divide='ignore'):
+        for t in range(T-2, -1, -1):
+            # (N, N) + (1, N) -> reduce over the target state j (axis 1)
+            temp = log_A + (log_B[t+1] + log_beta[t+1])
+            max_val = np.maximum(temp.max(axis=1), floor)
+            log_beta[t] = max_val + np.log(np.exp(temp - max_val[:, None]).sum(axis=1))
+
+    return log_beta
+
+
+def forward_last_batch_numpy(log_pi, log_A, log_B):
+    """
+    Forward recursion for M models at once, returns only log_alpha[T-1].
+    log_pi: (M, N), log_A: (M, N, N), log_B: (M, T, N) -> (M, N)
+    """
+    T = log_B.shape[1]
+    floor = -np.finfo(log_B.dtype).max
+    log_alpha = log_pi + log_B[:, 0]
+
+    with np.errstate(divide='ignore'):
+        for t in range(1, T):
+            # (M, N, 1) + (M, N, N) -> reduce over the source state i (axis 1)
+            temp = log_alpha[:, :, None] + log_A
+            max_val = np.maximum(temp.max(axis=1), floor)
+            log_alpha = max_val + np.log(np.exp(temp - max_val[:, None, :]).sum(axis=1)) + log_B[:, t]
+
+    return log_alpha
+
+
+def viterbi_numpy(log_pi, log_A, log_B):
+    """
+    Best state path and its log-probability.
+    delta[t, j] = max_i(delta[t-1, i] + log_A[i, j]) + log_B[t, j]
+    """
+    T, n_states = log_B.shape
+    delta = log_pi + log_B[0]
+    psi = np.zeros((T, n_states), dtype=np.int64)
+
+    for t in range(1, T):
+        temp = delta[:, None] + log_A
+        psi[t] = np.argmax(temp, axis=0)
+        delta = temp[psi[t], np.arange(n_states)] + log_B[t]
+
+    # Backtrack
+    path = np.empty(T, dtype=np.int64)
+    path[T-1] = np.argmax(delta)
+    for t in range(T-1, 0, -1):
+        path[t-1] = psi[t, path[t]]
+
+    return path, delta[path[T-1]]
+
+
+def viterbi_beam_batch_numpy(log_pi, log_A, log_B, beam):
+    """
+    Time-synchronous Viterbi for M models with cross-model beam pruning.
+    After every frame, a model whose best partial score is more than `beam`
+    below the best partial score of all models is dropped (score -inf).
+    beam=None disables pruning.
+    Returns (scores (M,), frames_evaluated (M,)).
+    """
+    n_models, T, n_states = log_B.shape
+    delta = log_pi + log_B[:, 0]
+    active = np.arange(n_models)
+    frames = np.ones(n_models, dtype=np.int64)
+    scores = np.full(n_models, -np.inf, dtype=log_B.dtype)
+
+    for t in range(1, T):
+        if beam is not None:
+            model_best = delta.max(axis=1)
+            keep = model_best >= model_best.max() - beam
+            if not keep.all():
+                active = active[keep]
+                delta = delta[keep]
+        # (m, N, 1) + (m, N, N) -> max over the source state
+        delta = (delta[:, :, None] + log_A[active]).max(axis=1) + log_B[active, t]
+        frames[active] += 1
+
+    scores[active] = delta.max(axis=1)
+    return scores, frames
+
+
+def connected_viterbi_numpy(log_pi, log_A, log_B, log_enter, min_frames, max_frames):
+    """
+    Token-passing Viterbi over M word models joined in a loop: after any
+    frame, the best word end may enter any model m (through log_pi[m], plus
+    the entry/insertion penalty log_enter[m]). Every state can end a word,
+    as in isolated scoring where the forward sum runs over all final states.
+    A token of model m may only end its word after min_frames[m] frames and
+    is dropped after max_frames[m] (duration limits, tracked per token).
+    Returns (score, end_model (T,), end_start (T,)): the best word ending at
+    frame t and the frame where that word started, for the backtrace
+    (end_model is -1 where no word can end).
+    """
+    n_models, T, n_states = log_B.shape
+    rows = np.arange(n_models)[:, None]
+    entry = log_pi + log_enter[:, None]
+    delta = entry + log_B[:, 0]
+    start = np.zeros((n_models, n_states), dtype=np.int64)
+    end_model = np.full(T, -1, dtype=np.int64)
+    end_start = np.zeros(T, dtype=np.int64)
+    best_end = -np.inf
+
+    for t in range(T):
+        # Best word end at t, among tokens old enough
+        duration = t + 1 - start
+        ending = np.where(duration >= min_frames[:, None], delta, -np.inf)
+        flat = np.argmax(ending)
+        m, s = divmod(flat, n_states)
+        best_end = ending[m, s]
+        if best_end > -np.inf:
+            end_model[t] = m
+            end_start[t] = start[m, s]
+        if t == T - 1:
+            break
+
+        # Stay inside the word: (M, N, 1) + (M, N, N) -> best source state
+        temp = delta[:, :, None] + log_A
+        src = np.argmax(temp, axis=1)
+        stay = np.take_along_axis(temp, src[:, None, :], axis=1)[:, 0]
+        stay_start = start[rows, src]
+        stay = np.where(t + 1 - stay_start < max_frames[:, None], stay, -np.inf)
+        # Or start a new word after the best end
+        enter = best_end + entry
+        new_word = enter > stay
+        delta = np.where(new_word, enter, stay) + log_B[:, t + 1]
+        start = np.where(new_word, t + 1, stay_start)
+
+    return best_end, end_model, end_start
+
+
+# Banded transitions: log_A_band[i, k] is the arc i -> i+k (-inf if absent)
+
+def _band_into(log_A_band):
+    """
+    Re-index a band by target state: into[..., j, k] = log_A_band[..., j-k, k]
+    (-inf for j-k < 0), and src[j, k] = K + j - k, the index of the source
+    state in a vector left-padded with K entries.
+    """
+    n_states, width = log_A_band.shape[-2:]
+    into = np.full(log_A_band.shape, -np.inf, dtype=log_A_band.dtype)
+    for k in range(width):
+        into[..., k:, k] = log_A_band[..., :n_states - k, k]
+    src = width + np.arange(n_states)[:, None] - np.arange(width)[None, :]
+    return into, src
+
+
+def forward_band_numpy(log_pi, log_A_band, log_B):
+    """
+    forward_numpy for a banded log_A: each step reduces over K sources per state.
+    """
+    T, n_states = log_B.shape
+    width = log_A_band.shape[1]
+    into, src = _band_into(log_A_band)
+    log_alpha = np.empty((T, n_states), dtype=log_B.dtype)
+    log_alpha[0] = log_pi + log_B[0]
+    floor = -np.finfo(log_B.dtype).max
+    prev = np.full(width + n_states, -np.inf, dtype=log_B.dtype)
+
+    with np.errstate(divide='ignore'):
+        for t in range(1, T):
+            prev[width:] = log_alpha[t-1]
+            temp = prev[src] + into
+            max_val = np.maximum(temp.max(axis=1), floor)
+            log_alpha[t] = max_val + np.log(np.exp(temp - max_val[:, None]).sum(axis=1)) + log_B[t]
+
+    return log_alpha
+
+
+def backward_band_numpy(log_A_band, log_B):
+    """
+    backward_numpy for a banded log_A.
+    """
+    T, n_states = log_B.shape
+    width = log_A_band.shape[1]
+    # dst[i, k] = i + k, the target state (right-padded with K entries)
+    dst = np.arange(n_states)[:, None] + np.arange(width)[None, :]
+    log_beta = np.empty((T, n_states), dtype=log_B.dtype)
+    log_beta[T-1] = 0.0
+    floor = -np.finfo(log_B.dtype).max
+    nxt = np.full(n_states + width, -np.inf, dtype=log_B.dtype)
+
+    with np.errstate(divide='ignore'):
+        for t in range(T-2, -1, -1):
+            nxt[:n_states] = log_B[t+1] + log_beta[t+1]
+            temp = log_A_band + nxt[dst]
+            max_val = np.maximum(temp.max(axis=1), floor)
+            log_beta[t] = max_val + np.log(np.exp(temp - max_val[:, None]).sum(axis=1))
+
+    return log_beta
+
+
+def forward_last_batch_band_numpy(log_pi, log_A_band, log_B):
+    """
+    forward_last_batch_numpy for banded log_A_band (M, N, K).
+    """
+    n_models, T, n_states = log_B.shape
+    width = log_A_band.shape[2]
+    into, src = _band_into(log_A_band)
+    floor = -np.finfo(log_B.dtype).max
+    prev = np.full((n_models, width + n_states), -np.inf, dtype=log_B.dtype)
+    log_alpha = log_pi + log_B[:, 0]
+
+    with np.errstate(divide='ignore'):
+        for t in range(1, T):
+            prev[:, width:] = log_alpha
+            temp = prev[:, src] + into
+            max_val = np.maximum(temp.max(axis=2), floor)
+            log_alpha = max_val + np.log(np.exp(temp - max_val[:, :, None]).sum(axis=2)) + log_B[:, t]
+
+    return log_alpha
+
+
+def viterbi_band_numpy(log_pi, log_A_band, log_B):
+    """
+    viterbi_numpy for a banded log_A.
+    """
+    T, n_states = log_B.shape
+    width = log_A_band.shape[1]
+    into, src = _band_into(log_A_band)
+    rows = np.arange(n_states)
+    delta = log_pi + log_B[0]
+    psi = np.zeros((T, n_states), dtype=np.int64)
+    prev = np.full(width + n_states, -np.inf, dtype=log_B.dtype)
+
+    for t in range(1, T):
+        prev[width:] = delta
+        temp = prev[src] + into
+        best_k = np.argmax(temp, axis=1)
+        psi[t] = rows - best_k
+        delta = temp[rows, best_k] + log_B[t]
+
+    path = np.empty(T, dtype=np.int64)
+    path[T-1] = np.argmax(delta)
+    for t in range(T-1, 0, -1):
+        path[t-1] = psi[t, path[t]]
+
+    return path, delta[path[T-1]]
+
+
+def viterbi_beam_batch_band_numpy(log_pi, log_A_band, log_B, beam):
+    """
+    viterbi_beam_batch_numpy for banded log_A_band (M, N, K).
+    """
+    n_models, T, n_states = log_B.shape
+    width = log_A_band.shape[2]
+    into, src = _band_into(log_A_band)
+    delta = log_pi + log_B[:, 0]
+    active = np.arange(n_models)
+    frames = np.ones(n_models, dtype=np.int64)
+    scores = np.full(n_models, -np.inf, dtype=log_B.dtype)
+    prev = np.full((n_models, width + n_states), -np.inf, dtype=log_B.dtype)
+
+    for t in range(1, T):
+        if beam is not None:
+            model_best = delta.max(axis=1)
+            keep = model_best >= model_best.max() - beam
+            if not keep.all():
+                active = active[keep]
+                delta = delta[keep]
+        prev[:len(active), width:] = delta
+        delta = (prev[:len(active), src] + into[active]).max(axis=2) + log_B[active, t]
+        frames[active] += 1
+
+    scores[active] = delta.max(axis=1)
+    return scores, frames
+
+
+# ----------------------------------------------------------------------------
+# Numba back-end
+# ----------------------------------------------------------------------------
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _forward_numba(log_pi, log_A, log_B):
+        T, n_states = log_B.shape
+        log_alpha = np.empty((T, n_states), dtype=log_B.dtype)
+        for j in range(n_states):
+            log_alpha[0, j] = log_pi[j] + log_B[0, j]
+
+        for t in range(1, T):
+            for j in range(n_states):
+                max_val = -np.inf
+                for i in range(n_states):
+                    v = log_alpha[t-1, i] + log_A[i, j]
+                    if v > max_val:
+                        max_val = v
+                if max_val == -np.inf:
+                    log_alpha[t, j] = -np.inf
+                    continue
+                acc = 0.0
+                for i in range(n_states):
+                    acc += np.exp(log_alpha[t-1, i] + log_A[i, j] - max_val)
+                log_alpha[t, j] = max_val + np.log(acc) + log_B[t, j]
+
+        return log_alpha
+
+    @numba.njit(cache=True)
+    def _backward_numba(log_A, log_B):
+        T, n_states = log_B.shape
+        log_beta = np.empty((T, n_states), dtype=log_B.dtype)
+        for i in range(n_states):
+            log_beta[T-1, i] = 0.0
+
+        for t in range(T-2, -1, -1):
+            for i in range(n_states):
+                max_val = -np.inf
+                for j in range(n_states):
+                    v = log_A[i, j] + log_B[t+1, j] + log_beta[t+1, j]
+                    if v > max_val:
+                        max_val = v
+                if max_val == -np.inf:
+                    log_beta[t, i] = -np.inf
+                    continue
+                acc = 0.0
+                for j in range(n_states):
+                    acc += np.exp(log_A[i, j] + log_B[t+1, j] + log_beta[t+1, j] - max_val)
+                log_beta[t, i] = max_val + np.log(acc)
+
+        return log_beta
+
+    @numba.njit(cache=True)
+    def _forward_last_batch_numba(log_pi, log_A, log_B):
+        n_models, T, n_states = log_B.shape
+        prev = np.empty((n_models, n_states), dtype=log_B.dtype)
+        cur = np.empty((n_models, n_states), dtype=log_B.dtype)
+        for m in range(n_models):
+            for j in range(n_states):
+                prev[m, j] = log_pi[m, j] + log_B[m, 0, j]
+
+        for t in range(1, T):
+            for m in range(n_models):
+                for j in range(n_states):
+                    max_val = -np.inf
+                    for i in range(n_states):
+                        v = prev[m, i] + log_A[m, i, j]
+                        if v > max_val:
+                            max_val = v
+                    if max_val == -np.inf:
+                        cur[m, j] = -np.inf
+                        continue
+                    acc = 0.0
+                    for i in range(n_states):
+                        acc += np.exp(prev[m, i] + log_A[m, i, j] - max_val)
+                    cur[m, j] = max_val + np.log(acc) + log_B[m, t, j]
+            prev, cur = cur, prev
+
+        return prev
+
+    @numba.njit(cache=True)
+    def _viterbi_numba(log_pi, log_A, log_B):
+        T, n_states = log_B.shape
+        delta = np.empty((T, n_states), dtype=log_B.dtype)
+        psi = np.zeros((T, n_states), dtype=np.int64)
+        for j in range(n_states):
+            delta[0, j] = log_pi[j] + log_B[0, j]
+
+        for t in range(1, T):
+            for j in range(n_states):
+                best = 0
+                max_val = -np.inf
+                for i in range(n_states):
+                    v = delta[t-1, i] + log_A[i, j]
+                    if v > max_val:
+                        max_val = v
+                        best = i
+                psi[t, j] = best
+                delta[t, j] = max_val + log_B[t, j]
+
+        path = np.empty(T, dtype=np.int64)
+        path[T-1] = np.argmax(delta[T-1])
+        for t in range(T-1, 0, -1):
+            path[t-1] = psi[t, path[t]]
+
+        return path, delta[T-1, path[T-1]]
+
+    @numba.njit(cache=True)
+    def _viterbi_beam_batch_numba(log_pi, log_A, log_B, beam):
+        n_models, T, n_states = log_B.shape
+        prev = np.empty((n_models, n_states), dtype=log_B.dtype)
+        cur = np.empty((n_models, n_states), dtype=log_B.dtype)
+        active = np.ones(n_models, dtype=np.bool_)
+        frames = np.ones(n_models, dtype=np.int64)
+        for m in range(n_models):
+            for j in range(n_states):
+                prev[m, j] = log_pi[m, j] + log_B[m, 0, j]
+
+        for t in range(1, T):
+            if beam >= 0:
+                best_all = -np.inf
+                for m in range(n_models):
+                    if active[m]:
+                        for j in range(n_states):
+                            if prev[m, j] > best_all:
+                                best_all = prev[m, j]
+                for m in range(n_models):
+                    if active[m]:
+                        model_best = -np.inf
+                        for j in range(n_states):
+                            if prev[m, j] > model_best:
+                                model_best = prev[m, j]
+                        if model_best < best_all - beam:
+                            active[m] = False
+
+            for m in range(n_models):
+                if not active[m]:
+                    continue
+                frames[m] += 1
+                for j in range(n_states):
+                    max_val = -np.inf
+                    for i in range(n_states):
+                        v = prev[m, i] + log_A[m, i, j]
+                        if v > max_val:
+                            max_val = v
+                    cur[m, j] = max_val + log_B[m, t, j]
+            prev, cur = cur, prev
+
+        scores = np.full(n_models, -np.inf, dtype=log_B.dtype)
+        for m in range(n_models):
+            if active[m]:
+                scores[m] = np.max(prev[m])
+        return scores, frames
+
+    @numba.njit(cache=True)
+    def _connected_viterbi_numba(log_pi, log_A, log_B, log_enter, min_frames, max_frames):
+        n_models, T, n_states = log_B.shape
+        prev = np.empty((n_models, n_states), dtype=log_B.dtype)
+        cur = np.empty((n_models, n_states), dtype=log_B.dtype)
+        start_prev = np.zeros((n_models, n_states), dtype=np.int64)
+        start_cur = np.zeros((n_models, n_states), dtype=np.int64)
+        end_model = np.full(T, -1, dtype=np.int64)
+        end_start = np.zeros(T, dtype=np.int64)
+        for m in range(n_models):
+            for j in range(n_states):
+                prev[m, j] = log_pi[m, j] + log_enter[m] + log_B[m, 0, j]
+
+        best = -np.inf
+        for t in range(T):
+            best = -np.inf
+            for m in range(n_models):
+                for j in range(n_states):
+                    if t + 1 - start_prev[m, j] >= min_frames[m] and prev[m, j] > best:
+                        best = prev[m, j]
+                        end_model[t] = m
+                        end_start[t] = start_prev[m, j]
+            if t == T - 1:
+                break
+
+            for m in range(n_models):
+                for j in range(n_states):
+                    max_val = -np.inf
+                    arg = 0
+                    for i in range(n_states):
+                        v = prev[m, i] + log_A[m, i, j]
+                        if v > max_val:
+                            max_val = v
+                            arg = i
+                    begin = start_prev[m, arg]
+                    if t + 1 - begin >= max_frames[m]:
+                        max_val = -np.inf
+                    enter = best + log_pi[m, j] + log_enter[m]
+                    if enter > max_val:
+                        cur[m, j] = enter + log_B[m, t + 1, j]
+                        start_cur[m, j] = t + 1
+                    else:
+                        cur[m, j] = max_val + log_B[m, t + 1, j]
+                        start_cur[m, j] = begin
+            prev, cur = cur, prev
+            start_prev, start_cur = start_cur, start_prev
+
+        return best, end_model, end_start
+
+    @numba.njit(cache=True)
+    def _forward_band_numba(log_pi, log_A_band, log_B):
+        T, n_states = log_B.shape
+        width = log_A_band.shape[1]
+        log_alpha = np.empty((T, n_states), dtype=log_B.dtype)
+        for j in range(n_states):
+            log_alpha[0, j] = log_pi[j] + log_B[0, j]
+
+        for t in range(1, T):
+            for j in range(n_states):
+                max_val = -np.inf
+                for k in range(min(width, j + 1)):
+                    v = log_alpha[t-1, j-k] + log_A_band[j-k, k]
+                    if v > max_val:
+                        max_val = v
+                if max_val == -np.inf:
+                    log_alpha[t, j] = -np.inf
+                    continue
+                acc = 0.0
+                for k in range(min(width, j + 1)):
+                    acc += np.exp(log_alpha[t-1, j-k] + log_A_band[j-k, k] - max_val)
+                log_alpha[t, j] = max_val + np.log(acc) + log_B[t, j]
+
+        return log_alpha
+
+    @numba.njit(cache=True)
+    def _backward_band_numba(log_A_band, log_B):
+        T, n_states = log_B.shape
+        width = log_A_band.shape[1]
+        log_beta = np.empty((T, n_states), dtype=log_B.dtype)
+        for i in range(n_states):
+            log_beta[T-1, i] = 0.0
+
+        for t in range(T-2, -1, -1):
+            for i in range(n_states):
+                max_val = -np.inf
+                for k in range(min(width, n_states - i)):
+                    v = log_A_band[i, k] + log_B[t+1, i+k] + log_beta[t+1, i+k]
+                    if v > max_val:
+                        max_val = v
+                if max_val == -np.inf:
+                    log_beta[t, i] = -np.inf
+                    continue
+                acc = 0.0
+                for k in range(min(width, n_states - i)):
+                    acc += np.exp(log_A_band[i, k] + log_B[t+1, i+k] + log_beta[t+1, i+k] - max_val)
+                log_beta[t, i] = max_val + np.log(acc)
+
+        return log_beta
+
+    @numba.njit(cache=True)
+    def _forward_last_batch_band_numba(log_pi, log_A_band, log_B):
+        n_models, T, n_states = log_B.shape
+        width = log_A_band.shape[2]
+        prev = np.empty((n_models, n_states), dtype=log_B.dtype)
+        cur = np.empty((n_models, n_states), dtype=log_B.dtype)
+        for m in range(n_models):
+            for j in range(n_states):
+                prev[m, j] = log_pi[m, j] + log_B[m, 0, j]
+
+        for t in range(1, T):
+            for m in range(n_models):
+                for j in range(n_states):
+                    max_val = -np.inf
+                    for k in range(min(width, j + 1)):
+                        v = prev[m, j-k] + log_A_band[m, j-k, k]
+                        if v > max_val:
+                            max_val = v
+                    if max_val == -np.inf:
+                        cur[m, j] = -np.inf
+                        continue
+                    acc = 0.0
+                    for k in range(min(width, j + 1)):
+                        acc += np.exp(prev[m, j-k] + log_A_band[m, j-k, k] - max_val)
+                    cur[m, j] = max_val + np.log(acc) + log_B[m, t, j]
+            prev, cur = cur, prev
+
+        return prev
+
+    @numba.njit(cache=True)
+    def _viterbi_band_numba(log_pi, log_A_band, log_B):
+        T, n_states = log_B.shape
+        width = log_A_band.shape[1]
+        delta = np.empty((T, n_states), dtype=log_B.dtype)
+        psi = np.zeros((T, n_states), dtype=np.int64)
+        for j in range(n_states):
+            delta[0, j] = log_pi[j] + log_B[0, j]
+
+        for t in range(1, T):
+            for j in range(n_states):
+                best = j
+                max_val = -np.inf
+                for k in range(min(width, j + 1)):
+                    v = delta[t-1, j-k] + log_A_band[j-k, k]
+                    if v > max_val:
+                        max_val = v
+                        best = j - k
+                psi[t, j] = best
+                delta[t, j] = max_val + log_B[t, j]
+
+        path = np.empty(T, dtype=np.int64)
+        path[T-1] = np.argmax(delta[T-1])
+        for t in range(T-1, 0, -1):
+            path[t-1] = psi[t, path[t]]
+
+        return path, delta[T-1, path[T-1]]
+
+    @numba.njit(cache=True)
+    def _viterbi_beam_batch_band_numba(log_pi, log_A_band, log_B, beam):
+        n_models, T, n_states = log_B.shape
+        width = log_A_band.shape[2]
+        prev = np.empty((n_models, n_states), dtype=log_B.dtype)
+        cur = np.empty((n_models, n_states), dtype=log_B.dtype)
+        active = np.ones(n_models, dtype=np.bool_)
+        frames = np.ones(n_models, dtype=np.int64)
+        for m in range(n_models):
+            for j in range(n_states):
+                prev[m, j] = log_pi[m, j] + log_B[m, 0, j]
+
+        for t in range(1, T):
+            if beam >= 0:
+                best_all = -np.inf
+                for m in range(n_models):
+                    if active[m]:
+                        for j in range(n_states):
+                            if prev[m, j] > best_all:
+                                best_all = prev[m, j]
+                for m in range(n_models):
+                    if active[m]:
+                        model_best = -np.inf
+                        for j in range(n_states):
+                            if prev[m, j] > model_best:
+                                model_best = prev[m, j]
+                        if model_best < best_all - beam:
+                            active[m] = False
+
+            for m in range(n_models):
+                if not active[m]:
+                    continue
+                frames[m] += 1
+                for j in range(n_states):
+                    max_val = -np.inf
+                    for k in range(min(width, j + 1)):
+                        v = prev[m, j-k] + log_A_band[m, j-k, k]
+                        if v > max_val:
+                            max_val = v
+                    cur[m, j] = max_val + log_B[m, t, j]
+            prev, cur = cur, prev
+
+        scores = np.full(n_models, -np.inf, dtype=log_B.dtype)
+        for m in range(n_models):
+            if active[m]:
+                scores[m] = np.max(prev[m])
+        return scores, frames
+
+    @numba.njit(cache=True)
+    def _mixture_logsumexp_numba(log_C):
+        # log_C is (rows, M); max and sum in one pass over each row
+        n_rows, n_mix = log_C.shape
+        out = np.empty(n_rows, dtype=log_C.dtype)
+        for r in range(n_rows):
+            max_val = -np.inf
+            for m in range(n_mix):
+                if log_C[r, m] > max_val:
+                    max_val = log_C[r, m]
+            if max_val == -np.inf:
+                out[r] = -np.inf
+                continue
+            acc = 0.0
+            for m in range(n_mix):
+                acc += np.exp(log_C[r, m] - max_val)
+            out[r] = max_val + np.log(acc)
+        return out
+
+    def mixture_logsumexp_numba(log_C):
+        shape = log_C.shape[:-1]
+        return _mixture_logsumexp_numba(np.ascontiguousarray(log_C).reshape(-1, log_C.shape[-1])).reshape(shape)
+
+    def forward_numba(log_pi, log_A, log_B):
+        return _forward_numba(np.ascontiguousarray(log_pi), np.ascontiguousarray(log_A),
+                              np.ascontiguousarray(log_B))
+
+    def backward_numba(log_A, log_B):
+        return _backward_numba(np.ascontiguousarray(log_A), np.ascontiguousarray(log_B))
+
+    def forward_last_batch_numba(log_pi, log_A, log_B):
+        return _forward_last_batch_numba(np.ascontiguousarray(log_pi), np.ascontiguousarray(log_A),
+                                         np.ascontiguousarray(log_B))
+
+    def viterbi_numba(log_pi, log_A, log_B):
+        return _viterbi_numba(np.ascontiguousarray(log_pi), np.ascontiguousarray(log_A),
+                              np.ascontiguousarray(log_B))
+
+    def viterbi_beam_batch_numba(log_pi, log_A, log_B, beam):
+        # Negative beam means "no pruning" inside the compiled kernel
+        return _viterbi_beam_batch_numba(np.ascontiguousarray(log_pi), np.ascontiguousarray(log_A),
+                                         np.ascontiguousarray(log_B), -1.0 if beam is None else float(beam))
+
+    def forward_band_numba(log_pi, log_A_band, log_B):
+        return _forward_band_numba(np.ascontiguousarray(log_pi), np.ascontiguousarray(log_A_band),
+                                   np.ascontiguousarray(log_B))
+
+    def backward_band_numba(log_A_band, log_B):
+        return _backward_band_numba(np.ascontiguousarray(log_A_band), np.ascontiguousarray(log_B))
+
+    def forward_last_batch_band_numba(log_pi, log_A_band, log_B):
+        return _forward_last_batch_band_numba(np.ascontiguousarray(log_pi), np.ascontiguousarray(log_A_band),
+                                              np.ascontiguousarray(log_B))
+
+    def viterbi_band_numba(log_pi, log_A_band, log_B):
+        return _viterbi_band_numba(np.ascontiguousarray(log_pi), np.ascontiguousarray(log_A_band),
+                                   np.ascontiguousarray(log_B))
+
+    def viterbi_beam_batch_band_numba(log_pi, log_A_band, log_B, beam):
+        return _viterbi_beam_batch_band_numba(np.ascontiguousarray(log_pi), np.ascontiguousarray(log_A_band),
+                                              np.ascontiguousarray(log_B), -1.0 if beam is None else float(beam))
+
+    def connected_viterbi_numba(log_pi, log_A, log_B, log_enter, min_frames, max_frames):
+        return _connected_viterbi_numba(np.ascontiguousarray(log_pi), np.ascontiguousarray(log_A),
+                                        np.ascontiguousarray(log_B),
+                                        np.ascontiguousarray(log_enter, dtype=log_B.dtype),
+                                        np.ascontiguousarray(min_frames, dtype=np.int64),
+                                        np.ascontiguousarray(max_frames, dtype=np.int64))
+
+
+# ----------------------------------------------------------------------------
+# Runtime selection
+# ----------------------------------------------------------------------------
+
+_KERNELS = ('forward', 'backward', 'forward_last_batch', 'viterbi', 'viterbi_beam_batch',
+            'connected_viterbi', 'forward_band', 'backward_band', 'forward_last_batch_band',
+            'viterbi_band', 'viterbi_beam_batch_band', 'mixture_logsumexp')
+
+_BACKENDS = {'numpy': {k: globals()[k + '_numpy'] for k in _KERNELS}}
+if numba is not None:
+    _BACKENDS['numba'] = {k: globals()[k + '_numba'] for k in _KERNELS}
+
+# Bound by set_backend()
+forward = None
+backward = None
+forward_last_batch = None
+viterbi = None
+viterbi_beam_batch = None
+connected_viterbi = None
+forward_band = None
+backward_band = None
+forward_last_batch_band = None
+viterbi_band = None
+viterbi_beam_batch_band = None
+mixture_logsumexp = None
+backend = None
+
+
+def available_backends():
+    return list(_BACKENDS)
+
+
+def set_backend(name='auto'):
+    """
+    Select the recursion back-end: 'numpy', 'numba' or 'auto'.
+    """
+    global backend
+    if name == 'auto':
+        name = 'numba' if 'numba' in _BACKENDS else 'numpy'
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown or unavailable HMM kernel '{name}' (available: {available_backends()})")
+    globals().update(_BACKENDS[name])
+    backend = name
+    return name
+
+
+set_backend(os.environ.get("HMM_KERNEL", "auto"))
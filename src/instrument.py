@@ -0,0 +1,267 @@
+"""
+Hot-path instrumentation: per-stage timers, counters and latency histograms
+for the recognition pipeline, plus optional per-request cProfile dumps.
+
+Off by default, and then a wrapped function costs one flag check per call.
+Switched at runtime: HMM_INSTRUMENT=1 (HMM_PROFILE=<dir> also writes a
+cProfile .prof file per request into <dir>), or set_enabled() from code.
+
+    @instrument.timed("compute_mfcc")       # stage timer around a function
+    with instrument.stage("capture"): ...   # stage timer around a block
+    instrument.count("frames", n)           # counter
+    with instrument.request("predict") as req: ...
+
+Stage times are inclusive (compute_mfcc contains compute_fft_power). A
+request collects the stages and counters of its own thread; the last
+finished one is kept for display (format_breakdown, the GUI status bar).
+report() / summary() / save_report() give the aggregates over all requests:
+calls, totals and a log2 histogram of call times per stage.
+Work done in process-pool workers (train(n_jobs > 1)) is not collected.
+"""
+import os
+import json
+import time
+import cProfile
+import threading
+import functools
+import contextlib
+
+# Bound by set_enabled()
+enabled = False
+profile_dir = None
+
+N_BUCKETS = 32 # Histogram bucket b holds calls of [2^(b-1), 2^b) microseconds
+
+_lock = threading.Lock()
+_local = threading.local()
+_stages = {}
+_counters = {}
+_last_request = None
+_n_requests = 0
+_NULL = contextlib.nullcontext()
+
+
+class _Stage:
+    """
+    Aggregate timings of one stage.
+    """
+    __slots__ = ("calls", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.buckets = [0] * N_BUCKETS
+
+    def add(self, seconds):
+        self.calls += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        self.buckets[min(max(int(seconds * 1e6), 0).bit_length(), N_BUCKETS - 1)] += 1
+
+    def percentile(self, q):
+        """
+        Upper edge of the bucket holding the q-th percentile, in ms.
+        """
+        target = q / 100.0 * self.calls
+        seen = 0
+        for b, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= target:
+                return min((1 << b) / 1e3, self.max * 1e3)
+        return self.max * 1e3
+
+    def to_dict(self):
+        return {"calls": self.calls, "total_ms": self.total * 1e3,
+                "mean_ms": self.total * 1e3 / max(self.calls, 1),
+                "min_ms": self.min * 1e3 if self.calls else 0.0, "max_ms": self.max * 1e3,
+                "p50_ms": self.percentile(50), "p95_ms": self.percentile(95), "p99_ms": self.percentile(99),
+                # [upper edge in ms, calls] of the non-empty buckets
+                "histogram": [[(1 << b) / 1e3, n] for b, n in enumerate(self.buckets) if n]}
+
+
+def set_enabled(on=True, profile=None):
+    """
+    Switch instrumentation on or off. profile: directory for per-request
+    cProfile dumps (None = no profiling).
+    """
+    global enabled, profile_dir
+    enabled = bool(on)
+    profile_dir = profile if enabled else None
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+    return enabled
+
+
+def reset():
+    """
+    Forget all aggregates and the last request.
+    """
+    global _last_request, _n_requests
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _last_request = None
+        _n_requests = 0
+
+
+def _record(name, seconds):
+    with _lock:
+        s = _stages.get(name)
+        if s is None:
+            s = _stages[name] = _Stage()
+        s.add(seconds)
+    req = getattr(_local, "request", None)
+    if req is not None:
+        entry = req["stages"].setdefault(name, {"ms": 0.0, "calls": 0, "depth": 0})
+        entry["ms"] += seconds * 1e3
+        entry["calls"] += 1
+
+
+@contextlib.contextmanager
+def _timing(name):
+    req = getattr(_local, "request", None)
+    depth = getattr(_local, "depth", 0)
+    if req is not None and name not in req["stages"]:
+        # Added on entry, so the breakdown lists stages in the order they start
+        req["stages"][name] = {"ms": 0.0, "calls": 0, "depth": depth}
+    _local.depth = depth + 1
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _local.depth = depth
+        _record(name, time.perf_counter() - t0)
+
+
+def timed(name):
+    """
+    Decorator: time every call of the function as stage `name`.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            with _timing(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def stage(name):
+    """
+    Context manager timing a block as stage `name`.
+    """
+    return _timing(name) if enabled else _NULL
+
+
+def count(name, n=1):
+    """
+    Add n to counter `name` (callers in hot loops check `enabled` first).
+    """
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+    req = getattr(_local, "request", None)
+    if req is not None:
+        req["counters"][name] = req["counters"].get(name, 0) + n
+
+
+@contextlib.contextmanager
+def _request(name):
+    global _last_request, _n_requests
+    outer = getattr(_local, "request", None)
+    req = {"name": name, "stages": {}, "counters": {}, "total_ms": 0.0, "profile": None}
+    _local.request = req
+    depth = getattr(_local, "depth", 0)
+    _local.depth = 0
+    with _lock:
+        _n_requests += 1
+        seq = _n_requests
+    profiler = None
+    if profile_dir:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            profiler = None # Another profiler is active
+    t0 = time.perf_counter()
+    try:
+        yield req
+    finally:
+        req["total_ms"] = (time.perf_counter() - t0) * 1e3
+        if profiler is not None:
+            profiler.disable()
+            req["profile"] = os.path.join(profile_dir, f"{seq:05d}_{name}.prof")
+            profiler.dump_stats(req["profile"])
+        _local.request = outer
+        _local.depth = depth
+        with _lock:
+            _last_request = req
+
+
+def request(name):
+    """
+    Context manager for one request (a recognition, a training run): collects
+    its stage times and counters and, with profiling on, a cProfile dump.
+    Yields the request dict, or None when instrumentation is off.
+    """
+    return _request(name) if enabled else _NULL
+
+
+def last_request():
+    """
+    The last finished request: {"name", "total_ms", "stages": {name: {"ms",
+    "calls", "depth"}}, "counters", "profile"}, or None.
+    """
+    return _last_request
+
+
+def format_breakdown(req, max_stages=8):
+    """
+    One-line stage breakdown of a request: its outermost stages in the
+    order they ran, e.g. "predict 41 ms: capture 35.0 | compute_mfcc 3.2 | ...".
+    """
+    if not req:
+        return ""
+    top = [(name, s["ms"]) for name, s in req["stages"].items() if s["depth"] == 0]
+    parts = [f"{name} {ms:.1f}" for name, ms in top[:max_stages]]
+    return f"{req['name']} {req['total_ms']:.0f} ms: " + " | ".join(parts)
+
+
+def report():
+    """
+    Aggregates since the last reset(): {"requests", "stages": {name: {...}},
+    "counters": {name: n}}.
+    """
+    with _lock:
+        return {"requests": _n_requests,
+                "stages": {name: s.to_dict() for name, s in _stages.items()},
+                "counters": dict(_counters)}
+
+
+def summary():
+    """
+    report() as a table, stages by total time.
+    """
+    rep = report()
+    lines = [f"{'stage':24s} {'calls':>8s} {'total ms':>10s} {'mean ms':>9s} "
+             f"{'p50':>8s} {'p95':>8s} {'p99':>8s}"]
+    for name, s in sorted(rep["stages"].items(), key=lambda kv: -kv[1]["total_ms"]):
+        lines.append(f"{name:24s} {s['calls']:8d} {s['total_ms']:10.1f} {s['mean_ms']:9.3f} "
+                     f"{s['p50_ms']:8.3f} {s['p95_ms']:8.3f} {s['p99_ms']:8.3f}")
+    if rep["counters"]:
+        lines.append("  ".join(f"{name}: {n}" for name, n in sorted(rep["counters"].items())))
+    return "\n".join(lines)
+
+
+def save_report(path):
+    with open(path, "w") as f:
+        json.dump(report(), f, indent=1)
+
+
+set_enabled(os.environ.get("HMM_INSTRUMENT", "0") not in ("", "0"), os.environ.get("HMM_PROFILE") or None)
@@ -0,0 +1,277 @@
+"""
+Continuous (always-listening) recognition.
+
+    audio callback --> RingBuffer --> consumer thread:
+                                        StreamingMFCC (incremental features)
+                                        EndpointDetector (utterance boundaries)
+                                        ModelBank (score each utterance)
+
+The audio callback only copies samples into the ring buffer, so it never
+waits on feature extraction or scoring. SimulatedInputStream replays WAV
+files through the same callback interface as sounddevice.InputStream, so
+the whole loop can run without audio hardware (see simulate_live.py).
+"""
+import time
+import threading
+import numpy as np
+from src import precision, instrument
+from src.streaming import StreamingMFCC
+from src.vad import EndpointDetector, frame_energy_db, zero_crossing_rate, stats_speech_mask, mask_bounds
+from src.feature_cache import DEFAULT_PARAMS, WINDOWS
+
+
+class RingBuffer:
+    """
+    Single-producer / single-consumer sample FIFO without locks.
+
+    The producer only advances the write count and the consumer only the
+    read count; each side publishes its count after copying, so the other
+    side never sees a half-written region. When full, new samples are
+    dropped (and counted) instead of blocking the producer.
+    """
+    def __init__(self, capacity, dtype=np.float32):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=dtype)
+        self._written = 0  # Total samples written (producer)
+        self._read = 0     # Total samples read (consumer)
+        self.dropped = 0
+
+    def available(self):
+        return self._written - self._read
+
+    def write(self, samples):
+        """
+        Producer side. Returns the number of samples stored.
+        """
+        samples = np.asarray(samples).reshape(-1)
+        free = self.capacity - (self._written - self._read)
+        n = min(len(samples), free)
+        if n < len(samples):
+            self.dropped += len(samples) - n
+        if n == 0:
+            return 0
+        start = self._written % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[:n - first] = samples[first:n]
+        self._written += n
+        return n
+
+    def read(self, max_samples=None):
+        """
+        Consumer side. Returns a copy of up to max_samples queued samples.
+        """
+        n = self.available()
+        if max_samples is not None:
+            n = min(n, max_samples)
+        start = self._read % self.capacity
+        first = min(n, self.capacity - start)
+        out = np.concatenate([self._data[start:start + first], self._data[:n - first]])
+        self._read += n
+        return out
+
+
+class ContinuousRecognizer:
+    """
+    Segments a live stream into utterances and scores each one.
+
+    Use audio_callback as the sounddevice.InputStream callback (float32
+    samples in [-1, 1]); on_result(label, scores, start_s, end_s) is called
+    from the consumer thread for every detected utterance, with scores as a
+    ranked list of (label, score) and times in seconds from the stream start.
+
+    Features (and each frame's energy / zero-crossing rate) are computed
+    incrementally as audio arrives. When the endpoint detector closes an
+    utterance, the frames around it (context frames of silence on each side,
+    like a recorded file) are trimmed with the same VAD rule as in training
+    and the remaining MFCC frames are scored.
+    """
+    def __init__(self, bank, sample_rate, on_result=None, params=DEFAULT_PARAMS,
+                 decoder="forward", beam=None, buffer_seconds=5.0, max_utterance=3.0,
+                 context=20, poll_interval=0.01):
+        self.bank = bank
+        self.sample_rate = sample_rate
+        self.on_result = on_result
+        self.decoder = decoder
+        self.beam = beam
+        self.poll_interval = poll_interval
+
+        self.ring = RingBuffer(int(buffer_seconds * sample_rate))
+        self.frontend = StreamingMFCC(sample_rate, alpha=params["pre_emphasis"]["alpha"],
+                                      window_func=WINDOWS[params["apply_window"]["window"]],
+                                      **params["frame_signal"], **params["compute_mfcc"])
+        self.detector = EndpointDetector(sample_rate, noise_adapt=0.05)
+        self.vad = dict(params.get("vad") or {})
+        self.margin = self.vad.pop("margin_frames", 5)
+        self.context = context
+        self.max_frames = int(max_utterance * 1000) // 10  # Detector frames are 10 ms
+
+        self._feats = np.zeros((0, self.frontend.num_ceps), dtype=precision.dtype)
+        self._energy = np.zeros(0)
+        self._zcr = np.zeros(0)
+        self._feats_start = 0  # Absolute MFCC frame index of _feats[0]
+        self._thread = None
+        self._running = False
+        self.input_overflows = 0
+        self.utterances = 0
+        self.busy_time = 0.0   # Consumer time spent working (not waiting)
+
+    # ------------------------------------------------------------------
+    # Producer side (audio thread)
+    # ------------------------------------------------------------------
+
+    def audio_callback(self, indata, frames, time_info, status):
+        if status:
+            self.input_overflows += 1
+        self.ring.write(indata[:, 0])
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the consumer thread after it drains the buffer.
+        """
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while self._running:
+            if not self.process_available():
+                time.sleep(self.poll_interval)
+        self.process_available()
+
+    def process_available(self):
+        """
+        Consume everything queued in the ring buffer. Returns the number of
+        samples processed (0 if there was nothing to do).
+        """
+        samples = self.ring.read()
+        if len(samples) == 0:
+            return 0
+        t0 = time.perf_counter()
+        samples = samples.astype(precision.dtype) * 32767 # Same scale as read_wav
+
+        frames = self.frontend.push_frames(samples)
+        if len(frames):
+            self._feats = np.concatenate([self._feats, self.frontend.features(frames)])
+            self._energy = np.concatenate([self._energy, frame_energy_db(frames)])
+            self._zcr = np.concatenate([self._zcr, zero_crossing_rate(frames)])
+
+        ended = self.detector.push(samples)
+        while True:
+            det = self.detector
+            if not ended and det.in_speech and det.n_frames - det.speech_start > self.max_frames:
+                det.end_now()
+                ended = True
+            if not ended:
+                break
+            self._emit(det.speech_start, det.speech_end)
+            det.rearm()
+            ended = det.push(np.zeros(0))
+
+        self._drop_old_features()
+        self.busy_time += time.perf_counter() - t0
+        return len(samples)
+
+    def _to_mfcc_frame(self, det_frame):
+        return det_frame * self.detector.frame_length // self.frontend.frame_step
+
+    def _emit(self, speech_start, speech_end):
+        lo = max(self._to_mfcc_frame(speech_start) - self.context - self._feats_start, 0)
+        hi = self._to_mfcc_frame(speech_end) + self.context - self._feats_start
+        energy = self._energy[lo:hi]
+        if len(energy) == 0:
+            return
+        a, b = mask_bounds(stats_speech_mask(energy, self._zcr[lo:hi], **self.vad), self.margin)
+        start = self._feats_start + lo + a
+        mfcc = self._feats[lo + a:lo + b]
+        with instrument.request("live"):
+            if self.decoder == "viterbi":
+                ranked = self.bank.rank_viterbi(mfcc, self.beam)
+            else:
+                ranked = self.bank.rank(mfcc)
+        self.utterances += 1
+        if self.on_result is not None:
+            step = self.frontend.frame_step / self.sample_rate
+            self.on_result(ranked[0][0], ranked, start * step, (start + len(mfcc)) * step)
+
+    def _drop_old_features(self):
+        # Keep what the current (or next) utterance can still need
+        det = self.detector
+        if det.speech_start is not None:
+            keep_from = self._to_mfcc_frame(det.speech_start) - self.context
+        else:
+            keep_from = self._to_mfcc_frame(det.n_frames - det.speech_frames) - self.context
+        drop = keep_from - self._feats_start
+        if drop > 0:
+            self._feats = self._feats[drop:]
+            self._energy = self._energy[drop:]
+            self._zcr = self._zcr[drop:]
+            self._feats_start += drop
+
+
+class SimulatedInputStream:
+    """
+    Stand-in for sounddevice.InputStream that plays a signal (e.g. dataset
+    WAVs joined with pauses) into the callback, block by block, from its own
+    thread. realtime=True paces the blocks like a sound card; False pushes
+    them as fast as possible.
+
+    signal: int16-scale samples (as read_wav returns), sent as float32 in [-1, 1].
+    """
+    def __init__(self, signal, samplerate, blocksize, callback, realtime=True):
+        self.signal = (np.asarray(signal, dtype=float) / 32767).astype(np.float32)
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.callback = callback
+        self.realtime = realtime
+        self.active = False
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self):
+        self.active = True
+        self._thread = threading.Thread(target=self._play, daemon=True)
+        self._thread.start()
+
+    def _play(self):
+        t_start = time.perf_counter()
+        for i, pos in enumerate(range(0, len(self.signal), self.blocksize)):
+            if not self.active:
+                break
+            if self.realtime:
+                delay = t_start + i * self.blocksize / self.samplerate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            block = self.signal[pos:pos + self.blocksize]
+            self.callback(block[:, None], len(block), None, None)
+        self.active = False
+
+    def wait(self):
+        """
+        Block until the whole signal has been played.
+        """
+        if self._thread is not None:
+            self._thread.join()
+
+    def stop(self):
+        self.active = False
+        self.wait()
+
+    def close(self):
+        self.stop()
@@ -0,0 +1,204 @@
+import numpy as np
+from src import hmm_kernels, precision, instrument
+
+class ModelBank:
+    """
+    All digit HMMs stacked into contiguous arrays so one utterance is scored
+    against every model in a single pass:
+    - one (T, D) x (D, M*N) emission evaluation for all M models
+    - one batched Forward recursion over (M, N, N) log-transitions
+
+    Models with fewer states than the largest one are padded with unreachable
+    states (log pi = -inf, no incoming transitions), which never carry mass.
+
+    When every model is left-to-right (banded), the recursions run on the
+    stacked bands (M, N, K) and only visit the allowed arcs; log_A (dense)
+    is still built for code that needs the full matrices.
+
+    GMM states add a component axis: the matmul covers every (model, state,
+    component) Gaussian, and one log-sum-exp reduces the components. States
+    with fewer components than the largest mixture are padded with -inf ones.
+
+    Parameters are kept in float64; scoring runs in the compute precision
+    (src.precision), with a cast copy made once per dtype.
+    """
+    def __init__(self, models):
+        """
+        models: dict {label: HMMManual}, e.g. the {digit: model} dicts loaded
+        by app_gui.py and test_accuracy.py.
+        """
+        if not models:
+            raise ValueError("ModelBank needs at least one model")
+
+        self.labels = list(models.keys())
+        hmms = [models[k] for k in self.labels]
+
+        n_models = len(hmms)
+        n_states = max(m.n_states for m in hmms)
+        n_features = hmms[0].means.shape[-1]
+        n_mix = max(hmm.mixture_params()[0].shape[1] for hmm in hmms)
+        self.n_models = n_models
+        self.n_states = n_states
+        self.n_features = n_features
+        self.n_mix = n_mix
+
+        self.weights = np.zeros((n_models, n_states, n_mix))
+        self.means = np.zeros((n_models, n_states, n_mix, n_features))
+        self.covs = np.ones((n_models, n_states, n_mix, n_features))
+        self.log_pi = np.full((n_models, n_states), -np.inf)
+        self.log_A = np.full((n_models, n_states, n_states), -np.inf)
+
+        widths = [hmm.band_width for hmm in hmms]
+        self.band_width = None if None in widths else max(widths)
+        if self.band_width is not None:
+            self.log_A_band = np.full((n_models, n_states, self.band_width), -np.inf)
+
+        neg_half_inv_cov = np.zeros((n_models, n_states, n_mix, n_features))
+        mean_inv_cov = np.zeros((n_models, n_states, n_mix, n_features))
+        log_const = np.full((n_models, n_states, n_mix), -np.inf)
+
+        for m, hmm in enumerate(hmms):
+            n = hmm.n_states
+            if hmm.means.shape[-1] != n_features:
+                raise ValueError(f"Model '{self.labels[m]}' has {hmm.means.shape[-1]} features, expected {n_features}")
+
+            # Same constants HMMManual._calc_log_B uses
+            if getattr(hmm, '_log_const', None) is None:
+                hmm._update_emission_cache()
+
+            weights, means, covs = hmm.mixture_params()
+            k = weights.shape[1]
+            self.weights[m, :n, :k] = weights
+            self.means[m, :n, :k] = means
+            self.covs[m, :n, :k] = covs
+            with np.errstate(divide='ignore'):
+                self.log_pi[m, :n] = np.log(hmm.pi)
+                self.log_A[m, :n, :n] = np.log(hmm.A)
+                if self.band_width is not None:
+                    self.log_A_band[m, :n, :hmm.band_width] = np.log(hmm.A_band)
+
+            neg_half_inv_cov[m, :n, :k] = hmm._neg_half_inv_cov.reshape(n, k, n_features)
+            mean_inv_cov[m, :n, :k] = hmm._mean_inv_cov.reshape(n, k, n_features)
+            log_const[m, :n, :k] = hmm._log_const.reshape(n, k)
+
+        # Flattened to (M*N*mix, D) so the emission step is a single matmul
+        self._neg_half_inv_cov = neg_half_inv_cov.reshape(-1, n_features)
+        self._mean_inv_cov = mean_inv_cov.reshape(-1, n_features)
+        self._log_const = log_const.reshape(-1)
+        self._by_dtype = {}
+
+    def _compute_arrays(self, dtype):
+        """
+        Emission constants and log transitions cast to dtype (cached).
+        """
+        dtype = np.dtype(dtype)
+        if dtype not in self._by_dtype:
+            log_trans = self.log_A_band if self.band_width is not None else self.log_A
+            self._by_dtype[dtype] = tuple(a.astype(dtype) for a in (
+                self._neg_half_inv_cov, self._mean_inv_cov, self._log_const, self.log_pi, log_trans))
+        return self._by_dtype[dtype]
+
+    @instrument.timed("bank.calc_log_B")
+    def _calc_log_B(self, X):
+        """
+        Log emission probabilities for every model at once.
+        Returns (M, T, N).
+        """
+        neg_half_inv_cov, mean_inv_cov, log_const, _, _ = self._compute_arrays(precision.dtype)
+        X = np.asarray(X, dtype=precision.dtype)
+        if instrument.enabled:
+            instrument.count("emissions", len(X) * len(log_const)) # Gaussians evaluated
+        log_B = np.dot(X ** 2, neg_half_inv_cov.T)
+        log_B += np.dot(X, mean_inv_cov.T)
+        log_B += log_const
+        T = X.shape[0]
+        if self.n_mix > 1:
+            # (T, M*N*mix) -> (T, M*N)
+            log_B = hmm_kernels.mixture_logsumexp(log_B.reshape(T, -1, self.n_mix))
+        # (T, M*N) -> (M, T, N)
+        return np.ascontiguousarray(log_B.reshape(T, self.n_models, self.n_states).transpose(1, 0, 2))
+
+    def emissions(self, observation):
+        """
+        Log emission probabilities of every state of every model, (M, T, N)
+        in the order of self.labels (for decoders built on the bank).
+        """
+        return self._calc_log_B(observation)
+
+    @instrument.timed("bank.score_all")
+    def score_all(self, observation):
+        """
+        Log-likelihood of the observation under every model, shape (M,),
+        in the order of self.labels.
+        """
+        log_B = self._calc_log_B(observation)
+        if instrument.enabled:
+            instrument.count("forward_steps", log_B.shape[0] * log_B.shape[1]) # Frames x models
+        _, _, _, log_pi, log_trans = self._compute_arrays(log_B.dtype)
+        if self.band_width is not None:
+            log_alpha_T = hmm_kernels.forward_last_batch_band(log_pi, log_trans, log_B)
+        else:
+            log_alpha_T = hmm_kernels.forward_last_batch(log_pi, log_trans, log_B)
+        return hmm_kernels.logsumexp(log_alpha_T, axis=1)
+
+    @instrument.timed("bank.score_batch")
+    def score_batch(self, observations):
+        """
+        score_all for several utterances at once: one emission evaluation over
+        all their frames stacked, then the Forward recursion per utterance.
+        Returns (len(observations), M).
+        """
+        lengths = [len(obs) for obs in observations]
+        log_B = self._calc_log_B(np.concatenate(observations)) if observations else None
+        if instrument.enabled:
+            instrument.count("forward_steps", sum(lengths) * self.n_models)
+        _, _, _, log_pi, log_trans = self._compute_arrays(precision.dtype)
+        forward_last = (hmm_kernels.forward_last_batch_band if self.band_width is not None
+                        else hmm_kernels.forward_last_batch)
+        scores = np.empty((len(observations), self.n_models))
+        start = 0
+        for i, n in enumerate(lengths):
+            log_alpha_T = forward_last(log_pi, log_trans, log_B[:, start:start + n])
+            scores[i] = hmm_kernels.logsumexp(log_alpha_T, axis=1)
+            start += n
+        return scores
+
+    def score(self, observation):
+        """
+        Dict {label: log-likelihood}, same shape as the per-model loops produced.
+        """
+        scores = self.score_all(observation)
+        return {label: float(s) for label, s in zip(self.labels, scores)}
+
+    def rank(self, observation):
+        """
+        List of (label, log-likelihood) sorted best first.
+        """
+        scores = self.score_all(observation)
+        order = np.argsort(-scores, kind='stable')
+        return [(self.labels[i], float(scores[i])) for i in order]
+
+    @instrument.timed("bank.viterbi_all")
+    def viterbi_all(self, observation, beam=None):
+        """
+        Best-path (Viterbi) log-likelihood under every model, run
+        time-synchronously across models. With a beam, a model is dropped as
+        soon as its best partial score falls more than `beam` below the best
+        partial score of any model; dropped models score -inf.
+        Returns (scores (M,), frames_evaluated (M,)).
+        """
+        log_B = self._calc_log_B(observation)
+        if instrument.enabled:
+            instrument.count("viterbi_steps", log_B.shape[0] * log_B.shape[1])
+        _, _, _, log_pi, log_trans = self._compute_arrays(log_B.dtype)
+        if self.band_width is not None:
+            return hmm_kernels.viterbi_beam_batch_band(log_pi, log_trans, log_B, beam)
+        return hmm_kernels.viterbi_beam_batch(log_pi, log_trans, log_B, beam)
+
+    def rank_viterbi(self, observation, beam=None):
+        """
+        Like rank(), but with Viterbi scores and optional beam pruning.
+        """
+        scores, _ = self.viterbi_all(observation, beam)
+        order = np.argsort(-scores, kind='stable')
+        return [(self.labels[i], float(scores[i])) for i in order]
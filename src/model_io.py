@@ -0,0 +1,225 @@
+"""
+Single-file model bundle for all digit HMMs.
+
+Layout (little-endian):
+    b"HMMB"                       magic
+    uint32                        format version
+    uint32                        header length in bytes
+    header                        UTF-8 JSON: labels, shapes, array offsets, front-end params
+    padding                       up to a 64-byte boundary
+    float32 arrays, C order       pi (M, N), A, weights (M, N, G), means (M, N, G, D),
+                                  covs (M, N, G, D)
+    float64 arrays (optional)     sufficient statistics of the last EM iteration:
+                                  numer_A (like A), denom_A (M, N), numer_means,
+                                  numer_covs (M, N, G, D), denom_gamma (M, N, G)
+
+A is (M, N, N) when any model is ergodic ("transitions": "dense"), or
+(M, N, K) when all are left-to-right ("transitions": "band", column k is
+the arc i -> i+k). "topology" gives each model's structure.
+
+G is the largest number of Gaussians per state; "n_mix" gives each
+model's count (1 = single Gaussian states, loaded with (N, D) means).
+Models with fewer states than N (or components than G) are zero-padded;
+"n_states" in the header gives the real size of each one. Arrays are read with np.memmap, so loading
+only parses the header.
+
+The statistics are written when any model has them (HMMManual.stats,
+kept by train()); the header then has "stats": {"frames", "utterances"}
+per model, null for models without (their arrays are zeros). Loaded
+models with statistics can be updated with partial_fit().
+
+Version history: 1 = dense A, no topology; 2 = topologies; 3 = GMM states
+(weights array, component axis); 4 = optional sufficient statistics, per
+array dtype, arrays aligned to 64 bytes. 1 to 3 are still readable.
+"""
+import os
+import json
+import struct
+import numpy as np
+from src.hmm_core import HMMManual, band_to_dense, dense_to_band
+from src.feature_cache import DEFAULT_PARAMS
+
+MAGIC = b"HMMB"
+FORMAT_VERSION = 4
+READABLE_VERSIONS = (1, 2, 3, 4)
+ALIGN = 64
+ARRAYS = ("pi", "A", "weights", "means", "covs")
+STATS_ARRAYS = HMMManual.STATS
+
+
+def save_bundle(models, path, frontend=DEFAULT_PARAMS):
+    """
+    Write {label: HMMManual} to one bundle file.
+    frontend: parameters of the feature pipeline the models were trained with.
+    """
+    labels = list(models.keys())
+    hmms = [models[k] for k in labels]
+    n_models = len(hmms)
+    n_states = max(m.n_states for m in hmms)
+    n_features = hmms[0].means.shape[-1]
+    n_mix = [m.mixture_params()[0].shape[1] for m in hmms]
+    widths = [m.band_width for m in hmms]
+    band_width = None if None in widths else max(widths)
+
+    arrays = {
+        "pi": np.zeros((n_models, n_states), dtype=np.float32),
+        "A": np.zeros((n_models, n_states, n_states if band_width is None else band_width), dtype=np.float32),
+        "weights": np.zeros((n_models, n_states, max(n_mix)), dtype=np.float32),
+        "means": np.zeros((n_models, n_states, max(n_mix), n_features), dtype=np.float32),
+        "covs": np.ones((n_models, n_states, max(n_mix), n_features), dtype=np.float32),
+    }
+    for m, hmm in enumerate(hmms):
+        n = hmm.n_states
+        arrays["pi"][m, :n] = hmm.pi
+        if band_width is None:
+            arrays["A"][m, :n, :n] = hmm.A
+        else:
+            arrays["A"][m, :n, :hmm.band_width] = hmm.A_band
+        weights, means, covs = hmm.mixture_params()
+        arrays["weights"][m, :n, :n_mix[m]] = weights
+        arrays["means"][m, :n, :n_mix[m]] = means
+        arrays["covs"][m, :n, :n_mix[m]] = covs
+
+    has_stats = [getattr(m, "stats", None) is not None for m in hmms]
+    with_stats = any(has_stats)
+    if with_stats:
+        G, D = max(n_mix), n_features
+        arrays.update({
+            "numer_A": np.zeros(arrays["A"].shape),
+            "denom_A": np.zeros((n_models, n_states)),
+            "numer_means": np.zeros((n_models, n_states, G, D)),
+            "numer_covs": np.zeros((n_models, n_states, G, D)),
+            "denom_gamma": np.zeros((n_models, n_states, G)),
+        })
+        for m, hmm in enumerate(hmms):
+            if not has_stats[m]:
+                continue
+            n, k, stats = hmm.n_states, n_mix[m], hmm.stats
+            numer_A = stats["numer_A"]
+            if band_width is None and hmm.band_width is not None:
+                numer_A = band_to_dense(numer_A) # Banded model stored with ergodic ones
+            arrays["numer_A"][m, :n, :numer_A.shape[1]] = numer_A
+            arrays["denom_A"][m, :n] = stats["denom_A"][:, 0]
+            arrays["numer_means"][m, :n, :k] = stats["numer_means"].reshape(n, k, D)
+            arrays["numer_covs"][m, :n, :k] = stats["numer_covs"].reshape(n, k, D)
+            arrays["denom_gamma"][m, :n, :k] = stats["denom_gamma"].reshape(n, k)
+    names = ARRAYS + (STATS_ARRAYS if with_stats else ())
+
+    # Offsets relative to the start of the data section, each array aligned
+    layout = {}
+    offset = 0
+    for name in names:
+        offset += (-offset) % ALIGN
+        layout[name] = {"offset": offset, "shape": list(arrays[name].shape),
+                        "dtype": arrays[name].dtype.name}
+        offset += arrays[name].nbytes
+
+    header = json.dumps({
+        "labels": labels,
+        "n_states": [m.n_states for m in hmms],
+        "n_features": n_features,
+        "n_iter": [m.n_iter for m in hmms],
+        "n_mix": n_mix,
+        "topology": [getattr(m, "topology", "ergodic") for m in hmms],
+        "transitions": "dense" if band_width is None else "band",
+        "dtype": "float32",
+        "arrays": layout,
+        "frontend": frontend,
+        "stats": {"frames": [int(m.stats["frames"]) if has else None for m, has in zip(hmms, has_stats)],
+                  "utterances": [int(m.stats["utterances"]) if has else None for m, has in zip(hmms, has_stats)]}
+                 if with_stats else None,
+    }).encode("utf-8")
+
+    prefix_len = len(MAGIC) + 8 + len(header)
+    padding = (-prefix_len) % ALIGN
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<II", FORMAT_VERSION, len(header)))
+        f.write(header)
+        f.write(b"\0" * padding)
+        written = 0
+        for name in names:
+            f.write(b"\0" * (layout[name]["offset"] - written))
+            f.write(arrays[name].tobytes())
+            written = layout[name]["offset"] + arrays[name].nbytes
+    os.replace(tmp_path, path)
+
+
+def read_header(path):
+    """
+    Returns (header dict, byte offset of the data section).
+    """
+    with open(path, "rb") as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an HMM bundle")
+        version, header_len = struct.unpack("<II", f.read(8))
+        if version not in READABLE_VERSIONS:
+            raise ValueError(f"{path}: unsupported bundle version {version} (expected one of {READABLE_VERSIONS})")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    prefix_len = len(MAGIC) + 8 + header_len
+    return header, prefix_len + (-prefix_len) % ALIGN
+
+
+def load_bundle(path):
+    """
+    Load a bundle as {label: HMMManual}. Parameters are read-only float32
+    views into one memory map of the file (statistics, if stored, float64).
+    """
+    header, data_offset = read_header(path)
+    data = np.memmap(path, dtype=np.uint8, mode="r", offset=data_offset)
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        count = int(np.prod(spec["shape"]))
+        dtype = np.dtype(spec.get("dtype", "float32")).newbyteorder("<")
+        arrays[name] = np.frombuffer(data, dtype=dtype, count=count,
+                                     offset=spec["offset"]).reshape(spec["shape"])
+
+    topologies = header.get("topology", ["ergodic"] * len(header["labels"]))
+    banded = header.get("transitions", "dense") == "band"
+    n_mix = header.get("n_mix", [1] * len(header["labels"]))
+    if "weights" not in arrays:
+        # Before version 3: single Gaussian states, means (M, N, D)
+        arrays["means"] = arrays["means"][:, :, None]
+        arrays["covs"] = arrays["covs"][:, :, None]
+
+    models = {}
+    for m, (label, n) in enumerate(zip(header["labels"], header["n_states"])):
+        k = n_mix[m]
+        hmm = HMMManual(n_states=n, n_mix=k, n_iter=header["n_iter"][m], topology=topologies[m])
+        hmm.pi = arrays["pi"][m, :n]
+        if banded:
+            hmm.A_band = arrays["A"][m, :n, :hmm.band_width]
+            hmm.A = band_to_dense(hmm.A_band)
+        else:
+            hmm.A = arrays["A"][m, :n, :n]
+            if hmm.band_width is not None:
+                # Left-to-right model stored with ergodic ones
+                hmm.A_band = dense_to_band(hmm.A, hmm.band_width)
+        if k > 1:
+            hmm.weights = arrays["weights"][m, :n, :k]
+            hmm.means = arrays["means"][m, :n, :k]
+            hmm.covs = arrays["covs"][m, :n, :k]
+        else:
+            hmm.means = arrays["means"][m, :n, 0]
+            hmm.covs = arrays["covs"][m, :n, 0]
+        if header.get("stats") and header["stats"]["frames"][m] is not None:
+            numer_A = arrays["numer_A"][m, :n]
+            if hmm.band_width is None:
+                numer_A = numer_A[:, :n]
+            elif banded:
+                numer_A = numer_A[:, :hmm.band_width]
+            else:
+                numer_A = dense_to_band(numer_A[:, :n], hmm.band_width)
+            shape = hmm.means.shape
+            hmm.stats = {"numer_A": numer_A, "denom_A": arrays["denom_A"][m, :n, None],
+                         "numer_means": arrays["numer_means"][m, :n, :k].reshape(shape),
+                         "numer_covs": arrays["numer_covs"][m, :n, :k].reshape(shape),
+                         "denom_gamma": arrays["denom_gamma"][m, :n, :k].reshape(shape[:-1]),
+                         "frames": header["stats"]["frames"][m],
+                         "utterances": header["stats"]["utterances"][m]}
+        models[label] = hmm
+    return models
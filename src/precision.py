@@ -0,0 +1,37 @@
+"""
+Floating-point precision of the recognition pipeline.
+
+'float64' (default) or 'float32'. The selected dtype is used for WAV
+samples (read_wav), framing, MFCC, the feature cache, emission evaluation
+and the log-domain recursions. float32 halves the memory traffic and
+doubles the SIMD width; reductions that lose accuracy in float32 are still
+done in float64 (the log-sum-exp accumulators of the Numba kernels, the
+Baum-Welch sufficient statistics, total log-likelihoods), and trained model
+parameters stay float64.
+
+Picked at runtime: HMM_PRECISION=float32|float64, or set_precision() from
+code (before building ModelBanks / feature stores, which follow it lazily).
+"""
+import os
+import numpy as np
+
+PRECISIONS = {"float32": np.float32, "float64": np.float64}
+
+# Bound by set_precision()
+dtype = None
+name = None
+
+
+def set_precision(precision="float64"):
+    """
+    Select the compute dtype: 'float32' or 'float64'.
+    """
+    global dtype, name
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}' (choose from {list(PRECISIONS)})")
+    dtype = PRECISIONS[precision]
+    name = precision
+    return precision
+
+
+set_precision(os.environ.get("HMM_PRECISION", "float64"))
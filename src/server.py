@@ -0,0 +1,303 @@
+"""
+Headless recognition server: the digit models are loaded once and requests
+arriving close together are recognized in one batched pass.
+
+Wire format (TCP or Unix socket, any number of requests per connection,
+responses may come back out of order, matched by "id"):
+
+    request:   uint32 header_len, uint32 payload_len (little-endian),
+               header (UTF-8 JSON), payload
+    response:  uint32 body_len, body (UTF-8 JSON)
+
+Request header: {"id": any, "format": "wav" | "pcm16" | "float32",
+"sample_rate": int (pcm16 / float32 only)}. The payload is a WAV file, raw
+little-endian int16 samples, or raw float32 samples in [-1, 1] (mono).
+A header over MAX_HEADER or payload over MAX_PAYLOAD bytes closes the
+connection (after answering the requests already read); a sample rate
+too low for one sample per frame step, or above MAX_SAMPLE_RATE, gets an
+error response.
+
+Response: {"id", "label", "ranked": [[label, score], ...] best first,
+"batch_size", "queue_ms", "compute_ms"} or {"id", "error"}.
+
+Micro-batching: the first queued request opens a window of batch_window
+seconds (or until max_batch requests); everything queued by then goes
+through compute_signals_features and ModelBank.score_batch together, on a
+worker thread so the event loop keeps accepting requests meanwhile. With
+the default window of 0, batches still form under load from the requests
+that queue up while the previous batch computes, without delaying a lone
+request.
+"""
+import io
+import json
+import time
+import struct
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from scipy.io import wavfile
+from src import precision, instrument
+from src.feature_cache import compute_signals_features, DEFAULT_PARAMS
+
+FORMATS = ("wav", "pcm16", "float32")
+MAX_PAYLOAD = 16 * 1024 * 1024
+MAX_HEADER = 64 * 1024
+MAX_SAMPLE_RATE = 192000
+
+
+def encode_request(payload, fmt="wav", sample_rate=None, request_id=None):
+    header = {"id": request_id, "format": fmt}
+    if sample_rate is not None:
+        header["sample_rate"] = int(sample_rate)
+    header = json.dumps(header).encode("utf-8")
+    return struct.pack("<II", len(header), len(payload)) + header + payload
+
+
+def encode_response(body):
+    body = json.dumps(body).encode("utf-8")
+    return struct.pack("<I", len(body)) + body
+
+
+async def read_request(reader):
+    """
+    Returns (header dict, payload bytes), or None at end of stream.
+    """
+    try:
+        header_len, payload_len = struct.unpack("<II", await reader.readexactly(8))
+    except asyncio.IncompleteReadError:
+        return None
+    if header_len > MAX_HEADER:
+        raise ValueError(f"Header of {header_len} bytes is too large")
+    if payload_len > MAX_PAYLOAD:
+        raise ValueError(f"Payload of {payload_len} bytes is too large")
+    header = json.loads((await reader.readexactly(header_len)).decode("utf-8"))
+    payload = await reader.readexactly(payload_len)
+    return header, payload
+
+
+async def read_response(reader):
+    """
+    Returns the response dict, or None at end of stream.
+    """
+    try:
+        (body_len,) = struct.unpack("<I", await reader.readexactly(4))
+    except asyncio.IncompleteReadError:
+        return None
+    return json.loads((await reader.readexactly(body_len)).decode("utf-8"))
+
+
+def check_sample_rate(sr, params=DEFAULT_PARAMS):
+    """
+    Raise ValueError unless sr gives at least one sample per frame step
+    (and is not above MAX_SAMPLE_RATE).
+    """
+    frame_step = int(round(params["frame_signal"]["frame_stride"] * sr))
+    if sr <= 0 or frame_step < 1 or sr > MAX_SAMPLE_RATE:
+        raise ValueError(f"Sample rate {sr} out of range (1 sample per frame step up to {MAX_SAMPLE_RATE} Hz)")
+
+
+def decode_payload(header, payload, params=DEFAULT_PARAMS):
+    """
+    Request payload -> (sample_rate, samples), samples on the int16 scale in
+    the compute precision (as read_wav returns them).
+    params: front-end parameters, to check the sample rate against.
+    """
+    fmt = header.get("format", "wav")
+    if fmt == "wav":
+        sr, signal = wavfile.read(io.BytesIO(payload))
+        check_sample_rate(sr, params)
+        if signal.ndim > 1:
+            signal = signal[:, 0]
+        if signal.dtype.kind == "f":
+            signal = signal * 32767
+        return sr, signal.astype(precision.dtype)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}' (expected one of {FORMATS})")
+    if "sample_rate" not in header:
+        raise ValueError(f"Format '{fmt}' needs a sample_rate")
+    sr = int(header["sample_rate"])
+    check_sample_rate(sr, params)
+    if fmt == "pcm16":
+        signal = np.frombuffer(payload, dtype="<i2").astype(precision.dtype)
+    else:
+        signal = np.frombuffer(payload, dtype="<f4").astype(precision.dtype) * 32767
+    return sr, signal
+
+
+class RecognitionServer:
+    """
+    bank: ModelBank of the digit models.
+    params: front-end parameters the models were trained with.
+    batch_window: seconds to wait for more requests after the first one.
+    max_batch: requests per batch at most.
+    """
+    def __init__(self, bank, params=DEFAULT_PARAMS, batch_window=0.0, max_batch=32):
+        self.bank = bank
+        self.params = params
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._queue = None
+        self._batcher = None
+        self._batch = [] # Requests of the batch being computed
+        self._servers = []
+        # One compute thread: batches run one after the other
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+
+    async def start(self, host="127.0.0.1", port=8765, unix_path=None):
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._batch_loop())
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self._handle_client, path=unix_path)
+        else:
+            server = await asyncio.start_server(self._handle_client, host, port)
+        self._servers.append(server)
+        return server
+
+    async def close(self):
+        """
+        Stop accepting connections and the batcher. Requests still queued or
+        in the running batch get an error response instead of hanging.
+        """
+        for server in self._servers:
+            server.close()
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            waiting = self._batch
+            while not self._queue.empty():
+                waiting.append(self._queue.get_nowait())
+            for _, _, _, future in waiting:
+                if not future.done():
+                    self.errors += 1
+                    future.set_result({"error": "Server shutting down"})
+            self._batch = []
+        for server in self._servers:
+            await server.wait_closed()
+        self._executor.shutdown(wait=False)
+
+    async def _handle_client(self, reader, writer):
+        lock = asyncio.Lock() # Responses of one connection are written whole
+        pending = set()
+
+        async def answer(header, payload):
+            body = await self._recognize(header, payload)
+            async with lock:
+                try:
+                    writer.write(encode_response(body))
+                    await writer.drain()
+                except ConnectionError:
+                    pass # Client went away
+
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                # Several requests of one connection can be in flight at once
+                task = asyncio.create_task(answer(*request))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        except (ConnectionError, ValueError, json.JSONDecodeError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            # Requests accepted before a bad frame still get their responses
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            writer.close()
+
+    async def _recognize(self, header, payload):
+        self.requests += 1
+        if not isinstance(header, dict):
+            self.errors += 1
+            return {"id": None, "error": "Bad header: expected a JSON object"}
+        request_id = header.get("id")
+        try:
+            sr, signal = decode_payload(header, payload, self.params)
+        except Exception as e:
+            self.errors += 1
+            return {"id": request_id, "error": f"Bad payload: {e}"}
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((sr, signal, time.perf_counter(), future))
+        body = await future
+        body["id"] = request_id
+        return body
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            self._batch = batch # Same list, filled below
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Also take whatever queued up while waiting, up to max_batch
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            self.batches += 1
+            try:
+                results = await loop.run_in_executor(self._executor, self.recognize_batch,
+                                                     [(sr, signal) for sr, signal, _, _ in batch])
+            except Exception as e:
+                results = [{"error": str(e)}] * len(batch)
+            done = time.perf_counter()
+            for (_, _, queued, future), body in zip(batch, results):
+                if "error" in body:
+                    self.errors += 1
+                else:
+                    body["queue_ms"] = (done - queued) * 1e3 - body["compute_ms"]
+                if not future.done():
+                    future.set_result(dict(body))
+            self._batch = []
+
+    def recognize_batch(self, items):
+        """
+        [(sample_rate, samples), ...] -> one response body per item. Features
+        are computed in one batched call per sample rate and all utterances
+        are scored with one ModelBank.score_batch. An item whose features
+        fail gets an error body; the others are still answered.
+        """
+        t0 = time.perf_counter()
+        failed = {}
+        with instrument.request("batch"):
+            mfccs = [None] * len(items)
+            for sr in set(sr for sr, _ in items):
+                idx = [i for i, (s, _) in enumerate(items) if s == sr]
+                try:
+                    feats = compute_signals_features([items[i][1] for i in idx], sr, self.params)
+                except Exception:
+                    # Find the culprit: one call per item
+                    feats = []
+                    for i in idx:
+                        try:
+                            feats.append(compute_signals_features([items[i][1]], sr, self.params)[0])
+                        except Exception as e:
+                            failed[i] = f"Feature extraction failed: {e}"
+                            feats.append(None)
+                for i, mfcc in zip(idx, feats):
+                    mfccs[i] = mfcc
+
+            valid = [i for i, m in enumerate(mfccs) if m is not None and len(m) > 0]
+            scores = self.bank.score_batch([mfccs[i] for i in valid])
+        compute_ms = (time.perf_counter() - t0) * 1e3
+
+        results = [{"error": failed.get(i, "No audio")} for i in range(len(items))]
+        labels = self.bank.labels
+        for i, row in zip(valid, scores):
+            order = np.argsort(-row, kind='stable')
+            results[i] = {"label": labels[order[0]],
+                          "ranked": [[labels[j], float(row[j])] for j in order],
+                          "batch_size": len(items), "compute_ms": compute_ms}
+        return results
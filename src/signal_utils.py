@@ -1,16 +1,21 @@
 import numpy as np
+from functools import lru_cache
+from numpy.lib.stride_tricks import sliding_window_view
 from scipy.io import wavfile
+from src import precision, instrument
 
+@instrument.timed("read_wav")
 def read_wav(file_path):
     """
     Read a WAV file.
-    Returns: (sample_rate, signal)
+    Returns: (sample_rate, signal), signal in the compute precision (src.precision)
     """
     sr, signal = wavfile.read(file_path)
     # Convert to float to avoid overflow during processing
-    signal = signal.astype(float)
+    signal = signal.astype(precision.dtype)
     return sr, signal
 
+@instrument.timed("pre_emphasis")
 def pre_emphasis(signal, alpha=0.97):
     """
     Apply pre-emphasis filter: y[t] = x[t] - alpha * x[t-1]
@@ -20,11 +25,14 @@ def pre_emphasis(signal, alpha=0.97):
     emphasized_signal = np.append(signal[0], signal[1:] - alpha * signal[:-1])
     return emphasized_signal
 
+@instrument.timed("frame_signal")
 def frame_signal(signal, sample_rate, frame_size=0.025, frame_stride=0.010):
     """
     Split signal into frames.
     frame_size: length of frame in seconds (default 25ms)
     frame_stride: step between frames in seconds (default 10ms)
+    Returns a read-only strided view (num_frames, frame_length), no copy of
+    the samples unless the signal is shorter than one frame (zero-padded).
     """
     signal_length = len(signal)
     frame_length = int(round(frame_size * sample_rate))
@@ -33,24 +41,32 @@ def frame_signal(signal, sample_rate, frame_size=0.025, frame_stride=0.010):
     # Calculate number of frames
     num_frames = int(np.ceil(float(np.abs(signal_length - frame_length)) / frame_step))
     
-    # Pad Signal to make sure that all frames have equal number of samples
-    pad_signal_length = num_frames * frame_step + frame_length
-    z = np.zeros((pad_signal_length - signal_length))
-    pad_signal = np.append(signal, z)
-    
-    # Indices
-    indices = np.tile(np.arange(0, frame_length), (num_frames, 1)) + \
-              np.tile(np.arange(0, num_frames * frame_step, frame_step), (frame_length, 1)).T
-              
-    frames = pad_signal[indices.astype(np.int32, copy=False)]
-    return frames
+    # The kept frames end before the last sample, so padding is only needed
+    # when the signal is shorter than one frame
+    if signal_length < frame_length:
+        pad_signal_length = num_frames * frame_step + frame_length
+        signal = np.append(signal, np.zeros(pad_signal_length - signal_length, dtype=signal.dtype))
+
+    # Frame k = signal[k*step : k*step + frame_length], as a view
+    frames = sliding_window_view(signal, frame_length)[::frame_step]
+    return frames[:num_frames]
+
+@lru_cache(maxsize=32)
+def get_window(window_func, frame_length, dtype=np.float64):
+    """
+    Memoized window of a given length and dtype (read-only).
+    """
+    window = window_func(frame_length).astype(dtype)
+    window.flags.writeable = False
+    return window
 
+@instrument.timed("apply_window")
 def apply_window(frames, window_func=np.hamming):
     """
     Apply a window function (default Hamming) to each frame.
     w[n] = 0.54 - 0.46 * cos(2*pi*n / (N-1))
     """
     frame_length = frames.shape[1]
-    # np.hamming returns the window
-    window = window_func(frame_length)
+    # np.hamming returns the window (cached per length)
+    window = get_window(window_func, frame_length, frames.dtype)
     return frames * window
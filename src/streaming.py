@@ -0,0 +1,122 @@
+import numpy as np
+from src import precision
+from src.signal_utils import apply_window
+from src.feature_extraction import compute_mfcc
+
+class StreamingMFCC:
+    """
+    Incremental MFCC front-end: feed PCM chunks of any size, get MFCC frames
+    as soon as they are complete.
+
+    Produces exactly the frames of the batch path
+        pre_emphasis -> frame_signal -> apply_window -> compute_mfcc
+    on the concatenated signal. frame_signal keeps frame k only if at least
+    one sample follows it (k*step + frame_length < len(signal)), so a frame is
+    emitted once that next sample has arrived. Signals shorter than one frame
+    are zero-padded by the batch path; finish() reproduces that.
+
+    State carried between calls: the last raw sample (pre-emphasis) and the
+    emphasized samples not yet consumed by a frame (overlap). Samples are
+    kept in the compute precision (src.precision) chosen at reset().
+    """
+    def __init__(self, sample_rate, frame_size=0.025, frame_stride=0.010, alpha=0.97,
+                 num_ceps=12, nfilt=26, NFFT=512, window_func=np.hamming):
+        self.sample_rate = sample_rate
+        self.frame_length = int(round(frame_size * sample_rate))
+        self.frame_step = int(round(frame_stride * sample_rate))
+        self.alpha = alpha
+        self.num_ceps = num_ceps
+        self.nfilt = nfilt
+        self.NFFT = NFFT
+        self.window_func = window_func
+        self.reset()
+
+    def reset(self):
+        """
+        Start a new utterance.
+        """
+        self._dtype = precision.dtype
+        self._last_sample = None     # Previous raw sample, for pre-emphasis
+        self._buffer = np.zeros(0, dtype=self._dtype)  # Emphasized samples from _buffer_start on
+        self._buffer_start = 0       # Absolute index of _buffer[0]
+        self._n_samples = 0          # Samples received so far
+        self._n_frames = 0           # Frames emitted so far
+
+    @property
+    def n_frames(self):
+        return self._n_frames
+
+    def _emphasize(self, chunk):
+        out = np.empty_like(chunk)
+        if self._last_sample is None:
+            out[0] = chunk[0]
+        else:
+            out[0] = chunk[0] - self.alpha * self._last_sample
+        out[1:] = chunk[1:] - self.alpha * chunk[:-1]
+        self._last_sample = chunk[-1]
+        return out
+
+    def features(self, frames):
+        """
+        MFCC of frames returned by push_frames.
+        """
+        if len(frames) == 0:
+            return np.zeros((0, self.num_ceps), dtype=self._dtype)
+        frames = apply_window(frames, self.window_func)
+        return compute_mfcc(frames, self.sample_rate, num_ceps=self.num_ceps,
+                            nfilt=self.nfilt, NFFT=self.NFFT)
+
+    def push(self, chunk):
+        """
+        Add PCM samples (any length, int or float, mono or (n, 1)).
+        Returns the MFCC frames completed by this chunk, (n_new, num_ceps).
+        """
+        return self.features(self.push_frames(chunk))
+
+    def push_frames(self, chunk):
+        """
+        Like push, but returns the completed frames before windowing
+        (pre-emphasized, as frame_signal gives them), (n_new, frame_length).
+        """
+        chunk = np.asarray(chunk, dtype=self._dtype).reshape(-1)
+        if len(chunk) == 0:
+            return np.zeros((0, self.frame_length), dtype=self._dtype)
+
+        self._buffer = np.concatenate([self._buffer, self._emphasize(chunk)])
+        self._n_samples += len(chunk)
+
+        # Frame k is final once sample k*step + frame_length has arrived
+        n_ready = 0
+        if self._n_samples > self.frame_length:
+            n_ready = (self._n_samples - self.frame_length - 1) // self.frame_step + 1
+        n_new = n_ready - self._n_frames
+        if n_new <= 0:
+            return np.zeros((0, self.frame_length), dtype=self._dtype)
+
+        first = self._n_frames * self.frame_step - self._buffer_start
+        starts = first + self.frame_step * np.arange(n_new)
+        frames = self._buffer[starts[:, None] + np.arange(self.frame_length)]
+        self._n_frames = n_ready
+
+        # Drop samples no later frame needs
+        consumed = self._n_frames * self.frame_step - self._buffer_start
+        self._buffer = self._buffer[consumed:]
+        self._buffer_start += consumed
+
+        return frames
+
+    def finish(self):
+        """
+        End of utterance. Only signals shorter than one frame produce output
+        here (zero-padded, as frame_signal does). Resets the state.
+        """
+        out = np.zeros((0, self.num_ceps), dtype=self._dtype)
+        L = self._n_samples
+        if 0 < L < self.frame_length:
+            num_frames = int(np.ceil(float(self.frame_length - L) / self.frame_step))
+            pad_length = num_frames * self.frame_step + self.frame_length
+            pad_signal = np.append(self._buffer, np.zeros(pad_length - len(self._buffer), dtype=self._dtype))
+            starts = self.frame_step * np.arange(num_frames)
+            out = self.features(pad_signal[starts[:, None] + np.arange(self.frame_length)])
+        self.reset()
+        return out
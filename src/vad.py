@@ -0,0 +1,191 @@
+"""
+Energy / zero-crossing voice activity detection.
+
+trim_silence() works on the output of frame_signal (before windowing and
+compute_mfcc) and cuts leading/trailing non-speech frames of a whole
+utterance. EndpointDetector does the same decision on live audio, chunk by
+chunk, to stop a recording once the speaker has finished.
+"""
+import numpy as np
+from src import instrument
+
+EPS = 1e-10
+
+
+def frame_energy_db(frames):
+    """
+    Log energy of each frame in dB: 10*log10(mean(x^2)).
+    """
+    return 10 * np.log10(np.mean(np.square(frames), axis=1) + EPS)
+
+
+def zero_crossing_rate(frames):
+    """
+    Fraction of adjacent sample pairs with a sign change, per frame.
+    """
+    signs = np.signbit(frames)
+    return np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+
+def speech_mask(frames, energy_ratio=0.25, zcr_threshold=0.25, zcr_energy_ratio=0.1):
+    """
+    Boolean speech/non-speech decision per frame.
+    The thresholds adapt to the utterance: with noise = 10th percentile and
+    peak = max of the frame energies (dB), a frame is speech if
+    - its energy is above noise + energy_ratio * (peak - noise), or
+    - it is a quiet but noisy-spectrum frame (unvoiced fricative): energy above
+      noise + zcr_energy_ratio * (peak - noise) and ZCR above zcr_threshold.
+    """
+    return stats_speech_mask(frame_energy_db(frames), zero_crossing_rate(frames),
+                             energy_ratio, zcr_threshold, zcr_energy_ratio)
+
+
+def stats_speech_mask(energy, zcr, energy_ratio=0.25, zcr_threshold=0.25, zcr_energy_ratio=0.1):
+    """
+    speech_mask from precomputed frame_energy_db / zero_crossing_rate values.
+    """
+    noise = np.percentile(energy, 10)
+    dynamic = energy.max() - noise
+
+    voiced = energy > noise + energy_ratio * dynamic
+    unvoiced = (energy > noise + zcr_energy_ratio * dynamic) & (zcr > zcr_threshold)
+    return voiced | unvoiced
+
+
+def speech_bounds(frames, margin_frames=5, **kwargs):
+    """
+    (start, end) frame indices of the speech region: first to last speech
+    frame, widened by margin_frames on each side. Pauses inside the word are
+    kept. Returns the full range when no speech is found.
+    """
+    if len(frames) == 0:
+        return 0, 0
+    return mask_bounds(speech_mask(frames, **kwargs), margin_frames)
+
+
+def mask_bounds(mask, margin_frames=5):
+    """
+    speech_bounds for a precomputed speech mask.
+    """
+    n = len(mask)
+    idx = np.flatnonzero(mask)
+    if len(idx) == 0:
+        return 0, n
+    return max(0, idx[0] - margin_frames), min(n, idx[-1] + 1 + margin_frames)
+
+
+@instrument.timed("trim_silence")
+def trim_silence(frames, margin_frames=5, **kwargs):
+    """
+    Drop leading and trailing non-speech frames (a view, no copy).
+    Goes between frame_signal and apply_window/compute_mfcc.
+    """
+    start, end = speech_bounds(frames, margin_frames, **kwargs)
+    return frames[start:end]
+
+
+class EndpointDetector:
+    """
+    Streaming end-of-utterance detector for live capture.
+
+    Audio is cut into non-overlapping frames of frame_ms. The first
+    calibration_ms estimate the background level; a frame is speech when its
+    energy is threshold_db above it (or above min_energy_db). After at least
+    min_speech_ms of speech, silence_ms of continuous non-speech ends the
+    utterance; during speech, frames more than end_drop_db below the loudest
+    frame so far also count as non-speech, so a background that got louder
+    than the calibration does not hold the utterance open.
+
+    push(chunk) returns True once the end has been detected. For continuous
+    listening call rearm() to look for the next utterance: the noise estimate
+    and the frame count carry over (speech_start/speech_end are absolute
+    frame indices), and with noise_adapt > 0 the noise level keeps tracking
+    the background between utterances.
+    """
+    def __init__(self, sample_rate, frame_ms=10, calibration_ms=100, threshold_db=12.0,
+                 min_energy_db=30.0, min_speech_ms=100, silence_ms=300, end_drop_db=20.0, noise_adapt=0.0):
+        self.frame_length = max(1, int(round(sample_rate * frame_ms / 1000)))
+        self.calibration_frames = max(1, calibration_ms // frame_ms)
+        self.threshold_db = threshold_db
+        self.min_energy_db = min_energy_db
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.silence_frames = max(1, silence_ms // frame_ms)
+        self.end_drop_db = end_drop_db
+        self.noise_adapt = noise_adapt
+        self.reset()
+
+    def reset(self):
+        self._pending = np.zeros(0)
+        self._calibration = []
+        self.noise_db = None
+        self.n_frames = 0
+        self.rearm()
+
+    def rearm(self):
+        """
+        Wait for the next utterance (keeps noise level, frame count and any
+        audio pushed after the last end).
+        """
+        self.speech_frames = 0
+        self.silence_run = 0
+        self.speech_start = None   # Frame index where speech was confirmed
+        self.speech_end = None     # Frame index of the end of speech
+        self.peak_db = -np.inf
+        self.ended = False
+
+    def end_now(self):
+        """
+        Force the end of the current utterance (e.g. it got too long).
+        """
+        self.speech_end = self.n_frames
+        self.ended = True
+
+    @property
+    def in_speech(self):
+        return self.speech_start is not None and not self.ended
+
+    def push(self, chunk):
+        """
+        Feed samples (same amplitude scale as read_wav, i.e. int16 range).
+        """
+        if self.ended:
+            return True
+        self._pending = np.concatenate([self._pending, np.asarray(chunk, dtype=float).reshape(-1)])
+        n_full = len(self._pending) // self.frame_length
+        if n_full == 0:
+            return False
+
+        frames = self._pending[:n_full * self.frame_length].reshape(n_full, self.frame_length)
+        self._pending = self._pending[n_full * self.frame_length:]
+
+        energies = frame_energy_db(frames)
+        for i, energy in enumerate(energies):
+            self.n_frames += 1
+            if self.noise_db is None:
+                self._calibration.append(energy)
+                if len(self._calibration) >= self.calibration_frames:
+                    self.noise_db = float(np.median(self._calibration))
+                continue
+
+            is_speech = energy > max(self.noise_db + self.threshold_db, self.min_energy_db)
+            self.peak_db = max(self.peak_db, energy) if is_speech else self.peak_db
+            if self.speech_start is None:
+                if not is_speech and self.noise_adapt > 0:
+                    self.noise_db += self.noise_adapt * (energy - self.noise_db)
+                # Need min_speech_frames in a row to start
+                self.speech_frames = self.speech_frames + 1 if is_speech else 0
+                if not is_speech:
+                    self.peak_db = -np.inf
+                if self.speech_frames >= self.min_speech_frames:
+                    self.speech_start = self.n_frames - self.speech_frames
+            else:
+                is_speech = is_speech and energy > self.peak_db - self.end_drop_db
+                self.silence_run = 0 if is_speech else self.silence_run + 1
+                if self.silence_run >= self.silence_frames:
+                    self.speech_end = self.n_frames - self.silence_run
+                    self.ended = True
+                    # Keep the frames after the end for the next utterance
+                    rest = frames[i + 1:].reshape(-1)
+                    self._pending = np.concatenate([rest, self._pending])
+                    return True
+        return False
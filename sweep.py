@@ -0,0 +1,291 @@
+"""
+Hyper-parameter sweep with k-fold cross-validation over the whole corpus.
+
+    python sweep.py --states 5 8 --mix 1 4                  # 4 configs, 5 folds
+    python sweep.py --split speaker --ceps 12 13 --nfilt 26 40 --json sweep.json
+
+Every combination of the front-end options (--ceps, --nfilt, --frame-size,
+--frame-stride) and the model options (--states, --mix, --topology,
+--max-iter) is one config. Folds are deterministic (src.crossval: sorted
+files, seeded, per file or per speaker).
+
+Features are computed once per front-end config, into its FeatureStore
+(.feature_cache, so a later sweep reuses them); the pool workers memory-map
+that store's features.bin read-only, so every process shares one copy of
+the frames through the page cache. The work is one job per (config, fold,
+digit) training; as soon as the 10 digits of a (config, fold) are done, the
+held-out fold is scored (ModelBank.score_batch) in the pool too. Results are
+ranked by mean accuracy over the folds.
+"""
+import io
+import os
+import json
+import time
+import argparse
+import itertools
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+import numpy as np
+from src import hmm_kernels, precision
+from src.crossval import list_corpus, make_folds, SPLITS
+from src.feature_cache import FeatureStore, DEFAULT_PARAMS
+from src.hmm_core import TOPOLOGIES
+from src.model_bank import ModelBank
+from train_scratch import fit_digit, DATA_DIR, DIGITS, TOL
+
+FEATURE_BATCH = 200 # Files per batched front-end call while filling a store
+
+# ----------------------------------------------------------------------------
+# Configs and features
+# ----------------------------------------------------------------------------
+
+def frontend_params(num_ceps, nfilt, frame_size, frame_stride):
+    params = json.loads(json.dumps(DEFAULT_PARAMS)) # Deep copy
+    params["compute_mfcc"].update(num_ceps=num_ceps, nfilt=nfilt)
+    params["frame_signal"].update(frame_size=frame_size, frame_stride=frame_stride)
+    return params
+
+def build_configs(args):
+    """
+    Cartesian product of the sweep options.
+    Returns (frontends {fe_id: params}, configs [{"frontend": fe_id, "model": {...}}]).
+    """
+    frontends, configs = {}, []
+    for ceps, nfilt, size, stride in itertools.product(args.ceps, args.nfilt, args.frame_size, args.frame_stride):
+        fe_id = f"ceps={ceps},nfilt={nfilt},frame={size * 1e3:g}/{stride * 1e3:g}ms"
+        frontends[fe_id] = frontend_params(ceps, nfilt, size, stride)
+        for states, mix, topology, max_iter in itertools.product(args.states, args.mix, args.topology, args.max_iter):
+            configs.append({"frontend": fe_id,
+                            "model": {"n_states": states, "n_mix": mix, "topology": topology,
+                                      "max_iter": max_iter, "tol": args.tol or None}})
+    return frontends, configs
+
+def config_name(config):
+    m = config["model"]
+    return (f"{config['frontend']} states={m['n_states']} mix={m['n_mix']} "
+            f"{m['topology']} iter<={m['max_iter']}")
+
+def prepare_features(frontends, paths):
+    """
+    Fill (or reuse) the FeatureStore of every front-end config for all files.
+    Returns {fe_id: store info} for the workers: the data file, its shape and
+    dtype, and spans (n_files, 2) = [row offset, n_frames], n_frames -1 for
+    empty audio.
+    """
+    stores = {}
+    for fe_id, params in frontends.items():
+        t0 = time.perf_counter()
+        with FeatureStore(params=params) as store:
+            for start in range(0, len(paths), FEATURE_BATCH):
+                store.get_many(paths[start:start + FEATURE_BATCH])
+            store.flush()
+            spans = np.array([store.index[os.path.abspath(p)][2:4] for p in paths], dtype=np.int64)
+            stores[fe_id] = {"path": store.data_path, "n_rows": store.n_rows,
+                             "n_features": store.n_features, "dtype": store.dtype.name, "spans": spans}
+            print(f"Features {fe_id}: {store.misses} computed, {store.hits} cached "
+                  f"({time.perf_counter() - t0:.1f} s)")
+    return stores
+
+# ----------------------------------------------------------------------------
+# Pool jobs
+# ----------------------------------------------------------------------------
+
+_stores = None
+_features = {}
+
+def _init_worker(stores, backend=None, precision_name=None):
+    """
+    Pool initializer: remember where the feature stores are (mapped lazily).
+    """
+    global _stores
+    _stores = stores
+    _features.clear()
+    if backend is not None:
+        hmm_kernels.set_backend(backend)
+    if precision_name is not None:
+        precision.set_precision(precision_name)
+
+def _utterances(fe_id, indices):
+    """
+    Read-only views of the MFCCs of files `indices` (empty audio skipped).
+    """
+    info = _stores[fe_id]
+    if fe_id not in _features:
+        _features[fe_id] = np.memmap(info["path"], dtype=info["dtype"], mode="r",
+                                     shape=(info["n_rows"], info["n_features"]))
+    data = _features[fe_id]
+    out = []
+    for i in indices:
+        offset, n_frames = info["spans"][i]
+        if n_frames > 0:
+            out.append(data[offset:offset + n_frames])
+    return out
+
+def _train_job(fe_id, model, digit, indices, seed):
+    """
+    Train one digit model on the files `indices`. Returns (hmm, seconds, EM iterations).
+    """
+    X = _utterances(fe_id, indices)
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()): # Per-iteration logging
+        hmm = fit_digit(digit, X, seed, 1, model["n_states"], model["topology"], model["n_mix"],
+                        model["max_iter"], model["tol"])
+    return hmm, time.perf_counter() - t0, len(hmm.history.records)
+
+def _eval_job(fe_id, models, indices, labels):
+    """
+    Score the held-out files with the fold's models.
+    Returns (correct, total, seconds, confusion (10, 10)).
+    """
+    keep = [j for j, i in enumerate(indices) if _stores[fe_id]["spans"][i][1] > 0]
+    X = _utterances(fe_id, indices)
+    bank = ModelBank(models)
+    t0 = time.perf_counter()
+    predicted = [bank.labels[k] for k in np.argmax(bank.score_batch(X), axis=1)] if X else []
+    seconds = time.perf_counter() - t0
+    confusion = np.zeros((len(DIGITS), len(DIGITS)), dtype=np.int64)
+    for j, p in zip(keep, predicted):
+        confusion[labels[j], p] += 1
+    return int(np.trace(confusion)), len(predicted), seconds, confusion
+
+# ----------------------------------------------------------------------------
+# Sweep
+# ----------------------------------------------------------------------------
+
+def run_sweep(frontends, configs, n_folds=5, split="file", seed=0, workers=None, files_per_digit=None):
+    """
+    Cross-validate every config. Returns the sweep dict; its "results" are
+    ranked best first.
+    """
+    paths, labels, speakers = list_corpus(DATA_DIR, DIGITS)
+    if files_per_digit:
+        # Seeded subsample, same for every config
+        rng = np.random.RandomState(seed)
+        labels_arr = np.array(labels)
+        keep = np.sort(np.concatenate([rng.permutation(np.flatnonzero(labels_arr == d))[:files_per_digit]
+                                       for d in DIGITS]))
+        paths, labels, speakers = ([x[i] for i in keep] for x in (paths, labels, speakers))
+    folds, n_folds = make_folds(labels, speakers, n_folds, split, seed)
+    labels = np.array(labels)
+    print(f"{len(paths)} files, {len(set(speakers))} speakers, {n_folds} folds by {split}, "
+          f"{len(configs)} configs")
+
+    t_start = time.perf_counter()
+    stores = prepare_features(frontends, paths)
+    t_features = time.perf_counter() - t_start
+
+    results = [{"name": config_name(c), "config": c, "folds": [None] * n_folds,
+                "train_seconds": 0.0, "em_iterations": 0} for c in configs]
+    trained = {} # (config, fold) -> {digit: hmm}
+
+    workers = os.cpu_count() if workers is None else workers
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(stores, hmm_kernels.backend, precision.name)) if workers > 0 else None
+    _init_worker(stores)
+
+    def submit(fn, *args):
+        if executor is None:
+            fut = Future()
+            fut.set_result(fn(*args))
+            return fut
+        return executor.submit(fn, *args)
+
+    try:
+        # A digit recorded by one speaker only has no training data when that
+        # speaker is held out: its test files then count as errors
+        trainable = {fold: [d for d in DIGITS if np.any((folds != fold) & (labels == d))]
+                     for fold in range(n_folds)}
+        for fold, digits in trainable.items():
+            if len(digits) < len(DIGITS):
+                print(f"Fold {fold}: no training files for digit(s) "
+                      f"{sorted(set(DIGITS) - set(digits))}, not recognizable in this fold")
+
+        jobs = {}
+        for c, config in enumerate(configs):
+            for fold in range(n_folds):
+                for digit in trainable[fold]:
+                    train_idx = np.flatnonzero((folds != fold) & (labels == digit))
+                    fut = submit(_train_job, config["frontend"], config["model"], digit, train_idx, seed)
+                    jobs[fut] = ("train", c, fold, digit)
+
+        n_done = 0
+        n_total = len(jobs) + len(configs) * n_folds
+        print(f"{len(jobs)} training jobs on {workers or 1} process(es)")
+        while jobs:
+            done, _ = wait(jobs, return_when=FIRST_COMPLETED)
+            for fut in done:
+                kind, c, fold, digit = jobs.pop(fut)
+                n_done += 1
+                if kind == "train":
+                    hmm, seconds, iterations = fut.result()
+                    results[c]["train_seconds"] += seconds
+                    results[c]["em_iterations"] += iterations
+                    models = trained.setdefault((c, fold), {})
+                    models[digit] = hmm
+                    if len(models) == len(trainable[fold]):
+                        test_idx = np.flatnonzero(folds == fold)
+                        fut = submit(_eval_job, configs[c]["frontend"], trained.pop((c, fold)),
+                                     test_idx, labels[test_idx])
+                        jobs[fut] = ("eval", c, fold, None)
+                else:
+                    correct, total, seconds, confusion = fut.result()
+                    results[c]["folds"][fold] = {"correct": correct, "total": total,
+                                                 "accuracy": correct / max(total, 1),
+                                                 "score_seconds": seconds, "confusion": confusion.tolist()}
+                    print(f"[{n_done}/{n_total}] {results[c]['name']} fold {fold}: "
+                          f"{100.0 * correct / max(total, 1):.2f}% ({correct}/{total})")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    for r in results:
+        acc = np.array([f["accuracy"] for f in r["folds"]])
+        r["accuracy_mean"] = float(acc.mean())
+        r["accuracy_std"] = float(acc.std())
+        r["accuracy_min"] = float(acc.min())
+        total = sum(f["total"] for f in r["folds"])
+        r["score_ms_per_utterance"] = 1e3 * sum(f["score_seconds"] for f in r["folds"]) / max(total, 1)
+    results.sort(key=lambda r: (-r["accuracy_mean"], r["accuracy_std"], r["train_seconds"]))
+    wall = time.perf_counter() - t_start
+    return {"split": split, "folds": n_folds, "seed": seed, "files": len(paths), "workers": workers,
+            "backend": hmm_kernels.backend, "precision": precision.name,
+            "features_seconds": t_features, "wall_seconds": wall, "results": results}
+
+def print_table(sweep):
+    print("-" * 30)
+    print(f"{'rank':>4s}  {'accuracy':>15s}  {'worst fold':>10s}  {'train s':>8s}  {'EM it':>6s}  "
+          f"{'score ms':>8s}  config")
+    for rank, r in enumerate(sweep["results"], 1):
+        print(f"{rank:4d}  {100 * r['accuracy_mean']:7.2f} ± {100 * r['accuracy_std']:5.2f}%  "
+              f"{100 * r['accuracy_min']:9.2f}%  {r['train_seconds']:8.1f}  {r['em_iterations']:6d}  "
+              f"{r['score_ms_per_utterance']:8.3f}  {r['name']}")
+    print(f"{sweep['files']} files, {sweep['folds']} folds by {sweep['split']}, {sweep['workers']} workers, "
+          f"kernel {sweep['backend']}, {sweep['precision']}: features {sweep['features_seconds']:.1f} s, "
+          f"total {sweep['wall_seconds']:.1f} s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hyper-parameter sweep with k-fold cross-validation")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--split", choices=SPLITS, default="file", help="Folds of files (per digit) or of speakers")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="Pool size (default: all CPUs, 0 = inline)")
+    parser.add_argument("--files-per-digit", type=int, default=None, help="Seeded subsample, for quick sweeps")
+    parser.add_argument("--states", type=int, nargs="+", default=[8])
+    parser.add_argument("--mix", type=int, nargs="+", default=[4])
+    parser.add_argument("--topology", choices=list(TOPOLOGIES), nargs="+", default=["left-to-right"])
+    parser.add_argument("--max-iter", type=int, nargs="+", default=[10])
+    parser.add_argument("--tol", type=float, default=TOL, help="EM stopping tolerance (0: run max-iter)")
+    parser.add_argument("--ceps", type=int, nargs="+", default=[DEFAULT_PARAMS["compute_mfcc"]["num_ceps"]])
+    parser.add_argument("--nfilt", type=int, nargs="+", default=[DEFAULT_PARAMS["compute_mfcc"]["nfilt"]])
+    parser.add_argument("--frame-size", type=float, nargs="+", default=[DEFAULT_PARAMS["frame_signal"]["frame_size"]])
+    parser.add_argument("--frame-stride", type=float, nargs="+", default=[DEFAULT_PARAMS["frame_signal"]["frame_stride"]])
+    parser.add_argument("--json", default=None, help="Write all results (per fold, with confusion matrices) here")
+    args = parser.parse_args()
+
+    frontends, configs = build_configs(args)
+    sweep = run_sweep(frontends, configs, args.folds, args.split, args.seed, args.workers, args.files_per_digit)
+    print_table(sweep)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(sweep, f, indent=1)
+        print(f"Results written to {args.json}")
@@ -1,15 +1,30 @@
 import os
 import glob
+import json
+import time
+import argparse
 import pickle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-from src.signal_utils import read_wav, pre_emphasis, frame_signal, apply_window
-from src.feature_extraction import compute_mfcc
+from scipy.io import wavfile
+from src.signal_utils import read_wav
+from src.model_bank import ModelBank
+from src.feature_cache import FeatureStore, compute_signals_features
+from src.model_io import load_bundle
+from src import hmm_kernels, precision, instrument
 
 MODEL_DIR = "models"
+BUNDLE_PATH = os.path.join(MODEL_DIR, "hmm_digits.bin")
 DATA_DIR = "zero_to_nine_voice"
 DIGITS = list(range(10))
+USE_FEATURE_CACHE = True # Reuse MFCCs from .feature_cache/ between runs
+STAGES = ("read", "features", "score")
 
 def load_models():
+    if os.path.exists(BUNDLE_PATH):
+        return load_bundle(BUNDLE_PATH)
+    # Legacy per-digit pickles (see convert_models.py)
     models = {}
     for i in DIGITS:
         path = os.path.join(MODEL_DIR, f"hmm_{i}.pkl")
@@ -18,60 +33,310 @@ def load_models():
                 models[i] = pickle.load(f)
     return models
 
-def test_accuracy():
-    models = load_models()
-    if not models:
-        print("No models found! Run train_scratch.py first.")
-        return
-
-    total = 0
-    correct = 0
-    
-    print("Starting Accuracy Test (Using 20 samples per digit not used in training ideally)...")
-    # In pro setup we split train/test. Here we iterate all or subset.
-    # We used indices [:30] for training. Let's use [30:50] for testing.
-    
-    confusion_matrix = np.zeros((10, 10), dtype=int)
-    
+def iter_test_files():
+    """
+    Held-out split: per digit, files [30:50] (training uses [:30]).
+    Yields (real_digit, path).
+    """
     for real_digit in DIGITS:
         digit_dir = os.path.join(DATA_DIR, str(real_digit))
         files = glob.glob(os.path.join(digit_dir, "*.wav"))
-        
-        test_files = files[30:50] # Use next 20 files
-        
-        for f in test_files:
-            total += 1
-            try:
-                sr, signal = read_wav(f)
-                if len(signal) == 0: continue
-                
-                signal = pre_emphasis(signal)
-                frames = frame_signal(signal, sr)
-                frames = apply_window(frames)
-                mfcc = compute_mfcc(frames, sr)
-                
-                best_score = -float('inf')
-                predicted = -1
-                
-                for digit, model in models.items():
-                    score = model.score(mfcc)
-                    if score > best_score:
-                        best_score = score
-                        predicted = digit
-                
-                if predicted == real_digit:
-                    correct += 1
-                
-                confusion_matrix[real_digit, predicted] += 1
-                
-            except Exception as e:
-                print(f"Error on {f}: {e}")
-
-    accuracy = (correct / total) * 100 if total > 0 else 0
+
+        for f in files[30:50]: # Use next 20 files
+            yield real_digit, f
+
+# ----------------------------------------------------------------------------
+# Pipeline stages: read -> features -> score
+# ----------------------------------------------------------------------------
+
+_bank = None
+_decoder = "forward"
+_beam = None
+
+def _init_scorer(decoder, beam, backend=None, precision_name=None):
+    """
+    Load the models once per process (pool initializer, or inline).
+    """
+    global _bank, _decoder, _beam
+    if backend is not None:
+        hmm_kernels.set_backend(backend)
+    if precision_name is not None:
+        precision.set_precision(precision_name)
+    _bank = ModelBank(load_models())
+    _decoder = decoder
+    _beam = beam
+    # Warm-up so kernel compilation is not counted as utterance latency
+    dummy = np.zeros((2, _bank.n_features))
+    _bank.score_all(dummy)
+    _bank.viterbi_all(dummy, beam)
+
+BATCH_SIZE = 20 # Files per front-end batch (one pool task)
+
+def lookup_stage(items, store=None, batch_size=BATCH_SIZE):
+    """
+    Parent side: group the files in batches and attach their cached MFCC
+    (cache hits). Misses are featurized by featurize_batch, in a worker
+    when there is a pool; the parent stays the only cache writer.
+    Yields lists of records.
+    """
+    items = iter(items)
+    while True:
+        batch = [item for _, item in zip(range(batch_size), items)]
+        if not batch:
+            return
+        records = []
+        for real_digit, path in batch:
+            record = {"file": path, "real": real_digit, "cached": False, "mfcc": None, "features": 0.0}
+            if store is not None:
+                t0 = time.perf_counter()
+                record["cached"], record["mfcc"] = store.lookup(path)
+                record["features"] = time.perf_counter() - t0
+            records.append(record)
+        yield records
+
+def featurize_batch(records):
+    """
+    Read every file of the batch and run the batched front-end once per
+    sample rate over the ones without cached features. The feature time is
+    split across those utterances in proportion to their frame counts.
+    """
+    signals = {}
+    for i, record in enumerate(records):
+        t0 = time.perf_counter()
+        if record["cached"]:
+            sr, signal = wavfile.read(record["file"], mmap=True) # Header only, for the duration
+        else:
+            sr, signal = read_wav(record["file"])
+            signals[i] = signal
+        record.update(sr=sr, duration=len(signal) / sr, read=time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    for sr in set(records[i]["sr"] for i in signals):
+        idx = [i for i in signals if records[i]["sr"] == sr]
+        for i, mfcc in zip(idx, compute_signals_features([signals[i] for i in idx], sr)):
+            records[i]["mfcc"] = mfcc
+    elapsed = time.perf_counter() - t0
+
+    n_frames = sum(len(records[i]["mfcc"]) for i in signals if records[i]["mfcc"] is not None)
+    for record in records:
+        mfcc = record["mfcc"]
+        if not record["cached"] and mfcc is not None and n_frames:
+            record["features"] += elapsed * len(mfcc) / n_frames
+        record["feature_bytes"] = mfcc.nbytes if mfcc is not None else 0
+
+def process_record(record):
+    """
+    Score one featurized utterance.
+    """
+    try:
+        mfcc = record["mfcc"]
+        if mfcc is None:
+            record["predicted"] = None # Empty audio
+            return record
+
+        t0 = time.perf_counter()
+        # All models in one batched pass
+        with instrument.request("score"):
+            if _decoder == "viterbi":
+                scores, frames_used = _bank.viterbi_all(mfcc, _beam)
+                record["frames_evaluated"] = int(frames_used.sum())
+                record["frames_full"] = _bank.n_models * len(mfcc)
+            else:
+                scores = _bank.score_all(mfcc)
+        record["predicted"] = _bank.labels[int(np.argmax(scores))]
+        record["score"] = time.perf_counter() - t0
+    except Exception as e:
+        record["error"] = str(e)
+    return record
+
+def process_batch(records, return_features=False):
+    """
+    Worker side (or inline): read -> features -> score for one batch.
+    return_features: send the computed MFCCs back for the parent's cache;
+    cached ones are dropped.
+    """
+    try:
+        featurize_batch(records)
+    except Exception as e:
+        for record in records:
+            record["error"] = str(e)
+        return records
+    for record in records:
+        process_record(record)
+        if record["cached"] or not return_features:
+            record["mfcc"] = None
+    return records
+
+def store_results(batches, store=None):
+    """
+    Parent side: write the features computed by the workers to the cache,
+    then yield the records without their MFCC.
+    """
+    for records in batches:
+        for record in records:
+            mfcc, cached = record.pop("mfcc"), record.pop("cached")
+            if store is not None and not cached and "error" not in record:
+                store.put(record["file"], mfcc)
+            yield record
+
+def stream_batches(batches, executor, window, return_features):
+    """
+    Push batches through the pool keeping at most `window` in flight,
+    yielding results in input order.
+    """
+    pending = deque()
+    for records in batches:
+        pending.append(executor.submit(process_batch, records, return_features))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+# ----------------------------------------------------------------------------
+# Report
+# ----------------------------------------------------------------------------
+
+def summarize(results, wall_time, config):
+    total = len(results)
+    correct = 0
+    confusion_matrix = np.zeros((10, 10), dtype=int)
+    errors = []
+    frames_evaluated = 0
+    frames_full = 0
+
+    for r in results:
+        if "error" in r:
+            errors.append({"file": r["file"], "error": r["error"]})
+            continue
+        if r["predicted"] is None:
+            continue
+        if r["predicted"] == r["real"]:
+            correct += 1
+        confusion_matrix[r["real"], r["predicted"]] += 1
+        frames_evaluated += r.get("frames_evaluated", 0)
+        frames_full += r.get("frames_full", 0)
+
+    timed = [r for r in results if "error" not in r and r["predicted"] is not None]
+    stage_totals = {s: float(sum(r[s] for r in timed)) for s in STAGES}
+    latencies = np.array([sum(r[s] for s in STAGES) for r in timed]) * 1e3
+    audio_seconds = float(sum(r["duration"] for r in timed))
+
+    report = {
+        "config": config,
+        "total": total,
+        "correct": correct,
+        "accuracy": (correct / total) * 100 if total > 0 else 0,
+        "confusion_matrix": confusion_matrix.tolist(),
+        "errors": errors,
+        "wall_time_s": wall_time,
+        "audio_s": audio_seconds,
+        "throughput_utt_per_s": len(timed) / wall_time if wall_time > 0 else 0,
+        # Compute time per second of audio (single utterance) and wall time per second of audio (whole run)
+        "rtf": sum(stage_totals.values()) / audio_seconds if audio_seconds > 0 else 0,
+        "rtf_wall": wall_time / audio_seconds if audio_seconds > 0 else 0,
+        "features_mb": sum(r.get("feature_bytes", 0) for r in results) / 1e6,
+        "stages_ms": {s: {"total": stage_totals[s] * 1e3,
+                          "mean": stage_totals[s] * 1e3 / len(timed) if timed else 0}
+                      for s in STAGES},
+        "latency_ms": {},
+    }
+    if len(latencies):
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        report["latency_ms"] = {"p50": p50, "p95": p95, "p99": p99,
+                                "mean": float(latencies.mean()), "max": float(latencies.max())}
+    if frames_full > 0:
+        report["viterbi"] = {"frames_evaluated": frames_evaluated, "frames_full": frames_full,
+                             "pruned_pct": 100.0 * (1 - frames_evaluated / frames_full)}
+    return report
+
+def print_report(report):
     print("-" * 30)
-    print(f"Overall Accuracy: {accuracy:.2f}% ({correct}/{total})")
+    print(f"Overall Accuracy: {report['accuracy']:.2f}% ({report['correct']}/{report['total']})")
+    for e in report["errors"]:
+        print(f"Error on {e['file']}: {e['error']}")
+    if "viterbi" in report:
+        v = report["viterbi"]
+        print(f"Viterbi beam={report['config']['beam']}: {v['frames_evaluated']}/{v['frames_full']} "
+              f"model-frames evaluated ({v['pruned_pct']:.1f}% pruned)")
     print("Confusion Matrix (Row=Real, Col=Pred):")
-    print(confusion_matrix)
+    print(np.array(report["confusion_matrix"]))
+
+    print("-" * 30)
+    print(f"Workers: {report['config']['workers']}  Feature cache: {report['config']['cache']}  "
+          f"Kernel: {report['config']['backend']}  Precision: {report['config']['precision']}")
+    for s in STAGES:
+        st = report["stages_ms"][s]
+        print(f"  {s:9s} mean {st['mean']:8.3f} ms   total {st['total']:9.1f} ms")
+    lat = report["latency_ms"]
+    if lat:
+        print(f"Latency per utterance: p50 {lat['p50']:.2f} ms  p95 {lat['p95']:.2f} ms  "
+              f"p99 {lat['p99']:.2f} ms  max {lat['max']:.2f} ms")
+    print(f"Throughput: {report['throughput_utt_per_s']:.1f} utt/s  "
+          f"({report['audio_s']:.1f} s audio in {report['wall_time_s']:.2f} s)")
+    print(f"Real-time factor: {report['rtf']:.4f} (compute)  {report['rtf_wall']:.4f} (wall)")
+    print(f"MFCC features: {report['features_mb']:.2f} MB")
+
+def test_accuracy(decoder="forward", beam=None, workers=0, use_cache=USE_FEATURE_CACHE, json_path=None,
+                  precision_name=None):
+    """
+    decoder: "forward" (full likelihood) or "viterbi" (best path).
+    beam: Viterbi only, drop a model once it falls this far below the best.
+    workers: size of the process pool that reads, featurizes and scores (0 = inline).
+    precision_name: "float32" / "float64" compute precision (None: keep the current one).
+    Returns the report dict (also written to json_path if given).
+    """
+    if not load_models():
+        print("No models found! Run train_scratch.py first.")
+        return None
+
+    if precision_name is not None:
+        precision.set_precision(precision_name)
+    print("Starting Accuracy Test (Using 20 samples per digit not used in training ideally)...")
+
+    store = FeatureStore() if use_cache else None
+    config = {"decoder": decoder, "beam": beam, "workers": workers,
+              "cache": use_cache, "backend": hmm_kernels.backend, "precision": precision.name}
+
+    if workers > 0:
+        # Wall time includes pool start-up and per-worker model loading.
+        # Workers read, featurize and score whole batches; cache hits are
+        # looked up here and new features come back for the cache.
+        start = time.perf_counter()
+        batches = lookup_stage(iter_test_files(), store, batch_size=min(BATCH_SIZE, 5 * workers))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_scorer,
+                                 initargs=(decoder, beam, hmm_kernels.backend, precision.name)) as executor:
+            results = list(store_results(stream_batches(batches, executor, 2 * workers, store is not None),
+                                         store))
+    else:
+        _init_scorer(decoder, beam)
+        start = time.perf_counter()
+        batches = lookup_stage(iter_test_files(), store)
+        results = list(store_results((process_batch(b, store is not None) for b in batches), store))
+    wall_time = time.perf_counter() - start
+
+    if store is not None:
+        store.close()
+
+    report = summarize(results, wall_time, config)
+    print_report(report)
+    if instrument.enabled:
+        # Stages of this process only (not of the scoring workers)
+        report["instrument"] = instrument.report()
+        print(instrument.summary())
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {json_path}")
+    return report
 
 if __name__ == "__main__":
-    test_accuracy()
+    parser = argparse.ArgumentParser(description="Evaluate digit HMMs on the held-out split")
+    parser.add_argument("--decoder", choices=["forward", "viterbi"], default="forward")
+    parser.add_argument("--beam", type=float, default=None, help="Viterbi beam width (log-likelihood units)")
+    parser.add_argument("--workers", type=int, default=0, help="Read/feature/scoring processes (0 = inline)")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute features (measures the real front-end)")
+    parser.add_argument("--json", default=None, help="Write the machine-readable report here")
+    parser.add_argument("--precision", choices=list(precision.PRECISIONS), default=None,
+                        help="Compute precision (default: HMM_PRECISION or float64)")
+    args = parser.parse_args()
+    test_accuracy(args.decoder, args.beam, args.workers, not args.no_cache, args.json, args.precision)
@@ -0,0 +1,124 @@
+"""
+Connected-digit evaluation on synthetic digit strings: held-out dataset WAVs
+of one speaker are concatenated (each keeps its own leading/trailing pause)
+and decoded in one pass with ConnectedDigitDecoder.
+"""
+import os
+import glob
+import time
+import argparse
+import numpy as np
+from scipy.io import wavfile
+from src.signal_utils import read_wav
+from src.feature_cache import compute_signals_features, DEFAULT_PARAMS
+from src.connected import ConnectedDigitDecoder
+from src.model_io import load_bundle
+from src import hmm_kernels
+from test_accuracy import load_models, DATA_DIR, DIGITS
+
+SILENCE_PATH = os.path.join("models", "hmm_silence.bin")
+
+def build_strings(n_strings, min_len=3, max_len=7, seed=0):
+    """
+    Random digit strings from the held-out split (per digit files [30:50]),
+    one speaker per string. Yields (digits, signal, sample_rate, [(start_s, end_s), ...]).
+    """
+    rng = np.random.RandomState(seed)
+    by_speaker = {}
+    for digit in DIGITS:
+        files = glob.glob(os.path.join(DATA_DIR, str(digit), "*.wav"))
+        for f in files[30:50]:
+            speaker = os.path.basename(f).split("_")[0]
+            by_speaker.setdefault(speaker, {}).setdefault(digit, []).append(f)
+    speakers = sorted(by_speaker)
+
+    for _ in range(n_strings):
+        pool = by_speaker[speakers[rng.randint(len(speakers))]]
+        available = sorted(pool)
+        length = rng.randint(min_len, max_len + 1)
+        digits, parts, spans = [], [], []
+        sr = None
+        pos = 0
+        for d in rng.choice(available, length):
+            file_sr, signal = read_wav(pool[d][rng.randint(len(pool[d]))])
+            if len(signal) == 0 or (sr is not None and file_sr != sr):
+                continue
+            sr = file_sr
+            digits.append(int(d))
+            parts.append(signal)
+            spans.append((pos / sr, (pos + len(signal)) / sr))
+            pos += len(signal)
+        yield digits, np.concatenate(parts), sr, spans
+
+def edit_distance(ref, hyp):
+    d = np.arange(len(hyp) + 1)
+    for i in range(1, len(ref) + 1):
+        prev, d[0] = d.copy(), i
+        for j in range(1, len(hyp) + 1):
+            d[j] = min(prev[j] + 1, d[j-1] + 1, prev[j-1] + (ref[i-1] != hyp[j-1]))
+    return int(d[-1])
+
+def test_connected(n_strings=100, use_silence=True, word_penalty=-100.0, silence_penalty=0.0,
+                   seed=0, out_dir=None, verbose=False):
+    models = load_models()
+    silence = None
+    if use_silence and os.path.exists(SILENCE_PATH):
+        silence = load_bundle(SILENCE_PATH)["sil"]
+    decoder = ConnectedDigitDecoder(models, silence, word_penalty, silence_penalty,
+                                    frame_stride=DEFAULT_PARAMS["frame_signal"]["frame_stride"])
+    decoder.decode(np.zeros((2, decoder.bank.n_features))) # Compile/warm up
+
+    # Untrimmed features, so frame 0 is the start of the file (pauses go to
+    # the silence model, or to the digits without one)
+    params = dict(DEFAULT_PARAMS, vad=None)
+
+    n_ref = n_err = n_exact = 0
+    n_placed = n_aligned = 0
+    audio_s = decode_s = 0.0
+    for i, (digits, signal, sr, spans) in enumerate(build_strings(n_strings, seed=seed)):
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+            name = "".join(map(str, digits))
+            wavfile.write(os.path.join(out_dir, f"{i:03d}_{name}.wav"), sr, signal.astype(np.int16))
+
+        mfcc = compute_signals_features([signal], sr, params)[0]
+        t0 = time.perf_counter()
+        result = decoder.decode(mfcc)
+        decode_s += time.perf_counter() - t0
+        audio_s += len(signal) / sr
+
+        hyp = [label for label, _, _ in result]
+        n_ref += len(digits)
+        n_err += edit_distance(digits, hyp)
+        n_exact += hyp == digits
+        if len(hyp) == len(digits):
+            # Timing check: each digit's centre should fall inside its source file
+            for (_, s, e), (fs, fe) in zip(result, spans):
+                n_placed += 1
+                n_aligned += fs <= (s + e) / 2 <= fe
+        if verbose:
+            print(f"{''.join(map(str, digits)):>8s} -> {''.join(map(str, hyp)):8s} "
+                  + " ".join(f"{l}[{s:.2f}-{e:.2f}]" for l, s, e in result))
+
+    print("-" * 30)
+    print(f"Strings: {n_strings}  Exact: {n_exact} ({100.0 * n_exact / n_strings:.1f}%)  "
+          f"Digit error rate: {100.0 * n_err / n_ref:.1f}% ({n_err}/{n_ref})")
+    if n_placed:
+        print(f"Timing: {100.0 * n_aligned / n_placed:.1f}% of digits centred inside their source file")
+    print(f"Silence model: {'yes' if silence is not None else 'no'}  word penalty {word_penalty}  "
+          f"silence penalty {silence_penalty}  kernel {hmm_kernels.backend}")
+    print(f"Decoding: {decode_s * 1e3:.1f} ms for {audio_s:.1f} s audio (RTF {decode_s / audio_s:.4f})")
+    return n_exact / n_strings, n_err / n_ref
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode synthetic digit strings with the connected-digit network")
+    parser.add_argument("-n", type=int, default=100, help="Number of digit strings")
+    parser.add_argument("--no-silence", action="store_true", help="Decode without the silence model")
+    parser.add_argument("--word-penalty", type=float, default=-100.0)
+    parser.add_argument("--silence-penalty", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", default=None, help="Also write the synthetic WAVs here")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+    test_connected(args.n, not args.no_silence, args.word_penalty, args.silence_penalty,
+                   args.seed, args.out_dir, args.verbose)
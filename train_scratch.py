@@ -1,31 +1,100 @@
 import os
 import glob
+import argparse
 import numpy as np
-import pickle
+from concurrent.futures import ProcessPoolExecutor
 from src.signal_utils import read_wav, pre_emphasis, frame_signal, apply_window
 from src.feature_extraction import compute_mfcc
-from src.hmm_core import HMMManual
+from src.vad import speech_bounds
+from src.hmm_core import HMMManual, TOPOLOGIES
+from src.feature_cache import FeatureStore, compute_files_features, DEFAULT_PARAMS, WINDOWS
+from src.model_io import save_bundle, load_bundle, read_header
+from src import instrument
 
 DATA_DIR = "zero_to_nine_voice"
 MODEL_DIR = "models"
+BUNDLE_PATH = os.path.join(MODEL_DIR, "hmm_digits.bin")
+SILENCE_PATH = os.path.join(MODEL_DIR, "hmm_silence.bin") # For connected digits (src/connected.py)
 DIGITS = list(range(10))
+USE_FEATURE_CACHE = True # Reuse MFCCs from .feature_cache/ between runs
+MAX_ITER = 20 # EM iterations per mixture stage, at most
+TOL = 1e-3    # Stop a stage when the log-likelihood improves by less than this (relative)
 
-def get_mfcc(file_path):
+def fit_digit(digit, train_data, seed=0, n_jobs=1, n_states=8, topology="left-to-right", n_mix=4,
+              max_iter=MAX_ITER, tol=TOL, checkpoint_dir=None):
+    """
+    Train one digit HMM. Seeded per digit, so the result does not depend on
+    which process (or in which order) the digit is trained.
+    checkpoint_dir: save after every iteration (and resume) as digit_<d>.pkl there.
+    """
+    np.random.seed(seed + digit)
+    hmm = HMMManual(n_states=n_states, n_mix=n_mix, n_iter=max_iter, topology=topology, tol=tol)
+    checkpoint = None
+    if checkpoint_dir is not None:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        checkpoint = os.path.join(checkpoint_dir, f"digit_{digit}.pkl")
+    with instrument.request(f"train_digit_{digit}") as req:
+        history = hmm.train(train_data, n_jobs=n_jobs, checkpoint=checkpoint)
+    print(f"Digit {digit}: {history.summary()}")
+    if req is not None:
+        print(f"  {instrument.format_breakdown(req)}")
+    return hmm
+
+def get_silence_mfccs(file_path, params=DEFAULT_PARAMS):
+    """
+    MFCC of the leading and trailing frames the VAD trims off (pauses only).
+    Returns a list of 0-2 arrays.
+    """
     sr, signal = read_wav(file_path)
     if len(signal) == 0:
-        return None
-    signal = pre_emphasis(signal)
-    frames = frame_signal(signal, sr)
-    frames = apply_window(frames)
-    mfcc = compute_mfcc(frames, sr)
-    return mfcc
-
-def train_models():
+        return []
+    signal = pre_emphasis(signal, **params["pre_emphasis"])
+    frames = frame_signal(signal, sr, **params["frame_signal"])
+    start, end = speech_bounds(frames, **params["vad"])
+    frames = apply_window(frames, WINDOWS[params["apply_window"]["window"]])
+    out = []
+    for part in (frames[:start], frames[end:]):
+        if len(part) >= 3:
+            out.append(compute_mfcc(part, sr, **params["compute_mfcc"]))
+    return out
+
+def train_silence_model(seed=0, n_states=3):
+    """
+    Silence HMM from the non-speech edges of the digit training files.
+    """
+    train_data = []
+    for digit in DIGITS:
+        files = glob.glob(os.path.join(DATA_DIR, str(digit), "*.wav"))
+        for f in files[:30]:
+            train_data += get_silence_mfccs(f)
+    print(f"Training silence HMM with {len(train_data)} segments...")
+    np.random.seed(seed + len(DIGITS))
+    hmm = HMMManual(n_states=n_states, n_iter=5)
+    hmm.train(train_data)
+    save_bundle({"sil": hmm}, SILENCE_PATH)
+    return hmm
+
+def train_models(digit_jobs=1, utterance_jobs=1, seed=0, n_states=8, topology="left-to-right", n_mix=4,
+                 max_iter=MAX_ITER, tol=TOL, checkpoint_dir=None):
+    """
+    n_states, topology: digit HMM structure (see hmm_core.TOPOLOGIES).
+    n_mix: Gaussians per state.
+    max_iter, tol: EM stopping rule (tol=None runs max_iter iterations per stage).
+    checkpoint_dir: per-digit checkpoints, an interrupted run resumes from them.
+    digit_jobs: train up to this many digits at once in a process pool.
+    utterance_jobs: processes for the per-utterance E-Step inside each digit.
+    Both levels give bit-identical models to the serial path for a fixed seed.
+    """
     if not os.path.exists(MODEL_DIR):
         os.makedirs(MODEL_DIR)
 
     models = {}
+    store = FeatureStore() if USE_FEATURE_CACHE else None
+    # Batched front-end: one call per digit (cache misses are batched too)
+    load_mfccs = store.get_many if store is not None else compute_files_features
     
+    # Features are loaded in this process only (the cache has a single writer)
+    data = {}
     for digit in DIGITS:
         print(f"Loading data for digit {digit}...")
         digit_dir = os.path.join(DATA_DIR, str(digit))
@@ -34,27 +103,100 @@ def train_models():
         # Limit mainly for speed during debugging? Or full? 
         # Let's take first 50 files for a quick first pass, user can scale up.
         # Hardcore mode: Use all!
-        train_data = []
-        for f in files[:30]: # Limit to 30 for quick Turn validation, user can remove limit
-            mfcc = get_mfcc(f)
-            if mfcc is not None and mfcc.shape[0] > 0:
-                train_data.append(mfcc)
+        train_files = files[:30] # Limit to 30 for quick Turn validation, user can remove limit
+        train_data = [mfcc for mfcc in load_mfccs(train_files)
+                      if mfcc is not None and mfcc.shape[0] > 0]
         
         if not train_data:
             print(f"No data for {digit}")
             continue
-            
-        print(f"Training HMM for {digit} with {len(train_data)} samples...")
-        hmm = HMMManual(n_states=5, n_iter=5) # 5 states, 5 iters for test
-        hmm.train(train_data)
-        
-        models[digit] = hmm
-        
-        # Save
-        with open(os.path.join(MODEL_DIR, f"hmm_{digit}.pkl"), "wb") as f:
-            pickle.dump(hmm, f)
-            
+        data[digit] = train_data
+    
+    if store is not None:
+        store.close()
+    
+    if digit_jobs > 1:
+        with ProcessPoolExecutor(max_workers=digit_jobs) as executor:
+            futures = {}
+            for digit, train_data in data.items():
+                print(f"Training HMM for {digit} with {len(train_data)} samples...")
+                futures[digit] = executor.submit(fit_digit, digit, train_data, seed, utterance_jobs,
+                                                 n_states, topology, n_mix, max_iter, tol, checkpoint_dir)
+            for digit, fut in futures.items():
+                models[digit] = fut.result()
+    else:
+        for digit, train_data in data.items():
+            print(f"Training HMM for {digit} with {len(train_data)} samples...")
+            models[digit] = fit_digit(digit, train_data, seed, utterance_jobs, n_states, topology, n_mix,
+                                      max_iter, tol, checkpoint_dir)
+    
+    # Save all digits into one bundle
+    save_bundle(models, BUNDLE_PATH)
+    train_silence_model(seed)
+    
     print("Training Complete!")
+    if instrument.enabled:
+        # Digits trained in digit_jobs workers are not included
+        print(instrument.summary())
+    return models
+
+def add_recordings(files, mode="partial", tau=10.0, weight=1.0, n_iter=1):
+    """
+    Update the saved digit models with new recordings, without retraining on
+    the old ones. The digit of each file is its parent directory name (as in
+    DATA_DIR). mode 'partial' adds the files' statistics to the stored ones
+    (HMMManual.partial_fit, needs a bundle saved with statistics); 'map'
+    adapts towards them with the current models as a prior worth `tau`
+    frames per state (HMMManual.adapt, e.g. for a new speaker).
+    """
+    models = load_bundle(BUNDLE_PATH)
+    frontend = read_header(BUNDLE_PATH)[0].get("frontend", DEFAULT_PARAMS)
+    by_digit = {}
+    for path in files:
+        by_digit.setdefault(int(os.path.basename(os.path.dirname(os.path.abspath(path)))), []).append(path)
+    
+    for digit, paths in sorted(by_digit.items()):
+        if digit not in models:
+            print(f"No model for digit {digit}, skipping {len(paths)} files")
+            continue
+        data = [mfcc for mfcc in compute_files_features(paths, frontend)
+                if mfcc is not None and mfcc.shape[0] > 0]
+        if not data:
+            continue
+        hmm = models[digit]
+        if mode == "partial":
+            info = hmm.partial_fit(data, n_iter=n_iter, weight=weight)
+        else:
+            info = hmm.adapt(data, tau=tau, n_iter=n_iter)
+        print(f"Digit {digit}: {info['utterances']} files, {info['frames']} frames "
+              f"in {info['seconds'] * 1e3:.1f} ms ({hmm.stats['utterances']} utterances in the model)")
+    
+    save_bundle(models, BUNDLE_PATH, frontend)
+    return models
 
 if __name__ == "__main__":
-    train_models()
+    parser = argparse.ArgumentParser(description="Train one HMM per digit")
+    parser.add_argument("--digit-jobs", type=int, default=1, help="Digits trained in parallel")
+    parser.add_argument("--utterance-jobs", type=int, default=1, help="Processes for the per-utterance E-Step")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--states", type=int, default=8, help="States per digit HMM")
+    parser.add_argument("--topology", choices=list(TOPOLOGIES), default="left-to-right")
+    parser.add_argument("--mix", type=int, default=4, help="Gaussians per state (GMM when > 1)")
+    parser.add_argument("--max-iter", type=int, default=MAX_ITER, help="EM iterations per mixture stage, at most")
+    parser.add_argument("--tol", type=float, default=TOL, help="Relative log-likelihood gain to stop at (0: never stop early)")
+    parser.add_argument("--checkpoint-dir", default=None, help="Save/resume per-digit training checkpoints here")
+    parser.add_argument("--silence-only", action="store_true", help="Only (re)train the silence model")
+    parser.add_argument("--add", nargs="+", metavar="WAV", help="Update the saved models with these files "
+                        "(digit = parent directory name) instead of training from scratch")
+    parser.add_argument("--adapt-mode", choices=["partial", "map"], default="partial",
+                        help="--add update: 'partial' adds to the stored statistics, 'map' adapts with a prior")
+    parser.add_argument("--tau", type=float, default=10.0, help="MAP prior weight in frames per state (--adapt-mode map)")
+    parser.add_argument("--weight", type=float, default=1.0, help="Weight of the new files (--adapt-mode partial)")
+    args = parser.parse_args()
+    if args.silence_only:
+        train_silence_model(args.seed)
+    elif args.add:
+        add_recordings(args.add, args.adapt_mode, args.tau, args.weight)
+    else:
+        train_models(args.digit_jobs, args.utterance_jobs, args.seed, args.states, args.topology, args.mix,
+                     args.max_iter, args.tol or None, args.checkpoint_dir)